@@ -0,0 +1,100 @@
+"""
+Agreement report: adaptive-depth analysis vs. full-depth analysis.
+
+Usage (inside backend container):
+    python adaptive_report.py games.pgn [--max-games 50]
+
+Every game in the PGN file is analyzed twice — once in `single_pass` mode at
+STOCKFISH_DEPTH and once in `adaptive` mode — and the per-ply
+classifications are compared. Reports the agreement rate and how many
+positions each mode searched at which depth, as a proxy for node count.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+from collections import Counter
+
+import chess.pgn
+
+from game_analysis import (
+    ADAPTIVE_SHALLOW_DEPTH,
+    STOCKFISH_DEPTH,
+    _classify_plies,
+    _get_engine,
+    _replay_game,
+    _search_plies_adaptive,
+    _search_plies_single_pass,
+)
+
+
+def compare_game(pgn_string: str, engine=None) -> dict:
+    """Classify one game both ways and report where they disagree."""
+    engine = engine or _get_engine()
+    game = chess.pgn.read_game(io.StringIO(pgn_string))
+    plies, _ = _replay_game(game)
+
+    full = _classify_plies(plies, _search_plies_single_pass(engine, plies), verbose=False)
+    adaptive_searches = _search_plies_adaptive(engine, plies)
+    adaptive = _classify_plies(plies, adaptive_searches, verbose=False)
+
+    disagreements = [
+        {
+            "ply": i,
+            "move_san": f["move_san"],
+            "full": f["classification"],
+            "adaptive": a["classification"],
+        }
+        for i, (f, a) in enumerate(zip(full, adaptive))
+        if f["classification"] != a["classification"]
+    ]
+    full_depth = int(engine.depth)
+    deep = sum(1 for s in adaptive_searches if s["depth"] == full_depth)
+    return {
+        "plies": len(plies),
+        "agree": len(plies) - len(disagreements),
+        "deep_plies": deep,
+        "disagreements": disagreements,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("pgn_file")
+    parser.add_argument("--max-games", type=int, default=None)
+    args = parser.parse_args()
+
+    totals = Counter()
+    confusions = Counter()
+    with open(args.pgn_file) as f:
+        n = 0
+        while args.max_games is None or n < args.max_games:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            report = compare_game(str(game))
+            n += 1
+            totals["games"] += 1
+            totals["plies"] += report["plies"]
+            totals["agree"] += report["agree"]
+            totals["deep_plies"] += report["deep_plies"]
+            for d in report["disagreements"]:
+                confusions[f"{d['full']} -> {d['adaptive']}"] += 1
+            print(f"Game {n}: {report['agree']}/{report['plies']} agree, "
+                  f"{report['deep_plies']} plies re-searched at depth {STOCKFISH_DEPTH}")
+
+    plies = totals["plies"] or 1
+    print(json.dumps({
+        "games": totals["games"],
+        "plies": totals["plies"],
+        "agreement_pct": round(100 * totals["agree"] / plies, 2),
+        "shallow_depth": ADAPTIVE_SHALLOW_DEPTH,
+        "full_depth": STOCKFISH_DEPTH,
+        "deep_ply_pct": round(100 * totals["deep_plies"] / plies, 2),
+        "disagreements": dict(confusions.most_common()),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
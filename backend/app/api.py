@@ -1,15 +1,21 @@
+import asyncio
+import json
 import os
+import threading
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
-from database import engine, get_db
+from database import SessionLocal, add_missing_columns, engine, get_db
 from models import Game, MoveAnalysis, AnalysisJob, Base
 import time
-from batch import process_user_games
+from job_events import TERMINAL_STATUSES, job_events, listen as listen_job_events
+from job_queue import PRIORITIES, default_worker_id, enqueue
+from metrics import CONTENT_TYPE, HTTP_REQUEST_SECONDS, render as render_metrics
 from player_stats import get_player_stats
 from insights import get_player_insights
 from llm_reviewer import ChessReviewer
@@ -20,17 +26,36 @@ from train_risk import (
     predict_proba,
     train as train_risk_model,
 )
+from worker import run_worker
 
 import numpy as np
 
 reviewer = ChessReviewer()
 
+## Queue workers to run inside the API process (single-container setups);
+## normally 0, with jobs run by separate `python worker.py` processes.
+EMBEDDED_WORKERS = int(os.getenv("EMBEDDED_WORKERS", "0"))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Base.metadata.create_all(engine)
+    add_missing_columns(engine)
     print("DB tables verified/created.")
+    stop = threading.Event()
+    if engine.dialect.name == "postgresql":
+        # Events of jobs run by worker.py processes (see job_events.py).
+        threading.Thread(
+            target=listen_job_events, args=(job_events, engine, stop),
+            name="job-events-listener", daemon=True,
+        ).start()
+    for i in range(EMBEDDED_WORKERS):
+        threading.Thread(
+            target=run_worker, args=(f"{default_worker_id()}-api{i}",),
+            kwargs={"stop": stop}, name=f"embedded-worker-{i}", daemon=True,
+        ).start()
     yield
+    stop.set()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -50,31 +75,53 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    # Label by route template ("/game/{game_id}"), not the raw path, to keep
+    # the series count bounded. Streaming responses are timed to their headers.
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            request.method,
+            route.path if route is not None else "unmatched",
+            str(status),
+        )
+
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Chess Analyzer API"}
 
 
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of the counters in metrics.py."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
 @app.post("/analyze/{username}")
 def analyze_games(
     username: str,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     new_games: int = 5,
     opponent: str = None,
+    priority: str = None,
 ):
-    job = AnalysisJob(
-        username=username,
-        status="running",
-        processed=0,
-        requested=new_games,
-        created_at=int(time.time()),
-    )
-    db.add(job)
-    db.commit()
-    db.refresh(job)
-    background_tasks.add_task(process_user_games, username, new_games=new_games, opponent=opponent, job_id=job.id)
-    msg = f"Analysis started for {username} ({new_games} games)"
+    """`priority` is one of job_queue.PRIORITIES; by default a single game is
+    interactive, up to SYNC_MAX_GAMES is a sync, anything larger a backfill."""
+    if priority is not None and priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(PRIORITIES)}")
+    # Picked up by a worker process (worker.py); see job_queue.py.
+    job = enqueue(db, username, new_games, opponent,
+                  priority=PRIORITIES[priority] if priority else None)
+    msg = f"Analysis queued for {username} ({new_games} games)"
     if opponent:
         msg += f" vs {opponent}"
     return {"message": msg + ".", "job_id": job.id}
@@ -90,10 +137,89 @@ def analyze_status(job_id: int, db: Session = Depends(get_db)):
         "status": job.status,
         "processed": job.processed,
         "requested": job.requested,
+        "priority": job.priority,
         "error": job.error,
     }
 
 
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _is_terminal(event: str, data: dict) -> bool:
+    return event == "job" and data.get("status") in TERMINAL_STATUSES
+
+
+def _job_status(job_id: int) -> dict | None:
+    db = SessionLocal()
+    try:
+        job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+        if not job:
+            return None
+        return {
+            "status": job.status, "processed": job.processed,
+            "requested": job.requested, "error": job.error,
+        }
+    finally:
+        db.close()
+
+
+@app.get("/analyze/stream/{job_id}")
+async def analyze_stream(job_id: int):
+    """Server-Sent Events for a job: `move` per classified ply, `game` per
+    saved game, `job` on status changes. Closes after the final `job` event.
+
+    Events of jobs in worker.py processes arrive over LISTEN/NOTIFY. Those
+    sent before this process started listening are gone, so a stream opens
+    with the job row's status when there's no history, and re-reads the row
+    whenever it has been quiet for SSE_KEEPALIVE_SECONDS.
+    """
+    status = await asyncio.to_thread(_job_status, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    subscription = job_events.subscribe(
+        job_id, create=status["status"] not in TERMINAL_STATUSES)
+    if subscription is None:
+        history, queue = [("job", status)], None
+    else:
+        history, queue = subscription
+        if not history:
+            history = [("job", status)]
+
+    async def events():
+        try:
+            for event, data in history:
+                yield _sse(event, data)
+                if _is_terminal(event, data):
+                    return
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    latest = await asyncio.to_thread(_job_status, job_id)
+                    if latest is None or latest["status"] in TERMINAL_STATUSES:
+                        if latest is not None:
+                            yield _sse("job", latest)
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event, data)
+                if _is_terminal(event, data):
+                    return
+        finally:
+            if queue is not None:
+                job_events.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/games/{username}")
 def get_games(username: str, db: Session = Depends(get_db)):
     games = db.query(Game).filter(
@@ -1,24 +1,125 @@
-from game_analysis import analyze_game
+from game_analysis import ANALYSIS_MODE, analyze_game, analyze_games
 from chesscom import ChessComClient
 from database import SessionLocal
 from models import Game, AnalysisJob
-from crud import save_game, save_analysis
+from crud import refine_analysis, save_game, save_analysis
+from engine_pool import get_pool
+from job_events import job_events
+from job_queue import claim_game, complete, owned, release_games
+from metrics import DB_WRITE_SECONDS
+from pipeline import Pipeline
+import os
+import threading
 import time as time_module
 
-def process_user_games(username: str, new_games: int = 10, opponent: str = None, job_id: int = None):
+## Modes whose results `analyze_games` reproduces. In these, a job's games
+## are analyzed together so a position shared by several of them (the
+## player's repertoire) is searched once; other modes analyze game by game.
+BATCH_DEDUP_MODES = ("single_pass", "parallel")
+
+## Depth of the quick single-pass preview saved (flagged provisional) for
+## every new game before the full analysis, which then refines the rows in
+## place. Gets a first result on /game/{id} within seconds. 0 disables it.
+ANALYSIS_PREVIEW_DEPTH = int(os.getenv("ANALYSIS_PREVIEW_DEPTH", "8"))
+
+## Most games per analyze_games call in the batch modes. A chunk already
+## on an engine is finished before the job yields (`should_yield`), so this
+## bounds the wait of a more urgent job, at some cost in shared positions
+## found across chunks.
+BATCH_CHUNK_GAMES = int(os.getenv("BATCH_CHUNK_GAMES", "10"))
+## How long a chunk waits to fill up as selected (and previewed) games come
+## in one by one. Without it most chunks would hold a single game and find
+## nothing to share. Selection running out closes the chunk at once.
+BATCH_CHUNK_WAIT_SECONDS = float(os.getenv("BATCH_CHUNK_WAIT_SECONDS", "5.0"))
+
+## Capacity of each queue between pipeline stages (see pipeline.py): enough
+## fetched games to keep every engine fed without reading whole archives ahead.
+PIPELINE_QUEUE_GAMES = int(os.getenv("PIPELINE_QUEUE_GAMES", "16"))
+## Results written per transaction, and how long the writer waits for a
+## batch to fill before committing what it has.
+PERSIST_BATCH_GAMES = int(os.getenv("PERSIST_BATCH_GAMES", "5"))
+PERSIST_FLUSH_SECONDS = float(os.getenv("PERSIST_FLUSH_SECONDS", "1.0"))
+
+
+class Preempted(Exception):
+    """Raised by process_user_games when `should_yield` asks it to stop, or
+    when the job's `requested` was raised while it ran (job_queue.enqueue).
+    Everything analyzed so far is saved; the job resumes from there."""
+
+
+class Cancelled(Exception):
+    """Raised by process_user_games when `cancelled` turns True: the job was
+    taken over by another worker, which now owns its row and game claims.
+    Results not yet saved are dropped; nothing more is written."""
+
+
+def _game_data(game: dict, analysis: dict) -> dict:
+    headers = analysis['headers']
+    return {
+        'pgn': game.get('pgn'),
+        'url': game.get('url'),
+        'white': {
+            'username': headers.get('White', 'Unknown'),
+            'rating': int(headers.get('WhiteElo', 0)),
+            'result': headers.get('Result', '').split('-')[0] if '-' in headers.get('Result', '') else ''
+        },
+        'black': {
+            'username': headers.get('Black', 'Unknown'),
+            'rating': int(headers.get('BlackElo', 0)),
+            'result': headers.get('Result', '').split('-')[1] if '-' in headers.get('Result', '') else ''
+        },
+        'time_control': headers.get('TimeControl', ''),
+        'time_class': game.get('time_class', ''),
+        'end_time': game.get('end_time', 0),
+        'rated': headers.get('Event', '').lower() != 'casual',
+        'rules': 'chess',
+        'opening': analysis.get('detected_opening', headers.get('Opening', 'Unknown'))
+    }
+
+
+def process_user_games(username: str, new_games: int = 10, opponent: str = None, job_id: int = None,
+                       resume_from: int = 0, raise_errors: bool = False,
+                       should_yield=None, preview: bool = True, cancelled=None,
+                       worker_id: str = None):
+    """Fetch up to `new_games` not-yet-analyzed games and analyze them.
+
+    `resume_from` games of the target were already saved by an earlier
+    attempt (job_queue retries). With raise_errors the caller decides what
+    a failure means instead of the job being marked "failed" here.
+    `should_yield()` is polled before each game or chunk starts and after
+    each persisted batch; when it returns True no more games are started,
+    the ones in flight are finished and saved, and Preempted is raised.
+    `preview=False` skips the provisional preview pass (nobody is watching
+    a backfill). `cancelled()` is polled before each game or chunk starts
+    and before each write; once it returns True, Cancelled is raised
+    without touching the job row or its claims. With `worker_id` the job
+    row is only written while that worker still owns it (job_queue.owned);
+    finding it taken over counts as cancelled.
+    """
     client = ChessComClient()
     db = SessionLocal()
 
+    def publish_job(status, processed, error=None):
+        job_events.publish(job_id, "job", {
+            "status": status, "processed": processed, "requested": new_games, "error": error,
+        })
+
     def update_job(status, processed=0, error=None):
         if job_id is None:
             return
-        job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
-        if job:
-            job.status = status
-            job.processed = processed
-            if error:
-                job.error = error
-            db.commit()
+        values = {AnalysisJob.status: status, AnalysisJob.processed: processed}
+        if error:
+            values[AnalysisJob.error] = error
+        updated = (
+            db.query(AnalysisJob)
+            .filter(owned(job_id, worker_id))
+            .update(values, synchronize_session=False)
+        )
+        db.commit()
+        if updated:
+            publish_job(status, processed, error)
+        elif worker_id is not None:
+            taken_over.set()
 
     if opponent:
         print(f"Fetching games for {username} vs {opponent} (Target: {new_games} new games)...")
@@ -28,56 +129,219 @@ def process_user_games(username: str, new_games: int = 10, opponent: str = None,
         games = client.get_recent_games(username)
 
     skipped = 0
-    processed = 0
+    processed = resume_from
+    remaining = new_games - resume_from
 
-    try:
-        for idx, game in enumerate(games):
-            if processed >= new_games:
-                print(f"Reached target of {new_games} new games.")
-                break
-
-            pgn = game.get('pgn')
-            url = game.get('url')
-
-            if db.query(Game).filter(Game.url == url).first():
-                print(f"Game already exists: {url}")
-                skipped += 1
-                continue
-
-            print(f"Analyzing new game {processed+1}/{new_games} (Source idx: {idx})...")
-
-            analysis = analyze_game(pgn)
-
-            headers = analysis['headers']
-            moves = analysis['moves']
-            summary = analysis['summary']
-
-            game_data = {
-                'pgn': pgn,
-                'url': url,
-                'white': {
-                    'username': headers.get('White', 'Unknown'),
-                    'rating': int(headers.get('WhiteElo', 0)),
-                    'result': headers.get('Result', '').split('-')[0] if '-' in headers.get('Result', '') else ''
-                },
-                'black': {
-                    'username': headers.get('Black', 'Unknown'),
-                    'rating': int(headers.get('BlackElo', 0)),
-                    'result': headers.get('Result', '').split('-')[1] if '-' in headers.get('Result', '') else ''
-                },
-                'time_control': headers.get('TimeControl', ''),
-                'time_class': game.get('time_class', ''),
-                'end_time': game.get('end_time', 0),
-                'rated': headers.get('Event', '').lower() != 'casual',
-                'rules': 'chess',
-                'opening': analysis.get('detected_opening', headers.get('Opening', 'Unknown'))
-            }
-
-            saved_game = save_game(db, game_data, summary)
+    pool = get_pool()
+
+    def analyze(game, depth=None):
+        url = game.get('url')
+        provisional = depth is not None
+
+        def on_move(result):
+            move = {k: v for k, v in result.items() if k != 'engine'}
+            job_events.publish(job_id, "move", {"url": url, "provisional": provisional, **move})
+
+        # Each game gets its own engine process for its whole analysis.
+        with pool.engine() as engine:
+            if provisional:
+                return analyze_game(game.get('pgn'), mode="single_pass", engine=engine,
+                                    on_move=on_move, depth=depth)
+            return analyze_game(game.get('pgn'), engine=engine, on_move=on_move)
+
+    # The stages run concurrently (see pipeline.py): archives download
+    # while engines search and earlier games are written.
+    pipeline = Pipeline(f"job-{job_id}")
+    fetched_q = pipeline.queue(PIPELINE_QUEUE_GAMES)
+    preview_q = pipeline.queue(PIPELINE_QUEUE_GAMES)
+    analyze_q = pipeline.queue(PIPELINE_QUEUE_GAMES)
+    results_q = pipeline.queue(PIPELINE_QUEUE_GAMES)
+    # The selection stage has its own session; `db` belongs to persistence.
+    select_db = SessionLocal()
+    queued_urls = set()
+    # url -> id of a saved provisional Game awaiting refinement
+    previewed = {}
+    enough = threading.Event()
+
+    def fetched():
+        # Stop walking archives once the target is selected.
+        for game in games:
+            yield game
+            if enough.is_set():
+                return
+
+    def select(game):
+        nonlocal skipped
+        if len(queued_urls) >= remaining:
+            enough.set()
+            return
+        url = game.get('url')
+        if url in queued_urls or not game.get('pgn'):
+            skipped += 1
+            return
+        # Claim before the existence check: a job that saved the game
+        # and released it in between is then seen as done.
+        if job_id is not None and not claim_game(select_db, url, job_id):
+            print(f"Game is being analyzed by another job: {url}")
+            skipped += 1
+            return
+        existing = select_db.query(Game.id, Game.provisional).filter(Game.url == url).first()
+        select_db.rollback()
+        if existing and not existing.provisional:
+            print(f"Game already exists: {url}")
+            skipped += 1
+            if job_id is not None:
+                release_games(select_db, job_id, [url])
+            return
+
+        if existing:
+            # Preview saved by an earlier job that never got refined.
+            previewed[url] = existing.id
+        queued_urls.add(url)
+        print(f"Queued new game {len(queued_urls)}/{remaining}: {url}")
+        preview_q.put(game)
+        if len(queued_urls) >= remaining:
+            print(f"Reached target of {new_games} new games.")
+            enough.set()
+
+    yield_lock = threading.Lock()  # should_yield may share a session
+    yielding = threading.Event()
+
+    def yield_now():
+        """Poll should_yield from any stage; stop starting games on True."""
+        if should_yield is None:
+            return False
+        with yield_lock:
+            if not yielding.is_set() and should_yield():
+                yielding.set()
+                pipeline.cancel()
+        return yielding.is_set()
+
+    def chunk_size():
+        # Asked before each chunk is gathered: a job about to yield takes
+        # one game (which the cancelled stage then skips), not a chunk.
+        return 1 if yield_now() else BATCH_CHUNK_GAMES
+
+    taken_over = threading.Event()
+
+    def lost():
+        if taken_over.is_set() or (cancelled is not None and cancelled()):
+            pipeline.cancel()
+            return True
+        return False
+
+    def preview_game(game):
+        if lost() or yield_now():
+            return
+        if previewing and game.get('url') not in previewed:
+            results_q.put(("preview", game, analyze(game, depth=ANALYSIS_PREVIEW_DEPTH)))
+        analyze_q.put(game)
+
+    def analyze_one(game):
+        if lost() or yield_now():
+            return
+        results_q.put(("full", game, analyze(game)))
+
+    def analyze_chunk(chunk):
+        def on_batch_move(n, result):
+            move = {k: v for k, v in result.items() if k != 'engine'}
+            job_events.publish(job_id, "move", {
+                "url": chunk[n].get('url'), "provisional": False, **move,
+            })
+
+        if lost() or yield_now():
+            return
+        print(f"Analyzing {len(chunk)} new games as one batch...")
+        with pool.engine() as engine:
+            analyses = analyze_games([game.get('pgn') for game in chunk], engine=engine,
+                                     on_move=on_batch_move)
+        for game, analysis in zip(chunk, analyses):
+            results_q.put(("full", game, analysis))
+
+    def publish_game(saved_game, game, analysis, provisional):
+        job_events.publish(job_id, "game", {
+            "game_id": saved_game.id,
+            "url": game.get('url'),
+            "summary": analysis['summary'],
+            "provisional": provisional,
+        })
+
+    def persist_preview(game, analysis):
+        game_data = {**_game_data(game, analysis), 'provisional': True,
+                     'analysis_depth': ANALYSIS_PREVIEW_DEPTH}
+        saved_game = save_game(db, game_data, analysis['summary'], commit=False)
+        # Never overwrite a finished analysis saved concurrently.
+        if saved_game and saved_game.provisional:
+            save_analysis(db, saved_game.id, analysis['moves'], provisional=True, commit=False)
+            previewed[game.get('url')] = saved_game.id
+            return saved_game
+
+    def persist_full(game, analysis):
+        preview_id = previewed.get(game.get('url'))
+        if preview_id is not None:
+            saved_game = db.query(Game).filter(Game.id == preview_id).first()
+            refine_analysis(db, saved_game, analysis['moves'], analysis['summary'], commit=False)
+            return saved_game
+        depth = max((m.get('depth') or 0 for m in analysis['moves']), default=None)
+        saved_game = save_game(db, {**_game_data(game, analysis), 'analysis_depth': depth},
+                               analysis['summary'], commit=False)
+        if saved_game:
+            save_analysis(db, saved_game.id, analysis['moves'], commit=False)
+        return saved_game
+
+    def persist(results):
+        """Write a batch of results in one transaction, then announce them."""
+        nonlocal processed
+        saved = []
+        for kind, game, analysis in results:
+            provisional = kind == "preview"
+            saved_game = (persist_preview if provisional else persist_full)(game, analysis)
+            saved.append((saved_game, game, analysis, provisional))
+        with DB_WRITE_SECONDS.time("persist_batch"):
+            db.commit()
+        for saved_game, game, analysis, provisional in saved:
             if saved_game:
-                save_analysis(db, saved_game.id, moves)
-            processed += 1
-            update_job("running", processed)
+                publish_game(saved_game, game, analysis, provisional)
+            if not provisional:
+                processed += 1
+        update_job("running", processed)
+
+    def more_to_do():
+        return not enough.is_set() or processed - resume_from < len(queued_urls)
+
+    try:
+        previewing = bool(ANALYSIS_PREVIEW_DEPTH and preview)
+        pipeline.source("fetch", fetched(), fetched_q)
+        pipeline.stage("select", select, fetched_q, [preview_q])
+        pipeline.stage("preview", preview_game, preview_q, [analyze_q],
+                       workers=pool.size if previewing else 1)
+        if ANALYSIS_MODE in BATCH_DEDUP_MODES:
+            # Each chunk gathers up to BATCH_CHUNK_GAMES games, so a shared
+            # position is searched once per chunk. A second worker gathers
+            # and starts the next chunk while the current one winds down.
+            pipeline.stage("analyze", analyze_chunk, analyze_q, [results_q],
+                           workers=2, batch=chunk_size, wait=BATCH_CHUNK_WAIT_SECONDS)
+        else:
+            pipeline.stage("analyze", analyze_one, analyze_q, [results_q], workers=pool.size)
+
+        try:
+            # Persist from this thread only — the DB session isn't thread-safe.
+            for results in pipeline.drain(results_q, batch=PERSIST_BATCH_GAMES, wait=PERSIST_FLUSH_SECONDS):
+                if lost():
+                    continue  # drain, but the job isn't ours to write to
+                persist(results)
+                if more_to_do():
+                    # Games already on an engine are finished and kept.
+                    yield_now()
+        except BaseException:
+            pipeline.close(results_q)
+            raise
+        pipeline.join()
+        if lost():
+            raise Cancelled(f"job taken over after {processed}/{new_games} games")
+        # The in-flight games may have been all that was left.
+        if yielding.is_set() and more_to_do():
+            raise Preempted(f"yielding after {processed}/{new_games} games")
 
         # Invalidate ai_insight_cache so next /stats call regenerates it
         if processed > 0:
@@ -88,12 +352,36 @@ def process_user_games(username: str, new_games: int = 10, opponent: str = None,
                 latest.ai_insight_cache = None
                 db.commit()
 
-        update_job("done", processed)
+        if lost():
+            raise Cancelled("job taken over")
+        if job_id is not None:
+            if not complete(db, job_id, worker_id, new_games, processed):
+                if db.query(AnalysisJob.id).filter(owned(job_id, worker_id)).first() is None:
+                    taken_over.set()
+                    raise Cancelled("job taken over")
+                # Another request was folded into this job while it ran.
+                raise Preempted(f"request raised past {new_games} games")
+            publish_job("done", processed)
 
+    except Preempted as e:
+        print(f"Job {job_id} preempted: {e}")
+        raise
+    except Cancelled as e:
+        print(f"Job {job_id} cancelled: {e}")
+        raise
     except Exception as e:
         print(f"Error processing games: {e}")
+        if raise_errors:
+            raise
         update_job("failed", processed, error=str(e))
     finally:
+        select_db.close()
+        # A worker that took the job over shares its claims (same job id).
+        if job_id is not None and not lost():
+            try:
+                release_games(db, job_id)
+            except Exception as e:
+                print(f"Warning: could not release game claims of job {job_id} ({e})")
         db.close()
 
     if processed == 0 and skipped == 0:
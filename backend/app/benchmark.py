@@ -0,0 +1,183 @@
+"""
+Throughput benchmark for `analyze_game` over a fixed PGN corpus.
+
+Usage (inside backend container):
+    python benchmark.py [--engine fake|real] [--mode single_pass] [--repeat 3]
+                        [--latency-ms 0] [--cache] [--out bench.json]
+                        [--compare previous.json]
+
+The corpus is `bench_corpus/<category>.pgn` (short, long, book, tactical).
+Each game is analyzed `--repeat` times and the fastest run is kept. For
+every game and category the report gives plies/sec and seconds per stage
+(see stage_timing.py); "other" is whatever the stages don't cover —
+mostly classification and glue code.
+
+--engine fake uses the deterministic in-process fake engine (fake_engine.py),
+so the numbers isolate our own Python overhead; add --latency-ms to model
+engine time. --engine real uses the configured backend (ENGINE_BACKEND,
+STOCKFISH_PATH). The eval cache is disabled unless --cache is given, so the
+engine is really exercised. Write the JSON with --out and pass it to
+--compare on a later commit to see the plies/sec change per category.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import subprocess
+import time
+
+import chess.pgn
+
+import eval_cache
+import game_analysis
+from stage_timing import STAGES, collect
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(base_dir, "bench_corpus")
+
+
+def load_corpus(corpus_dir: str = CORPUS_DIR) -> list[dict]:
+    """[{"category", "name", "pgn"}] for every game in the corpus files."""
+    games = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.pgn"))):
+        category = os.path.splitext(os.path.basename(path))[0]
+        with open(path) as f:
+            while True:
+                offset = f.tell()
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                end = f.tell()
+                f.seek(offset)
+                pgn = f.read(end - offset)
+                f.seek(end)
+                name = f"{game.headers.get('White', '?')} - {game.headers.get('Black', '?')}"
+                games.append({"category": category, "name": name, "pgn": pgn})
+    return games
+
+
+def _timed_run(pgn: str, engine, mode: str | None) -> dict:
+    # The per-move log lines are part of the pipeline; keep them off the terminal.
+    with collect() as times, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = game_analysis.analyze_game(pgn, mode=mode, engine=engine)
+        total = time.perf_counter() - start
+    stages = {name: times.seconds.get(name, 0.0) for name in STAGES}
+    stages["other"] = max(0.0, total - sum(stages.values()))
+    return {"plies": len(result["moves"]), "seconds": total, "stages": stages}
+
+
+def _totals(runs: list[dict]) -> dict:
+    plies = sum(r["plies"] for r in runs)
+    seconds = sum(r["seconds"] for r in runs)
+    stages = {name: sum(r["stages"][name] for r in runs) for name in runs[0]["stages"]} if runs else {}
+    return {
+        "games": len(runs),
+        "plies": plies,
+        "seconds": round(seconds, 6),
+        "plies_per_sec": round(plies / seconds, 2) if seconds else None,
+        "stages": {name: round(v, 6) for name, v in stages.items()},
+    }
+
+
+def run_benchmark(engine, games: list[dict], mode: str | None = None, repeat: int = 3) -> dict:
+    per_game = []
+    for game in games:
+        runs = [_timed_run(game["pgn"], engine, mode) for _ in range(max(1, repeat))]
+        best = min(runs, key=lambda r: r["seconds"])
+        per_game.append({"category": game["category"], "name": game["name"], **best})
+
+    categories = {}
+    for category in sorted({g["category"] for g in per_game}):
+        categories[category] = _totals([g for g in per_game if g["category"] == category])
+    return {
+        "games": [
+            {**g, "plies_per_sec": round(g["plies"] / g["seconds"], 2) if g["seconds"] else None}
+            for g in per_game
+        ],
+        "categories": categories,
+        "total": _totals(per_game),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=base_dir,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _print_report(report: dict, previous: dict | None = None) -> None:
+    header = f"{'category':<10} {'games':>5} {'plies':>6} {'plies/s':>9}"
+    header += "".join(f" {name:>9}" for name in (*STAGES, "other"))
+    if previous:
+        header += f" {'vs prev':>8}"
+    print(header)
+    rows = list(report["categories"].items()) + [("total", report["total"])]
+    for category, t in rows:
+        line = f"{category:<10} {t['games']:>5} {t['plies']:>6} {t['plies_per_sec'] or 0:>9.1f}"
+        line += "".join(f" {t['stages'].get(name, 0) * 1000:>7.1f}ms" for name in (*STAGES, "other"))
+        if previous:
+            old = previous["total"] if category == "total" else previous["categories"].get(category)
+            if old and old.get("plies_per_sec") and t["plies_per_sec"]:
+                line += f" {100 * (t['plies_per_sec'] / old['plies_per_sec'] - 1):>+7.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analyze_game over the PGN corpus.")
+    parser.add_argument("--engine", choices=["fake", "real"], default="fake")
+    parser.add_argument("--mode", default=None, help="analysis mode (default: ANALYSIS_MODE)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake engine time per search")
+    parser.add_argument("--cache", action="store_true", help="keep the persistent eval cache on")
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    args = parser.parse_args()
+
+    if not args.cache:
+        eval_cache.EVAL_CACHE_PATH = ""
+
+    if args.engine == "fake":
+        from fake_engine import FakeEngine
+        engine = FakeEngine(depth=game_analysis.STOCKFISH_DEPTH, latency_ms=args.latency_ms)
+    else:
+        engine = game_analysis.new_engine()
+
+    games = load_corpus(args.corpus)
+    print(f"Benchmarking {len(games)} games ({args.engine} engine, "
+          f"mode {args.mode or game_analysis.ANALYSIS_MODE}, best of {args.repeat})...")
+    report = {
+        "commit": _git_commit(),
+        "engine": args.engine,
+        "backend": "fake" if args.engine == "fake" else game_analysis.ENGINE_BACKEND,
+        "mode": args.mode or game_analysis.ANALYSIS_MODE,
+        "depth": int(engine.depth),
+        "latency_ms": args.latency_ms if args.engine == "fake" else None,
+        "repeat": args.repeat,
+        "cache": args.cache,
+        **run_benchmark(engine, games, mode=args.mode, repeat=args.repeat),
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    _print_report(report, previous)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Precomputed engine evaluations for opening-book positions.
+
+While a game is still in book every ply is labeled "Book" regardless of the
+engine, yet each one used to cost a full-depth MultiPV search. This table
+holds the top-2 lines (White's frame, `get_top_moves()` format) for every
+ECO position and every Polyglot book position reachable from the start, so
+`game_analysis` can serve book plies with zero engine time.
+
+File layout (`book_evals.npz`):
+
+    keys     uint64 (n,)     Polyglot Zobrist hash, sorted
+    moves    <U5    (n, 2)   UCI move of each line ("" if absent)
+    cps      int32  (n, 2)   centipawns (ignored when the line is a mate)
+    mates    int16  (n, 2)   mate distance, 0 = not a mate
+    depth    int32  ()       depth the table was searched at
+
+Generate it once, offline (inside backend container):
+    python book_evals.py [--depth 20] [--max-ply 16]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+import chess.polyglot
+import numpy as np
+
+BOOK_EVALS_PATH = os.getenv("BOOK_EVALS_PATH", "/app/data/cache/book_evals.npz")
+BOOK_EVAL_DEPTH = int(os.getenv("BOOK_EVAL_DEPTH", "20"))
+_LINES = 2
+
+
+class BookEvalTable:
+    def __init__(self, keys, moves, cps, mates, depth: int):
+        self.keys = keys
+        self.moves = moves
+        self.cps = cps
+        self.mates = mates
+        self.depth = depth
+
+    @classmethod
+    def load(cls, path: str = BOOK_EVALS_PATH) -> "BookEvalTable":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["keys"], data["moves"], data["cps"], data["mates"], int(data["depth"]))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lines(self, key: int) -> list[dict] | None:
+        """Top lines for the position, or None if it isn't in the table."""
+        key = np.uint64(key)
+        i = np.searchsorted(self.keys, key)
+        if i >= len(self.keys) or self.keys[i] != key:
+            return None
+        lines = []
+        for j in range(_LINES):
+            move = str(self.moves[i, j])
+            if not move:
+                break
+            mate = int(self.mates[i, j])
+            lines.append({
+                "Move": move,
+                "Centipawn": None if mate else int(self.cps[i, j]),
+                "Mate": mate or None,
+            })
+        return lines
+
+
+def save_table(path: str, results: dict[int, list[dict]], depth: int) -> None:
+    keys = np.array(sorted(results), dtype=np.uint64)
+    moves = np.full((len(keys), _LINES), "", dtype="<U5")
+    cps = np.zeros((len(keys), _LINES), dtype=np.int32)
+    mates = np.zeros((len(keys), _LINES), dtype=np.int16)
+    for i, key in enumerate(keys):
+        for j, line in enumerate(results[int(key)][:_LINES]):
+            moves[i, j] = line["Move"]
+            if line.get("Mate") is not None:
+                mates[i, j] = line["Mate"]
+            else:
+                cps[i, j] = line["Centipawn"]
+    np.savez(path, keys=keys, moves=moves, cps=cps, mates=mates, depth=np.int32(depth))
+
+
+_table: BookEvalTable | None = None
+_table_checked = False
+_table_lock = threading.Lock()
+
+
+def get_book_evals() -> BookEvalTable | None:
+    """Shared table, loaded on first use; None if it hasn't been generated."""
+    global _table, _table_checked
+    if _table_checked:
+        return _table
+    with _table_lock:
+        if not _table_checked:
+            if BOOK_EVALS_PATH and os.path.exists(BOOK_EVALS_PATH):
+                try:
+                    _table = BookEvalTable.load(BOOK_EVALS_PATH)
+                    print(f"Loaded {len(_table)} book evaluations (depth {_table.depth}).")
+                except Exception as e:
+                    print(f"Warning: book evaluations unreadable: {e}")
+            _table_checked = True
+    return _table
+
+
+# --- Offline generation ------------------------------------------------------
+
+def book_positions(eco_json_path: str, polyglot_path: str | None, max_ply: int) -> dict[int, str]:
+    """Zobrist key → FEN for every ECO position and every Polyglot book
+    position reachable from the start within `max_ply` plies."""
+    positions = {}
+    with open(eco_json_path) as f:
+        for fen in json.load(f):
+            board = chess.Board(fen)
+            positions[chess.polyglot.zobrist_hash(board)] = board.fen()
+
+    if polyglot_path and os.path.exists(polyglot_path):
+        with chess.polyglot.open_reader(polyglot_path) as reader:
+            seen = set()
+            frontier = [chess.Board()]
+            for ply in range(max_ply + 1):
+                next_frontier = []
+                for board in frontier:
+                    key = chess.polyglot.zobrist_hash(board)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    positions[key] = board.fen()
+                    if ply == max_ply:
+                        continue
+                    for entry in reader.find_all(board):
+                        child = board.copy(stack=False)
+                        child.push(entry.move)
+                        next_frontier.append(child)
+                frontier = next_frontier
+    return positions
+
+
+def main():
+    from engine_pool import get_pool
+    from game_analysis import ANALYSIS_MULTIPV, _set_multipv, base_dir, polyglot_path
+
+    parser = argparse.ArgumentParser(description="Precompute book position evaluations.")
+    parser.add_argument("--depth", type=int, default=BOOK_EVAL_DEPTH)
+    parser.add_argument("--max-ply", type=int, default=16)
+    parser.add_argument("--out", default=BOOK_EVALS_PATH)
+    args = parser.parse_args()
+
+    positions = book_positions(os.path.join(base_dir, "eco.json"), polyglot_path, args.max_ply)
+    print(f"Evaluating {len(positions)} book positions at depth {args.depth}...")
+
+    pool = get_pool()
+    results = {}
+
+    def evaluate(item):
+        key, fen = item
+        with pool.engine() as engine:
+            engine.set_depth(args.depth)
+            _set_multipv(engine, ANALYSIS_MULTIPV)
+            engine.set_fen_position(fen, send_ucinewgame_token=False)
+            return key, engine.get_top_moves(ANALYSIS_MULTIPV)
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        for n, (key, lines) in enumerate(executor.map(evaluate, positions.items()), 1):
+            if lines:
+                results[key] = lines
+            if n % 500 == 0:
+                print(f"  {n}/{len(positions)}")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    save_table(args.out, results, args.depth)
+    print(f"Wrote {len(results)} book evaluations to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Analyze every game of a (large) multi-game PGN file, offline.
+
+Usage (inside backend container):
+    python bulk_analyze.py <games.pgn> --out analysis.jsonl [--workers 4]
+                           [--format jsonl|parquet] [--mode single_pass]
+                           [--flush-every 100] [--limit N] [--restart]
+
+The file is streamed game by game and fed to a process pool; each worker
+process owns one engine (ENGINE_BACKEND, STOCKFISH_* settings) for its
+whole life, so throughput scales with --workers (default: STOCKFISH_POOL_SIZE).
+At most a few games per worker are in flight and results are written in
+input order as they complete, so memory stays flat however big the file is.
+
+Output:
+    jsonl    one line per game: index, headers, opening, summary, moves
+             (including the raw `engine` data reclassify.py needs)
+    parquet  a directory of part-NNNNN.parquet files, one row per ply with
+             the game columns repeated (needs pyarrow)
+
+After each flush a checkpoint (<out>.checkpoint.json) records the byte
+offset reached in the PGN file and the output written so far. Rerunning
+the same command resumes from there; output past the last checkpoint is
+discarded first, so an interrupted run never duplicates or skips games.
+Pass --restart to ignore an existing checkpoint.
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import time
+
+import game_analysis
+from engine_pool import STOCKFISH_POOL_SIZE
+
+# Games in flight per worker: enough to keep every engine busy while the
+# writer drains results in order, small enough to keep memory flat.
+IN_FLIGHT_PER_WORKER = 4
+
+_HEADER_LINE = re.compile(rb"^(?:\xef\xbb\xbf)?\s*\[[A-Za-z0-9_]+\s+\"")
+
+GAME_HEADERS = ("Event", "Site", "Date", "White", "Black", "Result",
+                "WhiteElo", "BlackElo", "TimeControl", "ECO")
+PLY_COLUMNS = ("move_number", "move_uci", "move_san", "color", "classification",
+               "score", "mate_in", "best_mate_in", "best_move", "opening",
+               "accuracy", "win_percent_before", "win_percent_after", "cp_loss",
+               "captured_piece", "is_sacrifice", "depth")
+
+
+def iter_pgn_games(path: str, offset: int = 0):
+    """Yield (start, end, pgn_text) byte ranges of the games in `path`,
+    starting at byte `offset` (a game boundary from an earlier run).
+
+    Splits on raw lines — a header line after movetext starts a new game —
+    so games are never fully parsed in the reading process.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        lines: list[bytes] = []
+        start = pos = offset
+        in_moves = False
+        for line in f:
+            if _HEADER_LINE.match(line):
+                if in_moves:
+                    yield start, pos, b"".join(lines).decode("utf-8", "replace")
+                    lines = []
+                    start = pos
+                    in_moves = False
+            elif line.strip():
+                in_moves = True
+            elif not lines:
+                # Blank lines between games belong to no game.
+                start = pos + len(line)
+                pos = start
+                continue
+            lines.append(line)
+            pos += len(line)
+        if in_moves:
+            yield start, pos, b"".join(lines).decode("utf-8", "replace")
+
+
+# --- Worker processes --------------------------------------------------------
+
+_worker_engine = None
+_worker_mode = None
+
+
+def _init_worker(mode: str | None) -> None:
+    global _worker_engine, _worker_mode
+    _worker_engine = game_analysis.new_engine()
+    _worker_mode = mode
+
+
+def _analyze_one(task: tuple[int, str]) -> dict:
+    index, pgn = task
+    try:
+        # Per-move log lines from thousands of games are noise here.
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = game_analysis.analyze_game(pgn, mode=_worker_mode, engine=_worker_engine)
+    except Exception as e:
+        return {"index": index, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "index": index,
+        "headers": {k: result["headers"].get(k) for k in GAME_HEADERS},
+        "opening": result["detected_opening"],
+        "summary": result["summary"],
+        "moves": result["moves"],
+    }
+
+
+# --- Output writers ----------------------------------------------------------
+
+class JsonlWriter:
+    """Appends one JSON line per game. Resume state is the file size."""
+
+    def __init__(self, path: str, state: dict | None):
+        self.path = path
+        mode = "r+b" if state and os.path.exists(path) else "wb"
+        self._f = open(path, mode)
+        if state:
+            # Drop anything written after the checkpoint.
+            self._f.truncate(state["bytes"])
+            self._f.seek(state["bytes"])
+
+    def write(self, records: list[dict]) -> None:
+        for record in records:
+            self._f.write(json.dumps(record).encode() + b"\n")
+
+    def flush(self) -> dict:
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return {"bytes": self._f.tell()}
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class ParquetWriter:
+    """Writes each flushed batch as its own part file (one row per ply), so
+    a finished part is never reopened. Resume state is the part count."""
+
+    def __init__(self, path: str, state: dict | None):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("--format parquet needs pyarrow (pip install pyarrow)")
+        self.path = path
+        self.parts = state["parts"] if state else 0
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            match = re.fullmatch(r"part-(\d+)\.parquet", name)
+            if match and int(match.group(1)) >= self.parts:
+                os.remove(os.path.join(path, name))
+        self._rows: list[dict] = []
+
+    def write(self, records: list[dict]) -> None:
+        for record in records:
+            if "error" in record:
+                continue
+            game = {
+                "game_index": record["index"],
+                **{f"game_{k.lower()}": v for k, v in record["headers"].items()},
+                "game_opening": record["opening"],
+                "white_accuracy": record["summary"]["white"]["accuracy"],
+                "black_accuracy": record["summary"]["black"]["accuracy"],
+            }
+            for move in record["moves"]:
+                row = dict(game)
+                row.update({col: move.get(col) for col in PLY_COLUMNS})
+                row["engine_data"] = json.dumps(move.get("engine"))
+                self._rows.append(row)
+
+    def flush(self) -> dict:
+        if self._rows:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            part = os.path.join(self.path, f"part-{self.parts:05d}.parquet")
+            pq.write_table(pa.Table.from_pylist(self._rows), part + ".tmp")
+            os.replace(part + ".tmp", part)
+            self.parts += 1
+            self._rows = []
+        return {"parts": self.parts}
+
+    def close(self) -> None:
+        pass
+
+
+WRITERS = {"jsonl": JsonlWriter, "parquet": ParquetWriter}
+
+
+# --- Checkpoints -------------------------------------------------------------
+
+def load_checkpoint(path: str, pgn_path: str, out: str, fmt: str) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    expected = {"input": os.path.abspath(pgn_path), "out": os.path.abspath(out), "format": fmt}
+    for key, value in expected.items():
+        if checkpoint.get(key) != value:
+            raise SystemExit(f"Checkpoint {path} is for {key}={checkpoint.get(key)!r}, "
+                             f"not {value!r}; pass --restart to start over.")
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+# --- Driver ------------------------------------------------------------------
+
+def run(pgn_path: str, out: str, fmt: str = "jsonl", workers: int = STOCKFISH_POOL_SIZE,
+        mode: str | None = None, flush_every: int = 100, limit: int | None = None,
+        restart: bool = False) -> dict:
+    """Analyze `pgn_path` into `out`, resuming from its checkpoint. Returns
+    the final checkpoint ({"games", "errors", "offset", ...})."""
+    checkpoint_path = out + ".checkpoint.json"
+    checkpoint = None if restart else load_checkpoint(checkpoint_path, pgn_path, out, fmt)
+    if checkpoint is None:
+        checkpoint = {
+            "input": os.path.abspath(pgn_path), "out": os.path.abspath(out), "format": fmt,
+            "offset": 0, "games": 0, "errors": 0, "writer": None,
+        }
+    elif checkpoint["offset"]:
+        print(f"Resuming after {checkpoint['games']} games (byte {checkpoint['offset']}).")
+
+    writer = WRITERS[fmt](out, checkpoint["writer"])
+    pending = collections.deque()
+    window = max(1, workers) * IN_FLIGHT_PER_WORKER
+    batch: list[dict] = []
+    games = checkpoint["games"]
+    errors = checkpoint["errors"]
+    started = time.perf_counter()
+    done_this_run = 0
+
+    def commit(offset: int) -> None:
+        writer.write(batch)
+        checkpoint.update(writer=writer.flush(), offset=offset, games=games, errors=errors)
+        save_checkpoint(checkpoint_path, checkpoint)
+        batch.clear()
+        elapsed = time.perf_counter() - started
+        print(f"  {games} games ({errors} errors), {done_this_run / elapsed:.2f} games/s")
+
+    def drain_one() -> None:
+        nonlocal games, errors, done_this_run
+        end, result = pending.popleft()
+        record = result.get()
+        if "error" in record:
+            errors += 1
+            print(f"Game {record['index']}: {record['error']}")
+        batch.append(record)
+        games += 1
+        done_this_run += 1
+        if len(batch) >= flush_every:
+            commit(end)
+
+    last_end = checkpoint["offset"]
+    # Spawn, not fork: the parent may already hold engine watchdog threads
+    # and SQLite connections that must not be copied into the workers.
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(max(1, workers), initializer=_init_worker, initargs=(mode,)) as pool:
+        try:
+            index = games
+            for _, end, pgn in iter_pgn_games(pgn_path, checkpoint["offset"]):
+                if limit is not None and index >= limit:
+                    break
+                pending.append((end, pool.apply_async(_analyze_one, ((index, pgn),))))
+                index += 1
+                last_end = end
+                while len(pending) >= window:
+                    drain_one()
+            while pending:
+                drain_one()
+            commit(last_end)
+        finally:
+            writer.close()
+    return checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze every game of a PGN file offline.")
+    parser.add_argument("pgn", help="multi-game PGN file")
+    parser.add_argument("--out", required=True, help="output .jsonl file or parquet directory")
+    parser.add_argument("--format", choices=sorted(WRITERS), default=None,
+                        help="default: parquet if --out ends in .parquet, else jsonl")
+    parser.add_argument("--workers", type=int, default=STOCKFISH_POOL_SIZE,
+                        help="worker processes, one engine each")
+    parser.add_argument("--mode", default=None, help="analysis mode (default: ANALYSIS_MODE)")
+    parser.add_argument("--flush-every", type=int, default=100, help="games per checkpoint")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many games")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.out.endswith(".parquet") else "jsonl")
+    print(f"Analyzing {args.pgn} with {args.workers} workers "
+          f"(mode {args.mode or game_analysis.ANALYSIS_MODE}) -> {args.out} ({fmt})")
+    checkpoint = run(args.pgn, args.out, fmt=fmt, workers=args.workers, mode=args.mode,
+                     flush_every=args.flush_every, limit=args.limit, restart=args.restart)
+    print(f"Done: {checkpoint['games']} games, {checkpoint['errors']} errors.")
+
+
+if __name__ == "__main__":
+    main()
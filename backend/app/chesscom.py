@@ -1,5 +1,9 @@
+import time
+
 import requests
 
+from metrics import CHESSCOM_REQUEST_SECONDS
+
 
 class ChessComClient:
     def __init__(self):
@@ -8,18 +12,28 @@ class ChessComClient:
         }
         self.base_url = "https://api.chess.com/pub"
 
+    def _get(self, url: str, endpoint: str):
+        """GET `url`, raising for HTTP errors; latency is recorded per endpoint."""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            res = requests.get(url, headers=self.headers)
+            res.raise_for_status()
+            outcome = "ok"
+            return res
+        finally:
+            CHESSCOM_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint, outcome)
+
     def get_recent_games(self, username: str):
         """Yield games newest-first, walking monthly archives until exhausted."""
         archives_url = f"{self.base_url}/player/{username}/games/archives"
         try:
-            res = requests.get(archives_url, headers=self.headers)
-            res.raise_for_status()
+            res = self._get(archives_url, "archives")
             archives = res.json().get('archives', [])
 
             for month_url in reversed(archives):
                 try:
-                    month_res = requests.get(month_url, headers=self.headers)
-                    month_res.raise_for_status()
+                    month_res = self._get(month_url, "month")
                     month_games = month_res.json().get('games', [])
                     for game in reversed(month_games):
                         yield game
@@ -35,14 +49,12 @@ class ChessComClient:
         target = opponent_username.lower()
         try:
             archive_url = f"{self.base_url}/player/{username}/games/archives"
-            res = requests.get(archive_url, headers=self.headers)
-            res.raise_for_status()
+            res = self._get(archive_url, "archives")
             archives = res.json().get('archives', [])
 
             for month_url in reversed(archives):
                 try:
-                    games_res = requests.get(month_url, headers=self.headers)
-                    games_res.raise_for_status()
+                    games_res = self._get(month_url, "month")
                     for game in reversed(games_res.json().get('games', [])):
                         white = game.get('white', {}).get('username', '').lower()
                         black = game.get('black', {}).get('username', '').lower()
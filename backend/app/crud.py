@@ -1,7 +1,10 @@
 from sqlalchemy.orm import Session
 from models import Game, MoveAnalysis
+from metrics import DB_WRITE_SECONDS
 
-def save_game(db: Session, game_data: dict, summary: dict = None):
+def save_game(db: Session, game_data: dict, summary: dict = None, commit: bool = True):
+    # commit=False only flushes (the id is still assigned); the caller commits
+    # several games at once.
     # Extract relevant fields from nested JSON structure
     white_info = game_data.get('white', {})
     black_info = game_data.get('black', {})
@@ -31,42 +34,101 @@ def save_game(db: Session, game_data: dict, summary: dict = None):
         black_result=black_info.get('result'),
         black_accuracy=black_stats.get('accuracy'),
         black_move_counts=black_stats.get('classification_counts', {}),
+
+        provisional=game_data.get('provisional', False),
+        analysis_depth=game_data.get('analysis_depth'),
     )
 
-    # Check if exists
-    existing_game = db.query(Game).filter(Game.url == new_game.url).first()
-    if not existing_game:
-        db.add(new_game)
-        # Commit to generate ID
-        db.commit()
-        db.refresh(new_game)
-        print(f"Game saved: {new_game.url}")
-        return new_game
-    else:
-        print(f"Game already exists: {new_game.url}")
-        return existing_game
+    with DB_WRITE_SECONDS.time("save_game"):
+        # Check if exists
+        existing_game = db.query(Game).filter(Game.url == new_game.url).first()
+        if not existing_game:
+            db.add(new_game)
+            # Commit to generate ID
+            if commit:
+                db.commit()
+                db.refresh(new_game)
+            else:
+                db.flush()
+            print(f"Game saved: {new_game.url}")
+            return new_game
+        else:
+            print(f"Game already exists: {new_game.url}")
+            return existing_game
 
-def save_analysis(db: Session, game_id: int, analysis_results: list):
-    # First, delete existing analysis for this game to avoid duplicates if re-analyzing
-    db.query(MoveAnalysis).filter(MoveAnalysis.game_id == game_id).delete()
+def save_analysis(db: Session, game_id: int, analysis_results: list, provisional: bool = False,
+                  commit: bool = True):
+    with DB_WRITE_SECONDS.time("save_analysis"):
+        # First, delete existing analysis for this game to avoid duplicates if re-analyzing
+        db.query(MoveAnalysis).filter(MoveAnalysis.game_id == game_id).delete()
     
-    for result in analysis_results:
-        analysis = MoveAnalysis(
-            game_id=game_id,
-            move_number=result['move_number'],
-            move_uci=result['move_uci'],
-            move_san=result.get('move_san'),
-            score=result['score'],
-            mate_in=result.get('mate_in'),
-            best_mate_in=result.get('best_mate_in'),
-            classification=result['classification'],
-            color=result.get('color'),
-            best_move=result['best_move'],
-            opening=result['opening'],
-            captured_piece=result.get('captured_piece'),
-            is_sacrifice=str(result.get('is_sacrifice', False)).lower()
-        )
-        db.add(analysis)
+        for result in analysis_results:
+            analysis = MoveAnalysis(
+                game_id=game_id,
+                move_number=result['move_number'],
+                move_uci=result['move_uci'],
+                move_san=result.get('move_san'),
+                score=result['score'],
+                mate_in=result.get('mate_in'),
+                best_mate_in=result.get('best_mate_in'),
+                classification=result['classification'],
+                color=result.get('color'),
+                best_move=result['best_move'],
+                opening=result['opening'],
+                captured_piece=result.get('captured_piece'),
+                is_sacrifice=str(result.get('is_sacrifice', False)).lower(),
+                engine_data=result.get('engine'),
+                depth=result.get('depth'),
+                provisional=provisional,
+            )
+            db.add(analysis)
     
-    db.commit()
-    print(f"Saved {len(analysis_results)} analysis moves for Game ID {game_id}")
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        print(f"Saved {len(analysis_results)} analysis moves for Game ID {game_id}")
+
+def refine_analysis(db: Session, game: Game, analysis_results: list, summary: dict,
+                    commit: bool = True):
+    """Upgrade a provisional (preview) analysis in place to the full-depth
+    results: same MoveAnalysis rows and ids, new labels and scores, and the
+    game's accuracies and counts recomputed."""
+    with DB_WRITE_SECONDS.time("refine_analysis"):
+        rows = (
+            db.query(MoveAnalysis)
+            .filter(MoveAnalysis.game_id == game.id)
+            .order_by(MoveAnalysis.id)
+            .all()
+        )
+        if len(rows) != len(analysis_results):
+            # Shouldn't happen for the same PGN; start over rather than misalign.
+            save_analysis(db, game.id, analysis_results, commit=False)
+        else:
+            for row, result in zip(rows, analysis_results):
+                if row.classification != result['classification']:
+                    row.llm_review = None  # explained the preview label
+                row.score = result['score']
+                row.mate_in = result.get('mate_in')
+                row.best_mate_in = result.get('best_mate_in')
+                row.classification = result['classification']
+                row.best_move = result['best_move']
+                row.opening = result['opening']
+                row.engine_data = result.get('engine')
+                row.depth = result.get('depth')
+                row.provisional = False
+
+        white_stats = summary.get('white', {})
+        black_stats = summary.get('black', {})
+        game.white_accuracy = white_stats.get('accuracy')
+        game.white_move_counts = white_stats.get('classification_counts', {})
+        game.black_accuracy = black_stats.get('accuracy')
+        game.black_move_counts = black_stats.get('classification_counts', {})
+        game.provisional = False
+        game.analysis_depth = max((r.get('depth') or 0 for r in analysis_results), default=None)
+        game.ai_insight_cache = None
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+    print(f"Refined {len(analysis_results)} analysis moves for Game ID {game.id}")
@@ -16,6 +16,26 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) #cre
 Base = declarative_base() #create a base class for models
 
 
+def add_missing_columns(bind=engine):
+    """create_all() only creates missing tables. For tables that already
+    exist, add any model columns they lack (all new columns are nullable or
+    defaulted), so adding a field doesn't need a manual migration."""
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
+                print(f"Added column {table.name}.{column.name}")
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -34,6 +54,7 @@ def init_db():
     while retries > 0:
         try:
             Base.metadata.create_all(bind=engine)
+            add_missing_columns(engine)
             print("Database connected and initialized successfully.", flush=True)
             return
         except Exception as e:
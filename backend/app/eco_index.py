@@ -0,0 +1,158 @@
+"""
+Compact ECO opening index keyed by a 64-bit position hash.
+
+eco.json (~1.1 MB, FEN → opening) used to be parsed at import by every
+process, and each ply then generated a FEN and string-split it to look a
+position up. This module compiles eco.json once into `eco_index.npz`:
+
+    keys       uint64, sorted   position hash (see `eco_key`)
+    name_ids   uint32           index into the names table per key
+    names      uint8            UTF-8 opening names joined by "\\n"
+    ecos       uint8            ECO codes joined by "\\n", aligned with names
+
+and loads it lazily on the first lookup. Positions are matched by the
+Polyglot Zobrist hash with the en-passant term removed — the same
+normalization as the old "placement + side to move + castling" FEN key.
+
+Build step (also run in the Dockerfile):
+    python eco_index.py
+If the index is missing or older than eco.json it is rebuilt on first use.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+
+import chess
+import chess.polyglot
+import numpy as np
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+ECO_JSON_PATH = os.path.join(base_dir, "eco.json")
+ECO_INDEX_PATH = os.path.join(base_dir, "eco_index.npz")
+
+_hasher = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
+
+def eco_key(board: chess.Board, zobrist: int | None = None) -> int:
+    """Position hash ignoring en passant (and, like Zobrist, move counters).
+
+    Pass the position's Polyglot `zobrist` hash if it's already known: the
+    en-passant term is XORed back out instead of rehashing the board.
+    """
+    if zobrist is None:
+        zobrist = chess.polyglot.zobrist_hash(board)
+    return zobrist ^ _hasher.hash_ep_square(board)
+
+
+def _compile(json_path: str):
+    """eco.json → (keys, name_ids, names, ecos) arrays/lists for the index."""
+    with open(json_path, "r") as f:
+        raw_data = json.load(f)
+
+    # Later entries win on duplicate positions, as with the old dict load.
+    by_key = {}
+    for fen, info in raw_data.items():
+        by_key[eco_key(chess.Board(fen))] = (info.get("name", ""), info.get("eco", ""))
+
+    entries = sorted(set(by_key.values()))
+    entry_id = {entry: i for i, entry in enumerate(entries)}
+    keys = np.array(sorted(by_key), dtype=np.uint64)
+    name_ids = np.array([entry_id[by_key[int(k)]] for k in keys], dtype=np.uint32)
+    return keys, name_ids, [n for n, _ in entries], [e for _, e in entries]
+
+
+def build_index(json_path: str = ECO_JSON_PATH, out_path: str = ECO_INDEX_PATH) -> int:
+    """Compile eco.json into the binary index. Returns the number of positions."""
+    keys, name_ids, names, ecos = _compile(json_path)
+
+    def blob(strings):
+        return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+    # API, worker and bulk_analyze processes may rebuild at the same time:
+    # write a private temp file and rename it over the index, so a reader
+    # sees the old file or the new one, never a partial write.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(out_path) or ".", suffix=".npz.tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, keys=keys, name_ids=name_ids, names=blob(names), ecos=blob(ecos))
+        os.chmod(tmp_path, 0o644)  # mkstemp creates it owner-only
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(keys)
+
+
+class EcoIndex:
+    def __init__(self, keys: np.ndarray, name_ids: np.ndarray, names: list[str], ecos: list[str]):
+        self.keys = keys
+        self.name_ids = name_ids
+        self.names = names
+        self.ecos = ecos
+
+    @classmethod
+    def load(cls, path: str = ECO_INDEX_PATH) -> "EcoIndex":
+        with np.load(path, allow_pickle=False) as data:
+            names = data["names"].tobytes().decode("utf-8").split("\n")
+            ecos = data["ecos"].tobytes().decode("utf-8").split("\n")
+            return cls(data["keys"], data["name_ids"], names, ecos)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, key: int) -> dict | None:
+        key = np.uint64(key)
+        i = np.searchsorted(self.keys, key)
+        if i >= len(self.keys) or self.keys[i] != key:
+            return None
+        n = self.name_ids[i]
+        return {"name": self.names[n], "eco": self.ecos[n]}
+
+
+_index: EcoIndex | None = None
+_index_failed = False
+_index_lock = threading.Lock()
+
+
+def _is_stale(index_path: str, json_path: str) -> bool:
+    if not os.path.exists(index_path):
+        return True
+    return os.path.exists(json_path) and os.path.getmtime(json_path) > os.path.getmtime(index_path)
+
+
+def get_eco_index() -> EcoIndex | None:
+    """Shared index, loaded (and compiled if needed) on first use."""
+    global _index, _index_failed
+    if _index is not None or _index_failed:
+        return _index
+    with _index_lock:
+        if _index is None and not _index_failed:
+            try:
+                if _is_stale(ECO_INDEX_PATH, ECO_JSON_PATH):
+                    try:
+                        build_index()
+                    except OSError:
+                        # Read-only app dir: compile in memory for this process.
+                        _index = EcoIndex(*_compile(ECO_JSON_PATH))
+                if _index is None:
+                    try:
+                        _index = EcoIndex.load()
+                    except Exception as e:
+                        # Unreadable index file: don't lose Book/ECO labels
+                        # over it, eco.json still has everything.
+                        print(f"Warning: could not load ECO index ({e}); compiling eco.json in memory.")
+                        _index = EcoIndex(*_compile(ECO_JSON_PATH))
+                print(f"Loaded {len(_index)} openings (ECO index).")
+            except Exception as e:
+                # Only eco.json itself being missing or unreadable ends up here.
+                print(f"Warning: ECO data missing: {e}")
+                _index_failed = True
+    return _index
+
+
+if __name__ == "__main__":
+    count = build_index()
+    print(f"Wrote {count} positions to {ECO_INDEX_PATH}")
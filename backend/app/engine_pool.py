@@ -0,0 +1,126 @@
+"""
+Pool of Stockfish processes for analyzing several games at once.
+
+A single module-global engine serializes every background job behind one
+process (and concurrent BackgroundTasks threads race on it). The pool keeps
+up to N independent engines; callers check one out for the duration of a
+game and hand it back when done:
+
+    with get_pool().engine() as engine:
+        analyze_game(pgn, engine=engine)
+
+N defaults to cores // STOCKFISH_THREADS so the engines together use the
+whole machine without oversubscribing it. Note each engine allocates its own
+STOCKFISH_HASH_MB of hash table.
+"""
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from game_analysis import STOCKFISH_THREADS, new_engine
+
+
+def default_pool_size() -> int:
+    configured = os.getenv("STOCKFISH_POOL_SIZE")
+    if configured:
+        return max(1, int(configured))
+    return max(1, (os.cpu_count() or 1) // max(1, STOCKFISH_THREADS))
+
+
+STOCKFISH_POOL_SIZE = default_pool_size()
+
+
+class EnginePool:
+    """Fixed-size set of engines, spawned lazily on first checkout."""
+
+    def __init__(self, size: int = STOCKFISH_POOL_SIZE, factory=new_engine):
+        self.size = size
+        self._factory = factory
+        self._idle: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._spawned = 0
+
+    def _acquire(self, block: bool = True):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                spawn = self._spawned < self.size
+                if spawn:
+                    self._spawned += 1
+            if spawn:
+                try:
+                    return self._factory()
+                except Exception:
+                    with self._lock:
+                        self._spawned -= 1
+                    raise
+            if not block:
+                return None
+            # Every engine is busy: wait for one to come back. The timeout
+            # re-checks capacity in case a broken engine was discarded.
+            try:
+                return self._idle.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+    def _discard(self, engine):
+        # The Stockfish wrapper sends "quit" to its process when the object is
+        # collected; the chess.engine backend needs an explicit quit().
+        with self._lock:
+            self._spawned -= 1
+        quit_engine = getattr(engine, "quit", None)
+        if quit_engine is not None:
+            try:
+                quit_engine()
+            except Exception:
+                pass
+
+    def checkout(self, block: bool = True):
+        """Take an engine out of the pool. With block=False returns None
+        instead of waiting when every engine is busy."""
+        return self._acquire(block)
+
+    def checkin(self, engine, broken: bool = False):
+        """Return a checked-out engine; broken ones are replaced later."""
+        if broken:
+            self._discard(engine)
+        else:
+            self._idle.put(engine)
+
+    @contextmanager
+    def engine(self):
+        """Check out an engine for exclusive use. An engine whose caller
+        raised is assumed broken and replaced on the next checkout."""
+        engine = self.checkout()
+        try:
+            yield engine
+        except BaseException:
+            self.checkin(engine, broken=True)
+            raise
+        self.checkin(engine)
+
+    def close(self):
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(engine)
+
+
+_pool: EnginePool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> EnginePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = EnginePool()
+        return _pool
@@ -0,0 +1,222 @@
+"""
+Out-of-band supervision of engine processes.
+
+`_get_engine()` used to run a 10 ms search before every game just to learn
+whether Stockfish was still alive. Instead, every engine from `new_engine()`
+is wrapped in a `SupervisedEngine`:
+
+- Calls go straight to the engine. If one fails *because the process died*
+  (segfault, OOM kill), the engine is respawned with the same depth, options
+  and position and the call is retried — at most ENGINE_MAX_RESTARTS times.
+  Errors from a live process are raised as before.
+- A watchdog thread visits every engine each ENGINE_WATCHDOG_INTERVAL
+  seconds. Idle engines are checked with a process poll plus `isready`
+  (answered within ENGINE_READY_TIMEOUT) and respawned if either fails; a
+  call running longer than ENGINE_CALL_TIMEOUT has its process killed, so
+  the stuck call fails over to a fresh engine instead of hanging the job.
+
+Restarts are logged and counted per engine (`.restarts`) and process-wide
+(`total_restarts()`).
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import weakref
+
+ENGINE_WATCHDOG_INTERVAL = float(os.getenv("ENGINE_WATCHDOG_INTERVAL", "10"))
+ENGINE_READY_TIMEOUT = float(os.getenv("ENGINE_READY_TIMEOUT", "5"))
+ENGINE_CALL_TIMEOUT = float(os.getenv("ENGINE_CALL_TIMEOUT", "300"))
+ENGINE_MAX_RESTARTS = int(os.getenv("ENGINE_MAX_RESTARTS", "3"))
+
+
+# --- Process probes ------------------------------------------------------------
+# UciEngine implements is_alive / ping / kill itself; the Stockfish PyPI
+# wrapper only exposes its subprocess.Popen as `_stockfish`.
+
+def process_alive(engine) -> bool:
+    if hasattr(engine, "is_alive"):
+        return engine.is_alive()
+    process = getattr(engine, "_stockfish", None)
+    return process is None or process.poll() is None
+
+
+def ping(engine, timeout: float = ENGINE_READY_TIMEOUT) -> bool:
+    """True if the engine answers `isready` within `timeout` seconds."""
+    if hasattr(engine, "ping"):
+        return engine.ping(timeout)
+    if not hasattr(engine, "_stockfish"):
+        return True
+    # The wrapper reads with a blocking readline, so wait on a helper thread.
+    # If it never answers the caller kills the process, which ends the read.
+    answered = threading.Event()
+
+    def is_ready():
+        try:
+            engine._is_ready()
+            answered.set()
+        except Exception:
+            pass
+
+    threading.Thread(target=is_ready, daemon=True).start()
+    return answered.wait(timeout)
+
+
+def kill(engine) -> None:
+    if hasattr(engine, "kill"):
+        engine.kill()
+        return
+    process = getattr(engine, "_stockfish", None)
+    if process is not None and process.poll() is None:
+        process.kill()
+        process.wait()
+
+
+# --- Supervised engine ---------------------------------------------------------
+
+_restart_lock = threading.Lock()
+_total_restarts = 0
+
+
+def total_restarts() -> int:
+    return _total_restarts
+
+
+class SupervisedEngine:
+    """Stand-in for the engine returned by `factory` that survives crashes."""
+
+    def __init__(self, factory, max_restarts: int = ENGINE_MAX_RESTARTS):
+        self._factory = factory
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self._engine = factory()
+        self._lock = threading.RLock()
+        self._busy_since: float | None = None
+        self._closed = False
+        # State replayed onto a respawned process.
+        self._depth = None
+        self._parameter_updates: dict = {}
+        self._fen: str | None = None
+        _watchdog.watch(self)
+
+    @property
+    def depth(self):
+        return self._engine.depth
+
+    def _restart(self, reason: str) -> None:
+        global _total_restarts
+        kill(self._engine)
+        self._engine = self._factory()
+        if self._depth is not None:
+            self._engine.set_depth(self._depth)
+        if self._parameter_updates:
+            self._engine.update_engine_parameters(dict(self._parameter_updates))
+        if self._fen is not None:
+            self._engine.set_fen_position(self._fen, send_ucinewgame_token=True)
+        self.restarts += 1
+        with _restart_lock:
+            _total_restarts += 1
+        print(f"Engine restarted ({reason}); {self.restarts} restart(s) for this engine.")
+
+    def _call(self, method: str, *args, **kwargs):
+        with self._lock:
+            self._busy_since = time.monotonic()
+            try:
+                for attempt in range(self.max_restarts + 1):
+                    try:
+                        return getattr(self._engine, method)(*args, **kwargs)
+                    except Exception:
+                        if attempt == self.max_restarts or process_alive(self._engine):
+                            raise
+                        self._restart(f"process died during {method}")
+            finally:
+                self._busy_since = None
+
+    def get_parameters(self) -> dict:
+        return self._engine.get_parameters()
+
+    def update_engine_parameters(self, parameters: dict | None) -> None:
+        self._parameter_updates.update(parameters or {})
+        self._call("update_engine_parameters", parameters)
+
+    def set_depth(self, depth_value: int = 2) -> None:
+        self._depth = depth_value
+        self._engine.set_depth(depth_value)
+
+    def set_fen_position(self, fen_position: str, send_ucinewgame_token: bool = True) -> None:
+        self._fen = fen_position
+        self._call("set_fen_position", fen_position, send_ucinewgame_token=send_ucinewgame_token)
+
+    def get_top_moves(self, num_top_moves: int = 5) -> list[dict]:
+        return self._call("get_top_moves", num_top_moves)
+
+    def get_evaluation(self) -> dict:
+        return self._call("get_evaluation")
+
+    def get_best_move_time(self, time: int = 1000) -> str | None:
+        return self._call("get_best_move_time", time)
+
+    def check(self, ready_timeout: float = ENGINE_READY_TIMEOUT,
+              call_timeout: float = ENGINE_CALL_TIMEOUT) -> None:
+        """One watchdog visit (see module docstring)."""
+        busy_since = self._busy_since
+        if busy_since is not None:
+            if time.monotonic() - busy_since > call_timeout:
+                print(f"Engine call exceeded {call_timeout:.0f}s; killing the process.")
+                kill(self._engine)
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self._closed:
+                return
+            if not process_alive(self._engine):
+                self._restart("process exited while idle")
+            elif not ping(self._engine, ready_timeout):
+                self._restart(f"no readyok within {ready_timeout:.0f}s")
+        except Exception as e:
+            print(f"Warning: engine watchdog check failed: {e}")
+        finally:
+            self._lock.release()
+
+    def quit(self) -> None:
+        with self._lock:
+            self._closed = True
+            _watchdog.unwatch(self)
+            # The Stockfish wrapper quits its process when collected.
+            quit_engine = getattr(self._engine, "quit", None)
+            if quit_engine is not None:
+                quit_engine()
+
+
+class _Watchdog:
+    """Daemon thread running `check()` on every live SupervisedEngine."""
+
+    def __init__(self, interval: float = ENGINE_WATCHDOG_INTERVAL):
+        self.interval = interval
+        self._engines: weakref.WeakSet = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def watch(self, engine: SupervisedEngine) -> None:
+        with self._lock:
+            self._engines.add(engine)
+            if self._thread is None and self.interval > 0:
+                self._thread = threading.Thread(target=self._run, name="engine-watchdog", daemon=True)
+                self._thread.start()
+
+    def unwatch(self, engine: SupervisedEngine) -> None:
+        with self._lock:
+            self._engines.discard(engine)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                engines = list(self._engines)
+            for engine in engines:
+                engine.check()
+
+
+_watchdog = _Watchdog()
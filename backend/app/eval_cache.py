@@ -0,0 +1,112 @@
+"""
+Persistent cross-game cache of engine searches.
+
+Every imported game replays the same opening positions, so searches are
+stored in an embedded SQLite file keyed by the position's Polyglot Zobrist
+hash plus the search depth and MultiPV width. `game_analysis` consults the
+cache before each engine call and populates it afterwards.
+
+A row holds the engine result exactly as the Stockfish wrapper returned it:
+the `get_top_moves()` line list (Move / Centipawn / Mate, White's frame), or
+for `multipv = EVALUATION_MULTIPV` the `get_evaluation()` dict searched at
+MultiPV 1. (Rows with `multipv = 0` came from builds that could store the
+2nd-best line's score there and are never read.) Clear the file after changing
+the Stockfish build — cached scores are only as good as the engine that
+produced them.
+
+The file lives on the `eval_cache` volume (see docker-compose.yml) and is
+shared by every process on the box; WAL mode lets readers proceed while one
+writer commits. Set EVAL_CACHE_PATH to an empty string to disable caching.
+It is never used with ENGINE_BACKEND=fake.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+
+EVAL_CACHE_PATH = os.getenv("EVAL_CACHE_PATH", "/app/data/cache/evals.sqlite3")
+
+## `multipv` slot for get_evaluation() results.
+EVALUATION_MULTIPV = -1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS position_evals (
+    zobrist INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    multipv INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (zobrist, depth, multipv)
+) WITHOUT ROWID
+"""
+
+
+def _signed(key: int) -> int:
+    """SQLite integers are signed 64-bit; Zobrist hashes are unsigned."""
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+class EvalCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        # Create the schema eagerly so a bad path fails at startup, not mid-game.
+        self._conn()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads; the engine
+        # pool analyzes games on several threads at once.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def get(self, zobrist: int, depth: int, multipv: int):
+        row = self._conn().execute(
+            "SELECT result FROM position_evals WHERE zobrist = ? AND depth = ? AND multipv = ?",
+            (_signed(zobrist), depth, multipv),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, zobrist: int, depth: int, multipv: int, result) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO position_evals (zobrist, depth, multipv, result) VALUES (?, ?, ?, ?)",
+            (_signed(zobrist), depth, multipv, json.dumps(result)),
+        )
+        conn.commit()
+
+
+_cache: EvalCache | None = None
+_cache_failed = False
+_cache_lock = threading.Lock()
+
+
+def get_eval_cache() -> EvalCache | None:
+    """Shared cache instance, or None when disabled or unavailable."""
+    global _cache, _cache_failed
+    if not EVAL_CACHE_PATH or _cache_failed:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                os.makedirs(os.path.dirname(EVAL_CACHE_PATH) or ".", exist_ok=True)
+                _cache = EvalCache(EVAL_CACHE_PATH)
+                print(f"Eval cache opened: {EVAL_CACHE_PATH}")
+            except Exception as e:
+                print(f"Warning: eval cache unavailable ({e}). Searching without it.")
+                _cache_failed = True
+                return None
+        return _cache
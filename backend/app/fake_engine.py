@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Deterministic stand-in for Stockfish, for tests and benchmarks.
+
+Scores come from material (P=100 N=B=300 R=500 Q=900) plus a seeded
+pseudo-random term per position (a hash of the Polyglot Zobrist key and the
+seed, in ±FAKE_ENGINE_NOISE_CP), and checkmate is reported as a mate score.
+So the same position always gets the same score, captures and blunders look
+like captures and blunders, and runs are reproducible. Each search
+optionally sleeps FAKE_ENGINE_LATENCY_MS to model engine time, which lets a
+benchmark separate our own Python overhead from time spent "searching".
+
+Two ways to use it:
+
+- In process: `FakeEngine` implements the subset of the `stockfish.Stockfish`
+  wrapper that `game_analysis` uses. Selected with ENGINE_BACKEND=fake.
+- As a UCI program: `python fake_engine.py [--seed N] [--latency-ms N]`
+  speaks enough UCI for both the Stockfish wrapper and `chess.engine`, so
+  it can be pointed to by STOCKFISH_PATH to exercise the real process and
+  pipe handling.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+import chess
+import chess.polyglot
+
+FAKE_ENGINE_SEED = int(os.getenv("FAKE_ENGINE_SEED", "0"))
+FAKE_ENGINE_LATENCY_MS = float(os.getenv("FAKE_ENGINE_LATENCY_MS", "0"))
+FAKE_ENGINE_NOISE_CP = 20
+
+_PIECE_VALUES = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 300, chess.ROOK: 500, chess.QUEEN: 900}
+_MASK64 = (1 << 64) - 1
+
+
+def _mix(x: int) -> int:
+    """splitmix64 finalizer: a well-spread 64-bit hash of x."""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def evaluate(board: chess.Board, seed: int = FAKE_ENGINE_SEED) -> dict:
+    """Static score of the position, White's frame: {"Centipawn", "Mate"}."""
+    if board.is_checkmate():
+        # Side to move is mated; "mate 0" from its own point of view.
+        return {"Centipawn": None, "Mate": 0}
+    if board.is_game_over():
+        return {"Centipawn": 0, "Mate": None}
+    material = 0
+    for piece_type, value in _PIECE_VALUES.items():
+        material += value * len(board.pieces(piece_type, chess.WHITE))
+        material -= value * len(board.pieces(piece_type, chess.BLACK))
+    key = chess.polyglot.zobrist_hash(board)
+    noise = _mix(key ^ _mix(seed)) % (2 * FAKE_ENGINE_NOISE_CP + 1) - FAKE_ENGINE_NOISE_CP
+    return {"Centipawn": material + noise, "Mate": None}
+
+
+def _sort_value(line: dict, turn: chess.Color) -> float:
+    """Higher is better for the side to move."""
+    sign = 1 if turn == chess.WHITE else -1
+    if line["Mate"] is not None:
+        return 100000 - abs(line["Mate"]) if line["Mate"] * sign > 0 else -100000
+    return sign * line["Centipawn"]
+
+
+def top_lines(board: chess.Board, n: int, seed: int = FAKE_ENGINE_SEED) -> list[dict]:
+    """One-ply search: every legal move scored by the position it leads to,
+    best first, as get_top_moves() lines (White's frame)."""
+    lines = []
+    for move in board.legal_moves:
+        board.push(move)
+        if board.is_checkmate():
+            line = {"Move": move.uci(), "Centipawn": None,
+                    "Mate": 1 if board.turn == chess.BLACK else -1}
+        else:
+            line = {"Move": move.uci(), **evaluate(board, seed)}
+        board.pop()
+        lines.append(line)
+    # Ties break on the move string so the order never depends on generation order.
+    lines.sort(key=lambda l: (-_sort_value(l, board.turn), l["Move"]))
+    return lines[:n]
+
+
+class FakeEngine:
+    """In-process drop-in for `stockfish.Stockfish` (see module docstring)."""
+
+    def __init__(self, depth: int = 15, parameters: dict | None = None,
+                 seed: int = FAKE_ENGINE_SEED, latency_ms: float = FAKE_ENGINE_LATENCY_MS):
+        self.depth = str(depth)
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.searches = 0
+        self._parameters = {"MultiPV": 1}
+        self._board = chess.Board()
+        self._alive = True
+        self.update_engine_parameters(parameters)
+
+    def _search(self) -> None:
+        self.searches += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def get_parameters(self) -> dict:
+        return self._parameters
+
+    def update_engine_parameters(self, parameters: dict | None) -> None:
+        self._parameters.update(parameters or {})
+
+    def set_depth(self, depth_value: int = 2) -> None:
+        self.depth = str(depth_value)
+
+    def set_fen_position(self, fen_position: str, send_ucinewgame_token: bool = True) -> None:
+        self._board = chess.Board(fen_position)
+
+    def get_top_moves(self, num_top_moves: int = 5) -> list[dict]:
+        self._search()
+        return top_lines(self._board, num_top_moves, self.seed)
+
+    def get_evaluation(self) -> dict:
+        # Score of the best line, as a real engine reports it.
+        self._search()
+        lines = top_lines(self._board, 1, self.seed)
+        score = lines[0] if lines else evaluate(self._board, self.seed)
+        if score["Mate"] is not None:
+            return {"type": "mate", "value": score["Mate"]}
+        return {"type": "cp", "value": score["Centipawn"]}
+
+    def get_best_move_time(self, time: int = 1000) -> str | None:
+        lines = self.get_top_moves(1)
+        return lines[0]["Move"] if lines else None
+
+    # Probes used by engine_supervisor.
+
+    def is_alive(self) -> bool:
+        return self._alive
+
+    def ping(self, timeout: float) -> bool:
+        return self._alive
+
+    def kill(self) -> None:
+        self._alive = False
+
+    def quit(self) -> None:
+        self._alive = False
+
+
+# --- UCI program -----------------------------------------------------------------
+
+def _uci_score(line: dict, turn: chess.Color) -> str:
+    """White's-frame line → UCI score token (side to move's point of view)."""
+    sign = 1 if turn == chess.WHITE else -1
+    if line["Mate"] is not None:
+        return f"mate {line['Mate'] * sign}"
+    return f"cp {line['Centipawn'] * sign}"
+
+
+def uci_loop(stdin=sys.stdin, stdout=sys.stdout, seed: int = FAKE_ENGINE_SEED,
+             latency_ms: float = FAKE_ENGINE_LATENCY_MS) -> None:
+    def send(text: str) -> None:
+        stdout.write(text + "\n")
+        stdout.flush()
+
+    # The Stockfish wrapper parses a version number out of the banner.
+    send("FakeEngine 1 by Chess Analyzer (deterministic test engine)")
+    board = chess.Board()
+    multipv = 1
+    for raw in stdin:
+        tokens = raw.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == "uci":
+            send("id name FakeEngine 1")
+            send("id author Chess Analyzer")
+            send("option name MultiPV type spin default 1 min 1 max 500")
+            send("option name Threads type spin default 1 min 1 max 1024")
+            send("option name Hash type spin default 16 min 1 max 33554432")
+            send("uciok")
+        elif command == "isready":
+            send("readyok")
+        elif command == "setoption" and "name" in tokens and "value" in tokens:
+            name = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")])
+            if name == "MultiPV":
+                multipv = max(1, int(tokens[tokens.index("value") + 1]))
+        elif command == "ucinewgame":
+            board = chess.Board()
+        elif command == "position" and len(tokens) > 1 and tokens[1] in ("startpos", "fen"):
+            # Like Stockfish, ignore malformed commands (the wrapper's
+            # get_evaluation() sends "position <fen>" without "fen").
+            if tokens[1] == "startpos":
+                board, rest = chess.Board(), tokens[2:]
+            else:
+                board, rest = chess.Board(" ".join(tokens[2:8])), tokens[8:]
+            if rest and rest[0] == "moves":
+                for move in rest[1:]:
+                    board.push_uci(move)
+        elif command == "d":
+            send(f"Fen: {board.fen()}")
+            send(f"Key: {chess.polyglot.zobrist_hash(board):016X}")
+            send("Checkers: " + " ".join(chess.square_name(sq) for sq in board.checkers()))
+        elif command == "go":
+            depth = tokens[tokens.index("depth") + 1] if "depth" in tokens else "1"
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            lines = top_lines(board, multipv, seed)
+            if not lines:
+                score = "mate 0" if board.is_checkmate() else "cp 0"
+                send(f"info depth 0 score {score}")
+                send("bestmove (none)")
+                continue
+            for k, line in enumerate(lines, 1):
+                send(f"info depth {depth} seldepth {depth} multipv {k} "
+                     f"score {_uci_score(line, board.turn)} nodes {len(lines)} pv {line['Move']}")
+            send(f"bestmove {lines[0]['Move']}")
+        elif command == "quit":
+            break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic fake UCI engine.")
+    parser.add_argument("--seed", type=int, default=FAKE_ENGINE_SEED)
+    parser.add_argument("--latency-ms", type=float, default=FAKE_ENGINE_LATENCY_MS)
+    args = parser.parse_args()
+    uci_loop(seed=args.seed, latency_ms=args.latency_ms)
+
+
+if __name__ == "__main__":
+    main()
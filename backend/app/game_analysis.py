@@ -2,56 +2,55 @@ import os
 import chess.pgn
 import chess.polyglot
 import io
-import json
+import queue
+import re
+import time
 from dotenv import load_dotenv
 from stockfish import Stockfish
+from engine_supervisor import SupervisedEngine
+from eval_cache import EVALUATION_MULTIPV, get_eval_cache
+from opening_book import OpeningBook
+from eco_index import eco_key, get_eco_index
+from book_evals import get_book_evals
+from stage_timing import stage
+from accuracy import side_accuracies
+from metrics import GAMES_ANALYZED, PLIES_ANALYZED
 from math import exp
-import statistics
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 load_dotenv()
 
 stockfish_path = os.getenv("STOCKFISH_PATH")
 base_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Load Opening Data (ECO)
-eco_data = {}
-try:
-    with open("eco.json", "r") as f:
-        raw_data = json.load(f)
-        for k, v in raw_data.items():
-            # e.g.) k = "rnb... b KQkq e3 0 1"
-            # normalized = "rnb... b KQkq" (removing en passant, half move, full move)
-            norm_key = " ".join(k.split(" ")[:3])
-            eco_data[norm_key] = v
-    print(f"Loaded {len(eco_data)} openings (ECO).")
-except Exception as e:
-    print(f"Warning: ECO data missing: {e}")
-
 # Polyglot Opening Book
 polyglot_path = os.path.join(base_dir, "gm2001.bin")
 has_polyglot = os.path.exists(polyglot_path)
+polyglot_book: OpeningBook | None = None
 
 if has_polyglot:
-    print(f"Polyglot book loaded: {polyglot_path}")
+    # Loaded once and kept resident; see opening_book.py.
+    polyglot_book = OpeningBook.load(polyglot_path)
+    print(f"Polyglot book loaded: {polyglot_path} ({len(polyglot_book)} positions)")
 else:
     print("Warning: Polyglot book (gm2001.bin) not found. Using ECO only.")
 
-def get_opening_name(board):
-    # ECO lookup
-    fen_parts = board.fen().split(" ")
-    norm_key = " ".join(fen_parts[:3])
-    return eco_data.get(norm_key)
-
-def is_in_book(board):
-    # Polyglot book move check
-    if not has_polyglot:
-        return False
-    try:
-        with chess.polyglot.open_reader(polyglot_path) as reader:
-            reader.find(board)
-            return True
-    except (KeyError, IndexError):
+def get_opening_name(board, key: int | None = None):
+    # ECO lookup by position hash (ignores en passant / move counters);
+    # pass the board's Zobrist `key` if already computed.
+    index = get_eco_index()
+    if index is None:
+        return None
+    return index.lookup(eco_key(board, key))
+
+def is_in_book(board, key: int | None = None):
+    # Polyglot book check by Zobrist hash; pass `key` if already computed.
+    if polyglot_book is None:
         return False
+    if key is None:
+        key = chess.polyglot.zobrist_hash(board)
+    return key in polyglot_book
 
 def get_win_prob(cp):
     if cp is None:
@@ -210,44 +209,43 @@ PIECE_VALUES = {
     chess.ROOK: 5, chess.QUEEN: 9, chess.KING: 0
 }
 
-def _piece_val(board, square):
-    p = board.piece_at(square)
-    return PIECE_VALUES[p.piece_type] if p else 0
+# SEE swap order: cheapest attacker first, the king only as the last capture.
+_SEE_ORDER = (chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING)
 
 
-def static_exchange_eval(board, move):
-    """
-    Static Exchange Evaluation (SEE) for `move` on its target square.
+def _least_valuable_attacker(board, side, square, occupied):
+    """(square, piece type) of `side`'s cheapest piece that can capture on
+    `square` with only `occupied` pieces left on the board, or None.
+    Pieces pinned to their king along a line away from `square` can't."""
+    attackers = board.attackers_mask(side, square, occupied) & occupied & board.occupied_co[side]
+    if not attackers:
+        return None
+    target = chess.BB_SQUARES[square]
+    for piece_type in _SEE_ORDER:
+        for sq in chess.scan_forward(attackers & board.pieces_mask(piece_type, side)):
+            if piece_type == chess.KING or board.pin_mask(side, sq) & target:
+                return sq, piece_type
+    return None
 
-    Returns the net material (in pawns) the mover nets after both sides keep
-    recapturing on `to_square` with their cheapest attacker. Negative means the
-    move loses material in the exchange — the basis of a sacrifice. Works on a
-    board copy so the caller's stack is untouched. En-passant/promotion are
-    approximated (negligible for sac detection).
-    """
-    to_sq = move.to_square
-    b = board.copy(stack=False)
-
-    captured = _piece_val(b, to_sq)            # value we capture with the move
-    on_square = _piece_val(b, move.from_square)  # our piece, now recapturable
 
-    b.push(move)
+def _king_capture_blocked(board, side, square, occupied):
+    # Pinned pieces still guard the square against the enemy king.
+    return bool(board.attackers_mask(not side, square, occupied) & occupied)
 
-    gain = [captured]
-    occupied_value = on_square
-    side = b.turn  # opponent recaptures first
 
+def _swap(board, square, side, occupied, gain, on_square):
+    """Play out the capture sequence on `square` with `side` to recapture
+    and back the swap list up by minimax. `gain[0]` is the first capture."""
     while True:
-        attackers = b.attackers(side, to_sq)
-        if not attackers:
+        attacker = _least_valuable_attacker(board, side, square, occupied)
+        if attacker is None:
+            break
+        from_sq, piece_type = attacker
+        occupied ^= chess.BB_SQUARES[from_sq]  # reveals x-ray attackers behind it
+        if piece_type == chess.KING and _king_capture_blocked(board, side, square, occupied):
             break
-        cheapest_sq = min(attackers, key=lambda s: _piece_val(b, s))
-        recapture = chess.Move(cheapest_sq, to_sq)
-        if recapture not in b.legal_moves:
-            break  # pinned / illegal — exchange stops
-        gain.append(occupied_value - gain[-1])
-        occupied_value = _piece_val(b, cheapest_sq)
-        b.push(recapture)
+        gain.append(on_square - gain[-1])
+        on_square = PIECE_VALUES[piece_type]
         side = not side
 
     # Minimax back up the swap list.
@@ -256,6 +254,56 @@ def static_exchange_eval(board, move):
     return gain[0]
 
 
+def static_exchange_eval(board, move):
+    """
+    Static Exchange Evaluation (SEE) for `move` on its target square.
+
+    Returns the net material (in pawns) the mover nets after both sides keep
+    recapturing on `to_square` with their cheapest attacker. Negative means the
+    move loses material in the exchange — the basis of a sacrifice.
+
+    Works on bitboards only: captured pieces are removed from an occupancy
+    mask, which also uncovers x-ray attackers, and pieces pinned off the
+    square are excluded via `pin_mask`. No board copies or move generation.
+    Checks arising during the exchange are ignored.
+    """
+    to_sq = move.to_square
+    mover = board.piece_at(move.from_square)
+    if mover is None:
+        return 0
+    occupied = board.occupied ^ chess.BB_SQUARES[move.from_square]
+
+    victim = board.piece_type_at(to_sq)
+    if victim is None and board.is_en_passant(move):
+        victim = chess.PAWN
+        occupied &= ~chess.BB_SQUARES[board.ep_square - 8 if mover.color == chess.WHITE else board.ep_square + 8]
+    captured = PIECE_VALUES[victim] if victim else 0
+    on_square = PIECE_VALUES[mover.piece_type]
+    if move.promotion:
+        captured += PIECE_VALUES[move.promotion] - on_square
+        on_square = PIECE_VALUES[move.promotion]
+
+    return _swap(board, to_sq, not mover.color, occupied, [captured], on_square)
+
+
+def capture_exchange_eval(board, square, side):
+    """SEE of `side` capturing the piece on `square` with its cheapest
+    attacker that can legally (pins, king safety) do so, regardless of
+    whose turn it is. None if no such capture exists."""
+    target = board.piece_at(square)
+    if target is None:
+        return None
+    attacker = _least_valuable_attacker(board, side, square, board.occupied)
+    if attacker is None:
+        return None
+    from_sq, piece_type = attacker
+    occupied = board.occupied ^ chess.BB_SQUARES[from_sq]
+    if piece_type == chess.KING and _king_capture_blocked(board, side, square, occupied):
+        return None
+    return _swap(board, square, not side, occupied, [PIECE_VALUES[target.piece_type]],
+                 PIECE_VALUES[piece_type])
+
+
 def is_sacrifice(board, move):
     """A move is a sacrifice if the exchange on its target square loses
     material (SEE < 0) — i.e. the mover willingly gives up more than they get,
@@ -282,146 +330,158 @@ def get_score_val(move_data):
         return (20000 - abs(mate_in) * 10) * (1 if mate_in > 0 else -1)
     return move_data.get('Centipawn', 0)
 
-def calculate_stats(moves):
-    if not moves:
-        return {"accuracy": 0, "classification_counts": {}}
-    
-    # Extract win percentages
+_CLASSIFICATION_LABELS = (
+    "Brilliant", "Great", "Book", "Best", "Excellent",
+    "Good", "Inaccuracy", "Mistake", "Blunder", "Miss",
+)
+
+
+def _accuracy_inputs(moves):
+    # Win% before each move plus after the last one; accuracies per move
     win_percents = [m['win_percent_before'] for m in moves]
-    win_percents.append(moves[-1]['win_percent_after'])
-    
-    # Extract accuracies
-    accuracies = [m['accuracy'] for m in moves]
-    
-    # Calculate volatility weights (higher std dev = more critical position)
-    window_size = get_window_size(len(moves))
-    weights = calculate_volatility_weights(win_percents, window_size)
-    
-    # Weighted mean
-    weighted_avg = weighted_mean(accuracies, weights)
-    
-    # Harmonic mean
-    harmonic_avg = harmonic_mean(accuracies)
-    
-    # Final accuracy: average of both
-    lichess_accuracy = (weighted_avg + harmonic_avg) / 2
-    
-    # Count move classifications
-    counts = {
-        "Brilliant": 0, "Great": 0, "Book": 0, "Best": 0, "Excellent": 0,
-        "Good": 0, "Inaccuracy": 0, "Mistake": 0, "Blunder": 0, "Miss": 0
-    }
-    
-    for m in moves:
-        cls = m.get('classification', 'Normal')
-        if cls in counts:
-            counts[cls] += 1
-    
-    return {
-        "accuracy": round(lichess_accuracy, 1),
-        "classification_counts": counts
-    }
+    if moves:
+        win_percents.append(moves[-1]['win_percent_after'])
+    return win_percents, [m['accuracy'] for m in moves]
+
+
+def calculate_stats_batch(sides):
+    """`calculate_stats` for many move lists at once; the accuracies of all
+    of them are computed in one vectorized pass (see accuracy.py)."""
+    accuracies = side_accuracies([_accuracy_inputs(moves) for moves in sides])
+    stats = []
+    for moves, acc in zip(sides, accuracies):
+        if not moves:
+            stats.append({"accuracy": 0, "classification_counts": {}})
+            continue
+        # Count move classifications
+        counts = dict.fromkeys(_CLASSIFICATION_LABELS, 0)
+        for m in moves:
+            cls = m.get('classification', 'Normal')
+            if cls in counts:
+                counts[cls] += 1
+        stats.append({
+            "accuracy": round(float(acc), 1),
+            "classification_counts": counts
+        })
+    return stats
 
-# Accuracy Logics borrowed from Lichess
-def get_window_size(num_moves):
-    window_size = max(2, min(8, num_moves // 10))
-    return window_size
-
-def calculate_volatility_weights(win_percents, window_size):
-    weights = []
-    # Ensure window_size doesn't exceed list length
-    actual_window_size = min(window_size, len(win_percents))
-    for i in range(len(win_percents) - actual_window_size + 1):
-        window = win_percents[i:i + actual_window_size]
-        std_dev = statistics.stdev(window) if len(window) > 1 else 0.5
-        weight = max(0.5, min(12, std_dev))
-        weights.append(weight)
-    return weights
-
-def weighted_mean(accuracies, weights):
-    # Ensure lengths match (weights might be 1 longer due to win_percents)
-    min_len = min(len(accuracies), len(weights))
-    weighted_sum = sum(accuracies[i] * weights[i] for i in range(min_len))
-    total_weight = sum(weights[:min_len])
-    
-    if total_weight:
-        return weighted_sum / total_weight
-    return 0
 
-def harmonic_mean(accuracies):
-    safe_accuracies = [max(0.1, acc) for acc in accuracies]
-    reciprocal_sum = sum(1/acc for acc in safe_accuracies)
-    if reciprocal_sum > 0:
-        return len(safe_accuracies) / reciprocal_sum
-    return 0
+def calculate_stats(moves):
+    return calculate_stats_batch([moves])[0]
 
 # Main Analysis Logic
 STOCKFISH_DEPTH = int(os.getenv("STOCKFISH_DEPTH", "16"))
 STOCKFISH_THREADS = int(os.getenv("STOCKFISH_THREADS", "2"))
 STOCKFISH_HASH_MB = int(os.getenv("STOCKFISH_HASH_MB", "256"))
 
-_engine: Stockfish | None = None
-
-def _get_engine() -> Stockfish:
+## Analysis mode:
+##   single_pass — search every position once with MultiPV=2 and reuse that
+##                 search for the played move of the previous ply (default)
+##   two_pass    — legacy: top moves before the move, evaluation after it
+##   adaptive    — shallow single pass, full depth only on critical plies
+##   parallel    — single-pass searches fanned out over several pool engines
+##   budget      — single pass within a per-game wall-clock budget, depth
+##                 varying per ply (see _search_plies_budget)
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "single_pass")
+ANALYSIS_MULTIPV = 2
+
+## Adaptive mode: depth of the cheap sweep, and what makes a ply "critical"
+## enough to re-search at STOCKFISH_DEPTH.
+ADAPTIVE_SHALLOW_DEPTH = int(os.getenv("ADAPTIVE_SHALLOW_DEPTH", "10"))
+ADAPTIVE_SWING_MIN  = 8     # shallow win% swing for the mover (% points)
+ADAPTIVE_TIER_MARGIN = 0.25 # win_diff within 25% of a tier boundary
+
+## Parallel mode: at most this many engines (the caller's plus idle pool
+## engines) search the positions of one game at the same time.
+ANALYSIS_PARALLEL_ENGINES = int(os.getenv("ANALYSIS_PARALLEL_ENGINES", "4"))
+
+## Budget mode: seconds of search per game, shared out over its plies. Every
+## ply gets at least BUDGET_MIN_DEPTH and at most BUDGET_MAX_DEPTH.
+ANALYSIS_BUDGET_SECONDS = float(os.getenv("ANALYSIS_BUDGET_SECONDS", "20"))
+BUDGET_MIN_DEPTH = int(os.getenv("BUDGET_MIN_DEPTH", "8"))
+BUDGET_MAX_DEPTH = int(os.getenv("BUDGET_MAX_DEPTH", str(STOCKFISH_DEPTH)))
+BUDGET_GROWTH = 2.0         # assumed cost ratio of depth d+1 to depth d
+BUDGET_UNSTABLE_CP = 50     # best-line swing between depths that earns extra time
+BUDGET_BOOK_WEIGHT = 0.1    # book and only-move plies: near-minimum depth
+BUDGET_SHARP_WEIGHT = 2.0   # checks, captures, sacrifices
+
+## Engine backend: "stockfish" (the PyPI wrapper), "uci" (chess.engine,
+## see uci_engine.py) or "fake" (deterministic in-process stand-in, see
+## fake_engine.py). All expose the same calls, so they can be benchmarked
+## against each other by flipping this variable.
+ENGINE_BACKEND = os.getenv("ENGINE_BACKEND", "stockfish")
+
+_engine = None
+
+def _spawn_engine():
+    # In single-pass mode MultiPV is fixed at engine start so get_top_moves()
+    # doesn't toggle it (two setoption + isready round-trips) on every call.
+    # The legacy mode needs MultiPV=1 because get_evaluation() reads the last
+    # score line, which would otherwise be the 2nd-best line; `_evaluation`
+    # drops to MultiPV=1 for its (rare) calls in the other modes.
+    multipv = 1 if ANALYSIS_MODE == "two_pass" else ANALYSIS_MULTIPV
+    parameters = {
+        "Threads": STOCKFISH_THREADS,
+        "Hash": STOCKFISH_HASH_MB,
+        "MultiPV": multipv,
+    }
+    if ENGINE_BACKEND == "uci":
+        from uci_engine import UciEngine
+        return UciEngine(path=stockfish_path, depth=STOCKFISH_DEPTH, parameters=parameters)
+    if ENGINE_BACKEND == "fake":
+        from fake_engine import FakeEngine
+        return FakeEngine(depth=STOCKFISH_DEPTH, parameters=parameters)
+    if ENGINE_BACKEND != "stockfish":
+        raise ValueError(f"Unknown ENGINE_BACKEND: {ENGINE_BACKEND}")
+    return Stockfish(path=stockfish_path, depth=STOCKFISH_DEPTH, parameters=parameters)
+
+def new_engine():
+    # Liveness is checked out of band and crashed processes are respawned
+    # transparently, so callers never need to probe the engine themselves.
+    return SupervisedEngine(_spawn_engine)
+
+def _get_engine():
     global _engine
     if _engine is None:
-        _engine = Stockfish(
-            path=stockfish_path,
-            depth=STOCKFISH_DEPTH,
-            parameters={"Threads": STOCKFISH_THREADS, "Hash": STOCKFISH_HASH_MB},
-        )
-        return _engine
-    # Verify process is still alive; respawn if crashed
-    try:
-        _engine.get_best_move_time(10)
-    except Exception:
-        _engine = Stockfish(
-            path=stockfish_path,
-            depth=STOCKFISH_DEPTH,
-            parameters={"Threads": STOCKFISH_THREADS, "Hash": STOCKFISH_HASH_MB},
-        )
+        _engine = new_engine()
     return _engine
 
 
-def analyze_game(pgn_string: str):
-    engine = _get_engine()
-    
-    pgn_io = io.StringIO(pgn_string)
-    game = chess.pgn.read_game(pgn_io)
-    board = game.board()
-    
-    analysis_results = []
-    prev_score = 0
-    prev_classification: str | None = None  # opponent's previous move class (drives Miss)
-
-    # 1. Parse opening name from Chess.com ECOUrl header
+def _pgn_opening_name(game) -> str:
+    """Opening name from Chess.com's ECOUrl header, else the Opening header."""
     eco_url = game.headers.get("ECOUrl", "")
     pgn_opening = "Opening Move"
     if eco_url:
         parts = eco_url.split("/openings/")
         if len(parts) > 1:
-            import re
             raw_name = parts[1].split("?")[0]
             raw_name = re.split(r'-\d+\.', raw_name)[0]
             pgn_opening = raw_name.replace("-", " ").strip()
-    
+
     if pgn_opening == "Opening Move":
         header_opening = game.headers.get("Opening", "")
         if header_opening and header_opening != "?":
             pgn_opening = header_opening
-    
-    current_opening = pgn_opening
+    return pgn_opening
 
-    print("--- Analysis Start ---")
 
+def _replay_game(game):
+    """Walk the mainline once and collect everything a ply needs that does
+    not come from the engine: SAN, captures, book/opening state, sacrifice
+    flag and the FENs to search.
+
+    Returns (plies, final_opening).
+    """
+    board = game.board()
+    current_opening = _pgn_opening_name(game)
     in_book_line = True
+    plies = []
+
     for i, move in enumerate(game.mainline_moves()):
         if i // 2 >= 12 and current_opening == "Opening Move" and not in_book_line:
              current_opening = "No Opening"
         is_white = board.turn
-        move_uci = move.uci()
-        move_san = board.san(move)
-        
+
         captured_piece = None
         if board.is_capture(move):
             if board.is_en_passant(move):
@@ -430,35 +490,429 @@ def analyze_game(pgn_string: str):
                 piece = board.piece_at(move.to_square)
                 if piece:
                      captured_piece = chess.piece_name(piece.piece_type).capitalize()
-        
+
+        with stage("san"):
+            move_san = board.san(move)
+        # Check Sacrifice / hanging-piece (board must be in pre-move state)
+        with stage("sacrifice"):
+            is_sac = is_sacrifice(board, move)
+
+        ply = {
+            "index": i,
+            "move": move,
+            "move_uci": move.uci(),
+            "move_san": move_san,
+            "is_white": is_white,
+            "captured_piece": captured_piece,
+            "fen": board.fen(),
+            "key": chess.polyglot.zobrist_hash(board),
+            "is_sac": is_sac,
+            # Best-move SAN needs the pre-move board; kept for the classify pass.
+            "board_before": board.copy(stack=False),
+        }
+
         board.push(move)
+        key_after = chess.polyglot.zobrist_hash(board)
         # Check Book Status for current move: is THIS position a known
         # ECO opening or in the polyglot book?
         is_book = False
-        opening_info = get_opening_name(board)
+        with stage("book"):
+            opening_info = get_opening_name(board, key_after)
 
-        if opening_info:
-            current_opening = opening_info.get('name', current_opening)
-            is_book = True
-        else:
-            is_book = is_in_book(board)
+            if opening_info:
+                current_opening = opening_info.get('name', current_opening)
+                is_book = True
+            else:
+                is_book = is_in_book(board, key_after)
 
         # Track whether we're still inside the unbroken opening line. Once the
         # game leaves book it stays "out" — a later transposition back into a
         # known position is a coincidence, not opening theory, so we don't want
         # to relabel a real middlegame move as "Book".
         in_book_line = in_book_line and is_book
-        
-        # 2. Get Top Moves
-        board.pop()
-        engine.set_fen_position(board.fen())
-        
-        top_moves = engine.get_top_moves(2)
+
+        ply["is_book"] = in_book_line
+        ply["opening"] = current_opening
+        ply["fen_after"] = board.fen()
+        ply["key_after"] = key_after
+        plies.append(ply)
+
+    return plies, current_opening
+
+
+def _eval_cache():
+    # The fake backend's scores mean nothing to real engines sharing the file.
+    return None if ENGINE_BACKEND == "fake" else get_eval_cache()
+
+
+def _set_multipv(engine, multipv: int):
+    if engine.get_parameters().get("MultiPV") != multipv:
+        engine.update_engine_parameters({"MultiPV": multipv})
+
+
+def _top_moves(engine, fen: str, key: int, new_game: bool = False):
+    """`get_top_moves(ANALYSIS_MULTIPV)` on `fen`, as (lines, depth searched).
+    Book positions come from the precomputed book table (book_evals.py) with
+    no engine time, at the table's depth; others from the persistent eval
+    cache when already searched at this depth."""
+    depth = int(engine.depth)
+    with stage("lookup"):
+        book_evals = get_book_evals()
+        lines = book_evals.lines(key) if book_evals is not None else None
+        if lines is not None:
+            return lines, book_evals.depth
+        cache = _eval_cache()
+        if cache is not None:
+            lines = cache.get(key, depth, ANALYSIS_MULTIPV)
+    if lines is not None:
+        return lines, depth
+    with stage("engine"):
+        engine.set_fen_position(fen, send_ucinewgame_token=new_game)
+        lines = engine.get_top_moves(ANALYSIS_MULTIPV)
+    if cache is not None:
+        with stage("lookup"):
+            cache.put(key, depth, ANALYSIS_MULTIPV, lines)
+    return lines, depth
+
+
+def _evaluation(engine, fen: str, key: int, new_game: bool = False):
+    """`get_evaluation()` on `fen` at MultiPV 1, cached like `_top_moves`
+    (under EVALUATION_MULTIPV)."""
+    depth = int(engine.depth)
+    with stage("lookup"):
+        cache = _eval_cache()
+        eval_data = cache.get(key, depth, EVALUATION_MULTIPV) if cache is not None else None
+    if eval_data is not None:
+        return eval_data
+    # get_evaluation() keeps the last score line the engine printed; with
+    # MultiPV > 1 (single-pass engines) that is the 2nd-best line, not the
+    # position's score.
+    multipv = engine.get_parameters().get("MultiPV")
+    with stage("engine"):
+        _set_multipv(engine, 1)
+        try:
+            engine.set_fen_position(fen, send_ucinewgame_token=new_game)
+            eval_data = engine.get_evaluation()
+        finally:
+            if multipv is not None:
+                _set_multipv(engine, multipv)
+    if cache is not None:
+        with stage("lookup"):
+            cache.put(key, depth, EVALUATION_MULTIPV, eval_data)
+    return eval_data
+
+
+def _search_plies_two_pass(engine, plies):
+    """Legacy mode: top moves on the pre-move position, then a separate
+    evaluation of the post-move position — two searches per ply."""
+    searches = []
+    _set_multipv(engine, 1)
+    for ply in plies:
+        top_moves, depth = _top_moves(engine, ply["fen"], ply["key"], new_game=True)
+        played = _evaluation(engine, ply["fen_after"], ply["key_after"], new_game=True)
+        searches.append({"top_moves": top_moves, "played": played, "depth": depth})
+    return searches
+
+
+def _iter_single_pass(engine, plies):
+    """Search each position of the game exactly once with MultiPV, yielding
+    each ply's search as soon as it's complete.
+
+    The post-move position of ply i is the pre-move position of ply i+1, so
+    its search doubles as the evaluation of the move played at ply i. When
+    the played move is one of the top lines we take its score straight from
+    that line; otherwise the next position's best line is the played eval.
+    Scores from the wrapper are already in White's frame, so the side-to-move
+    flip between the two searches needs no extra handling here. Only the last
+    ply can need an extra search (when its move wasn't a top line).
+    """
+    if not plies:
+        return
+
+    _set_multipv(engine, ANALYSIS_MULTIPV)
+    # One ucinewgame per game: consecutive positions share the hash table.
+    top_moves, depth = _top_moves(engine, plies[0]["fen"], plies[0]["key"], new_game=True)
+
+    for i, ply in enumerate(plies):
+        is_last = i == len(plies) - 1
+        played = next((l for l in top_moves if l["Move"] == ply["move_uci"]), None)
+
+        next_top_moves, next_depth = [], None
+        if not is_last:
+            next_top_moves, next_depth = _top_moves(engine, ply["fen_after"], ply["key_after"])
+
+        if played is None:
+            if next_top_moves:
+                played = next_top_moves[0]
+            else:
+                # Last ply (or a terminal position): evaluate it directly.
+                played = _evaluation(engine, ply["fen_after"], ply["key_after"])
+
+        yield {"top_moves": top_moves, "played": played, "depth": depth}
+        top_moves, depth = next_top_moves, next_depth
+
+
+def _search_plies_single_pass(engine, plies):
+    return list(_iter_single_pass(engine, plies))
+
+
+def _search_plies_adaptive(engine, plies):
+    """Shallow single pass over the whole game, then full-depth searches only
+    for the plies whose classification the shallow pass can't be trusted on
+    (see `_is_critical`). Everything else keeps its shallow result.
+    """
+    full_depth = int(engine.depth)
+    engine.set_depth(ADAPTIVE_SHALLOW_DEPTH)
+    try:
+        searches = _search_plies_single_pass(engine, plies)
+    finally:
+        engine.set_depth(full_depth)
+
+    shallow_results = _classify_plies(plies, searches, verbose=False)
+    deep_top_moves = {}
+
+    def deep_top(i):
+        if i not in deep_top_moves:
+            deep_top_moves[i] = _top_moves(engine, plies[i]["fen"], plies[i]["key"])
+        return deep_top_moves[i]
+
+    for i, (ply, result) in enumerate(zip(plies, shallow_results)):
+        if not _is_critical(ply, result):
+            continue
+        top_moves, depth = deep_top(i)
+        played = next((l for l in top_moves if l["Move"] == ply["move_uci"]), None)
+        if played is None:
+            next_top_moves = deep_top(i + 1)[0] if i + 1 < len(plies) else []
+            if next_top_moves:
+                played = next_top_moves[0]
+            else:
+                played = _evaluation(engine, ply["fen_after"], ply["key_after"])
+        searches[i] = {"top_moves": top_moves, "played": played, "depth": depth}
+
+    return searches
+
+
+_TIER_BOUNDARIES = (THRESH_EXCELLENT, THRESH_GOOD, THRESH_INACCURACY, THRESH_MISTAKE)
+
+
+def _is_critical(ply, result) -> bool:
+    """Would a deeper search plausibly change this ply's classification?
+
+    Book plies are labeled Book whatever the engine says. Otherwise a ply is
+    critical if the shallow eval swung hard for the mover, if its win% loss
+    sits close to a `classify_by_win_diff` tier boundary, or if it's a
+    sacrifice (Brilliant hinges on an exact cp_loss / eval window).
+    """
+    if ply["is_book"]:
+        return False
+    if ply["is_sac"]:
+        return True
+    swing = abs(result["win_percent_after"] - result["win_percent_before"])
+    if swing >= ADAPTIVE_SWING_MIN:
+        return True
+    win_diff = result["win_diff"]
+    return any(abs(win_diff - t) <= ADAPTIVE_TIER_MARGIN * t for t in _TIER_BOUNDARIES)
+
+
+def _search_positions(engine, positions, max_engines: int):
+    """`_top_moves` for every (fen, key) in `positions`, spread across
+    engines; returns the (lines, depth) pairs in the same order.
+
+    Every position only needs its FEN, so they are searched out of order by
+    worker threads, each driving its own engine process: the caller's
+    engine plus up to `max_engines - 1` pool engines that are idle right
+    now. Extra engines are taken without blocking, so a busy pool degrades
+    this to a sequential sweep on the caller's engine instead of
+    deadlocking.
+    """
+    from engine_pool import get_pool
+
+    if not positions:
+        return []
+
+    pool = get_pool()
+    engines = [engine]
+    while len(engines) < min(max_engines, len(positions)):
+        extra = pool.checkout(block=False)
+        if extra is None:
+            break
+        engines.append(extra)
+
+    depths = {int(e.depth) for e in engines}
+    if len(depths) > 1:
+        raise ValueError(f"Pool engines disagree on depth: {sorted(depths)}")
+
+    work = queue.Queue()
+    for i in range(len(positions)):
+        work.put(i)
+    found = [None] * len(positions)
+    broken = set()
+
+    def worker(e):
+        _set_multipv(e, ANALYSIS_MULTIPV)
+        try:
+            while True:
+                try:
+                    i = work.get_nowait()
+                except queue.Empty:
+                    return
+                fen, key = positions[i]
+                found[i] = _top_moves(e, fen, key)
+        except BaseException:
+            broken.add(id(e))
+            raise
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(engines)) as executor:
+            futures = [executor.submit(worker, e) for e in engines]
+            for future in futures:
+                future.result()
+    finally:
+        for extra in engines[1:]:
+            pool.checkin(extra, broken=id(extra) in broken)
+    return found
+
+
+def _assemble_single_pass(engine, plies, found):
+    """Build the per-ply searches from each ply's pre-move (lines, depth)
+    in `found` exactly as `_iter_single_pass` would; only a last ply whose
+    move isn't a top line costs a search (on `engine`)."""
+    searches = []
+    for i, ply in enumerate(plies):
+        top_moves, depth = found[i]
+        played = next((l for l in top_moves if l["Move"] == ply["move_uci"]), None)
+        if played is None:
+            if i + 1 < len(plies):
+                played = found[i + 1][0][0]
+            else:
+                played = _evaluation(engine, ply["fen_after"], ply["key_after"])
+        searches.append({"top_moves": top_moves, "played": played, "depth": depth})
+    return searches
+
+
+def _search_plies_parallel(engine, plies):
+    """Single-pass searches for one game spread across several engines
+    (see `_search_positions`), reassembled in game order exactly as
+    `_search_plies_single_pass` would build them."""
+    found = _search_positions(
+        engine, [(ply["fen"], ply["key"]) for ply in plies], ANALYSIS_PARALLEL_ENGINES
+    )
+    return _assemble_single_pass(engine, plies, found)
+
+
+def _budget_weight(ply) -> float:
+    """Relative share of the game's budget a ply deserves."""
+    board = ply["board_before"]
+    if ply["is_book"] or board.legal_moves.count() == 1:
+        return BUDGET_BOOK_WEIGHT
+    if ply["captured_piece"] or ply["is_sac"] or board.is_check() or board.gives_check(ply["move"]):
+        return BUDGET_SHARP_WEIGHT
+    return 1.0
+
+
+def _deepen(engine, fen: str, key: int, allotment: float, new_game: bool = False):
+    """Iterative deepening on one position from BUDGET_MIN_DEPTH while the
+    next depth is predicted (BUDGET_GROWTH times the last one) to fit in
+    `allotment` seconds. A best line that is still swinging may use up to
+    twice the allotment. Returns (lines, depth reached)."""
+    start = time.perf_counter()
+    depth = BUDGET_MIN_DEPTH
+    previous = None
+    while True:
+        engine.set_depth(depth)
+        searched_at = time.perf_counter()
+        lines, searched = _top_moves(engine, fen, key, new_game=new_game)
+        new_game = False
+        cost = time.perf_counter() - searched_at
+        if searched != depth:
+            return lines, searched  # book table: no deeper search to do
+        if depth >= BUDGET_MAX_DEPTH or len(lines) < 2:
+            return lines, depth
+        limit = allotment
+        if previous and (lines[0]["Move"] != previous[0]["Move"]
+                         or abs(get_score_val(lines[0]) - get_score_val(previous[0])) >= BUDGET_UNSTABLE_CP):
+            limit = 2 * allotment
+        if time.perf_counter() - start + cost * BUDGET_GROWTH > limit:
+            return lines, depth
+        previous = lines
+        depth += 1
+
+
+def _search_plies_budget(engine, plies, budget_seconds: float | None = None):
+    """Single pass whose search depth varies per ply so the game finishes
+    within `budget_seconds` (default ANALYSIS_BUDGET_SECONDS).
+
+    The Stockfish wrapper can only search to a fixed depth, so the budget is
+    spent by iterative deepening (`_deepen`). Each ply's allotment is its
+    weight (`_budget_weight`) over the weight of the plies still to come,
+    times the time left — time a cheap ply doesn't use flows to the rest of
+    the game. Every ply still gets BUDGET_MIN_DEPTH once the budget is gone,
+    so the overrun is bounded by minimum-depth searches. Each search records
+    the depth it reached.
+    """
+    if not plies:
+        return []
+    budget = ANALYSIS_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+    full_depth = int(engine.depth)
+    deadline = time.perf_counter() + budget
+    weights = [_budget_weight(ply) for ply in plies]
+    remaining_weight = sum(weights)
+
+    _set_multipv(engine, ANALYSIS_MULTIPV)
+    found = []
+    try:
+        for i, ply in enumerate(plies):
+            allotment = max(0.0, deadline - time.perf_counter()) * weights[i] / remaining_weight
+            remaining_weight -= weights[i]
+            found.append(_deepen(engine, ply["fen"], ply["key"], allotment, new_game=i == 0))
+        engine.set_depth(found[-1][1])
+        searches = _assemble_single_pass(engine, plies, found)
+    finally:
+        engine.set_depth(full_depth)
+    return searches
+
+
+_SEARCHERS = {
+    # Lazy: lets the classification pass (and on_move) follow the search.
+    "single_pass": _iter_single_pass,
+    "two_pass": _search_plies_two_pass,
+    "adaptive": _search_plies_adaptive,
+    "parallel": _search_plies_parallel,
+    "budget": _search_plies_budget,
+}
+
+
+def _mate_of(eval_data):
+    """Mate distance in White's frame from either Stockfish dict format."""
+    if 'type' in eval_data:
+        return eval_data['value'] if eval_data['type'] == 'mate' else None
+    return eval_data.get('Mate')
+
+
+def _classify_plies(plies, searches, verbose: bool = True, on_move=None):
+    """Sequential classification pass over already-searched plies.
+
+    Needs to run in game order: Miss depends on the opponent's previous
+    classification and Brilliant on the previous score. `searches` may be
+    a lazy iterator; `on_move(result)` is called as each ply is classified.
+    """
+    analysis_results = []
+    prev_score = 0
+    prev_classification: str | None = None  # opponent's previous move class (drives Miss)
+
+    for ply, search in zip(plies, searches):
+        i = ply["index"]
+        is_white = ply["is_white"]
+        move_uci = ply["move_uci"]
+        move_san = ply["move_san"]
+        current_opening = ply["opening"]
+        top_moves = search["top_moves"]
+
         best_move = top_moves[0]['Move']
-        
+
         # Convert to SAN while board is in "Before Move" state
-        best_move_san = board.san(chess.Move.from_uci(best_move))
-        
+        best_move_san = ply["board_before"].san(chess.Move.from_uci(best_move))
+
         best_score = get_score_val(top_moves[0])
 
         second_score = None
@@ -466,26 +920,16 @@ def analyze_game(pgn_string: str):
         if len(top_moves) > 1:
             second_score = get_score_val(top_moves[1])
 
-        # Check Sacrifice / hanging-piece (board must be in pre-move state)
-        is_sac = is_sacrifice(board, move)
-
-
-        board.push(move)
-        
         # 3. Evaluate Current Position
-        engine.set_fen_position(board.fen())
-        eval_data = engine.get_evaluation()
-        
+        eval_data = search["played"]
         score_val = get_score_val(eval_data)
         curr_score_white = score_val
 
         # Extract explicit mate information
-        mate_in = None
-        if 'type' in eval_data and eval_data['type'] == 'mate':
-            mate_in = eval_data['value']
-            
+        mate_in = _mate_of(eval_data)
+
         best_mate_in = top_moves[0].get('Mate')
-        
+
         # Convert to Win Probability (0-100)
         my_cp = curr_score_white if is_white else -curr_score_white
         best_cp = best_score if is_white else -best_score
@@ -511,7 +955,7 @@ def analyze_game(pgn_string: str):
             move_uci=move_uci,
             best_move_uci=best_move,
             is_only_legal=len(top_moves) == 1,
-            is_book=in_book_line,
+            is_book=ply["is_book"],
             win_diff=win_diff,
             cp_loss=cp_loss,
             my_cp=my_cp,
@@ -520,7 +964,7 @@ def analyze_game(pgn_string: str):
             my_mate_in=mate_in,
             best_mate_in=best_mate_in,
             is_white=is_white,
-            is_sac=is_sac,
+            is_sac=ply["is_sac"],
 
             prev_classification=prev_classification,
             prev_cp=prev_cp_pers,
@@ -544,29 +988,103 @@ def analyze_game(pgn_string: str):
             "accuracy": round(move_accuracy, 1),
             "win_chance": round(curr_win_prob, 1),
             "cp_loss": cp_loss,
+            "win_diff": round(win_diff, 1),
             "win_percent_before": round(prev_win_prob, 1),
             "win_percent_after": round(curr_win_prob, 1),
-            "captured_piece": captured_piece,
-            "is_sacrifice": is_sac,
+            "captured_piece": ply["captured_piece"],
+            "is_sacrifice": ply["is_sac"],
+            "depth": search.get("depth"),
+            "engine": search,
         }
         analysis_results.append(result)
+        if on_move is not None:
+            on_move(result)
 
-        # Calculate White's Win Probability for stable logging
-        white_win_prob = get_win_prob(curr_score_white)
-        
-        print(f"Move: {move_san:<10} | Class: {classification:<10} | Acc: {result['accuracy']:>5.1f}% | Eval: {curr_score_white:>+5} (White Win%: {white_win_prob:.1f}%) | Opening: {current_opening}") 
+        if verbose:
+            # Calculate White's Win Probability for stable logging
+            white_win_prob = get_win_prob(curr_score_white)
+            print(f"Move: {move_san:<10} | Class: {classification:<10} | Acc: {result['accuracy']:>5.1f}% | Eval: {curr_score_white:>+5} (White Win%: {white_win_prob:.1f}%) | Opening: {current_opening}") 
 
         prev_score = curr_score_white
         prev_classification = classification
 
-    # Calculate Game Summary
-    white_moves = [res for idx, res in enumerate(analysis_results) if idx % 2 == 0]
-    black_moves = [res for idx, res in enumerate(analysis_results) if idx % 2 == 1]
+    return analysis_results
+
+
+def summarize_game(analysis_results):
+    return summarize_games([analysis_results])[0] # Gives summarized stats for both players
+
+
+def summarize_games(games):
+    """Per-side stats for many games' analysis results in one batch."""
+    sides = []
+    for analysis_results in games:
+        sides.append(analysis_results[0::2])  # white
+        sides.append(analysis_results[1::2])  # black
+    with stage("stats"):
+        stats = calculate_stats_batch(sides)
+    return [{"white": stats[i], "black": stats[i + 1]} for i in range(0, len(stats), 2)]
+
 
-    summary = {
-        "white": calculate_stats(white_moves),
-        "black": calculate_stats(black_moves)
-    } # Gives summarized stats for both players
+def reclassify_game(pgn_string: str, searches: list[dict], summarize: bool = True):
+    """Rebuild a game's analysis from stored raw engine data (the "engine"
+    entry of each ply) without touching the engine. Picks up any change to
+    the classification thresholds, book data or accuracy formula.
+
+    With summarize=False the summary is left as None, for callers that
+    batch many games through `summarize_games`."""
+    game = chess.pgn.read_game(io.StringIO(pgn_string))
+    plies, current_opening = _replay_game(game)
+    if len(plies) != len(searches):
+        raise ValueError(f"PGN has {len(plies)} plies but {len(searches)} stored searches")
+    analysis_results = _classify_plies(plies, searches, verbose=False)
+    return {
+        "moves": analysis_results,
+        "summary": summarize_game(analysis_results) if summarize else None,
+        "headers": dict(game.headers),
+        "detected_opening": current_opening if current_opening != "No Opening detected" else "Unknown"
+    }
+
+
+def analyze_game(pgn_string: str, mode: str | None = None, engine=None, on_move=None,
+                 budget_seconds: float | None = None, depth: int | None = None):
+    # Callers running games in parallel pass an engine checked out of the
+    # pool (engine_pool.py); otherwise use the shared module engine.
+    if engine is None:
+        engine = _get_engine()
+    if depth is not None:
+        # One-off depth (e.g. a quick preview); the engine keeps its own.
+        full_depth = int(engine.depth)
+        engine.set_depth(depth)
+        try:
+            return analyze_game(pgn_string, mode=mode, engine=engine, on_move=on_move,
+                                budget_seconds=budget_seconds)
+        finally:
+            engine.set_depth(full_depth)
+    search_plies = _SEARCHERS[mode or ANALYSIS_MODE]
+    if budget_seconds is not None:
+        if search_plies is not _search_plies_budget:
+            raise ValueError("budget_seconds only applies to the budget mode")
+        search_plies = partial(_search_plies_budget, budget_seconds=budget_seconds)
+    
+    pgn_io = io.StringIO(pgn_string)
+    with stage("parse"):
+        game = chess.pgn.read_game(pgn_io)
+
+    # 1. Replay the game (SAN, book, sacrifice) — no engine involved
+    plies, current_opening = _replay_game(game)
+
+    print("--- Analysis Start ---")
+
+    # 2. Engine searches
+    searches = search_plies(engine, plies)
+
+    # 3. Classification
+    analysis_results = _classify_plies(plies, searches, on_move=on_move)
+
+    summary = summarize_game(analysis_results)
+    PLIES_ANALYZED.inc(amount=len(analysis_results))
+    GAMES_ANALYZED.inc(mode or ANALYSIS_MODE)
 
     return {
         "moves": analysis_results,
@@ -575,3 +1093,63 @@ def analyze_game(pgn_string: str):
         "detected_opening": current_opening if current_opening != "No Opening detected" else "Unknown" 
     }
 
+
+def analyze_games(pgn_strings: list[str], engine=None, on_move=None, max_engines: int | None = None):
+    """Single-pass analysis of several games, searching each distinct
+    position only once.
+
+    All games are replayed first; their pre-move positions are pooled by
+    Zobrist key and the unique set is searched across the caller's engine
+    and idle pool engines (at most `max_engines`, default the pool size).
+    Every game is then assembled and classified from the shared results,
+    so a player's repertoire — the same openings game after game — is
+    searched once per batch. Results are the same as `analyze_game` in
+    single_pass mode, one dict per input game, in input order.
+
+    `on_move(game_index, result)` fires per classified ply, game by game,
+    once the shared search is done.
+    """
+    if engine is None:
+        engine = _get_engine()
+    if max_engines is None:
+        from engine_pool import get_pool
+        max_engines = get_pool().size
+
+    replays = []
+    for pgn_string in pgn_strings:
+        with stage("parse"):
+            game = chess.pgn.read_game(io.StringIO(pgn_string))
+        plies, current_opening = _replay_game(game)
+        replays.append((game, plies, current_opening))
+
+    positions = {}
+    for _, plies, _ in replays:
+        for ply in plies:
+            positions.setdefault(ply["key"], ply["fen"])
+    total_plies = sum(len(plies) for _, plies, _ in replays)
+    print(f"Batch plan: {len(replays)} games, {total_plies} plies, "
+          f"{len(positions)} unique positions to search")
+
+    keys = list(positions)
+    found = _search_positions(engine, [(positions[key], key) for key in keys], max_engines)
+    found_by_key = dict(zip(keys, found))
+
+    games = []
+    for n, (game, plies, current_opening) in enumerate(replays):
+        print(f"--- Analysis Start (game {n + 1}/{len(replays)}) ---")
+        searches = _assemble_single_pass(engine, plies, [found_by_key[ply["key"]] for ply in plies])
+        game_on_move = (lambda result, n=n: on_move(n, result)) if on_move else None
+        games.append((game, current_opening, _classify_plies(plies, searches, on_move=game_on_move)))
+
+    summaries = summarize_games([moves for _, _, moves in games])
+    PLIES_ANALYZED.inc(amount=total_plies)
+    GAMES_ANALYZED.inc("batch", amount=len(games))
+    return [
+        {
+            "moves": moves,
+            "summary": summary,
+            "headers": dict(game.headers),
+            "detected_opening": current_opening if current_opening != "No Opening detected" else "Unknown",
+        }
+        for (game, current_opening, moves), summary in zip(games, summaries)
+    ]
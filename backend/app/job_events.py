@@ -0,0 +1,238 @@
+"""
+In-process publish/subscribe for analysis job progress.
+
+`batch.process_user_games` runs in a worker thread and publishes events as
+it goes; the `/analyze/stream/{job_id}` SSE route subscribes from the event
+loop. Events are:
+
+    move   one classified ply (`analyze_game` result dict + game url)
+    game   a game was saved (game_id, url, summary)
+    job    job status changed (status, processed, error) — terminal when
+           status is "done" or "failed"
+
+Each job keeps a bounded history — its latest `job` status and the last
+CHANNEL_HISTORY_EVENTS other events — so a client that connects mid-job
+(or reconnects) first replays what it recently missed. A channel becomes
+idle on a terminal status, a requeue ("queued") or `expire` (the run
+stopped here, e.g. taken over by another worker), and is dropped a few
+minutes later unless someone is subscribed or the job picks up again.
+
+The bus is per process. Jobs usually run in worker.py processes, so
+these forward every event to Postgres with pg_notify (`NotifyForwarder`).
+The API process runs `listen`, which republishes them on its own bus;
+from there they reach SSE clients exactly like events from an embedded
+worker (EMBEDDED_WORKERS in api.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import queue
+import select
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import text
+
+TERMINAL_STATUSES = ("done", "failed")
+# Statuses after which nothing more is published until the job runs again.
+IDLE_STATUSES = TERMINAL_STATUSES + ("queued",)
+CHANNEL_TTL_SECONDS = 300
+# A few games' worth of moves.
+CHANNEL_HISTORY_EVENTS = 500
+
+NOTIFY_CHANNEL = "job_events"
+## Postgres caps NOTIFY payloads at 8000 bytes; larger events aren't forwarded.
+NOTIFY_MAX_BYTES = 7900
+
+
+class _Channel:
+    def __init__(self, history: int):
+        self.status: tuple[str, dict] | None = None
+        self.events: deque[tuple[str, dict]] = deque(maxlen=history)
+        self.subscribers: list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self.idle_since: float | None = None
+
+    def history(self) -> list[tuple[str, dict]]:
+        # The status goes last: a terminal one ends the replay.
+        return list(self.events) + ([self.status] if self.status else [])
+
+
+class JobEventBus:
+    def __init__(self, ttl: float = CHANNEL_TTL_SECONDS, history: int = CHANNEL_HISTORY_EVENTS):
+        self.ttl = ttl
+        self.history = history
+        self._channels: dict[int, _Channel] = {}
+        self._lock = threading.Lock()
+        # Called with every published event (see NotifyForwarder).
+        self.forward = None
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, channel in self._channels.items()
+            if channel.idle_since is not None and now - channel.idle_since > self.ttl
+            and not channel.subscribers
+        ]
+        for job_id in expired:
+            del self._channels[job_id]
+
+    def publish(self, job_id: int | None, event: str, data: dict) -> None:
+        """Record an event and hand it to every subscriber. Thread-safe."""
+        if job_id is None:
+            return
+        with self._lock:
+            self._prune()
+            channel = self._channels.get(job_id)
+            if channel is None:
+                channel = self._channels[job_id] = _Channel(self.history)
+            if event == "job":
+                channel.status = (event, data)
+                idle = data.get("status") in IDLE_STATUSES
+                channel.idle_since = time.monotonic() if idle else None
+            else:
+                channel.events.append((event, data))
+                channel.idle_since = None
+            subscribers = list(channel.subscribers)
+        for loop, q in subscribers:
+            try:
+                loop.call_soon_threadsafe(q.put_nowait, (event, data))
+            except RuntimeError:
+                # Subscriber's loop already closed; it will unsubscribe itself.
+                pass
+        if self.forward is not None:
+            self.forward(job_id, event, data)
+
+    def subscribe(self, job_id: int, create: bool = False) -> tuple[list[tuple[str, dict]], asyncio.Queue] | None:
+        """Must be called on the subscriber's event loop.
+
+        Returns (history so far, queue of later events), or None if nothing
+        has been published for this job (unknown, or finished long ago) and
+        not `create` — pass that for a job known to still be running.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._prune()
+            channel = self._channels.get(job_id)
+            if channel is None:
+                if not create:
+                    return None
+                channel = self._channels[job_id] = _Channel(self.history)
+            q = asyncio.Queue()
+            channel.subscribers.append((loop, q))
+            return channel.history(), q
+
+    def unsubscribe(self, job_id: int, q: asyncio.Queue) -> None:
+        with self._lock:
+            channel = self._channels.get(job_id)
+            if channel is not None:
+                channel.subscribers = [s for s in channel.subscribers if s[1] is not q]
+                if not channel.subscribers and channel.status is None and not channel.events:
+                    # Created by subscribe() for a job that never reported.
+                    del self._channels[job_id]
+
+    def expire(self, job_id: int) -> None:
+        """Let a job's channel lapse: its run in this process is over."""
+        with self._lock:
+            channel = self._channels.get(job_id)
+            if channel is not None and channel.idle_since is None:
+                channel.idle_since = time.monotonic()
+
+
+def encode(job_id: int, event: str, data: dict) -> str | None:
+    """NOTIFY payload for an event, or None if it's too large to send."""
+    payload = json.dumps({"job_id": job_id, "event": event, "data": data}, default=str)
+    if len(payload.encode("utf-8")) > NOTIFY_MAX_BYTES:
+        print(f"Warning: {event} event of job {job_id} too large to forward ({len(payload)} bytes)")
+        return None
+    return payload
+
+
+def dispatch(bus: JobEventBus, payload: str) -> None:
+    """Publish a NOTIFY payload from another process on `bus`."""
+    message = json.loads(payload)
+    bus.publish(message["job_id"], message["event"], message["data"])
+
+
+class NotifyForwarder:
+    """`JobEventBus.forward` hook sending events to other processes with
+    pg_notify. Sends happen on a background thread, several events per
+    transaction, so analysis threads never wait on the database."""
+
+    def __init__(self, bind, channel: str = NOTIFY_CHANNEL, batch: int = 50):
+        self.bind = bind
+        self.channel = channel
+        self.batch = batch
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="job-events-notify", daemon=True)
+        self._thread.start()
+
+    def __call__(self, job_id: int, event: str, data: dict) -> None:
+        payload = encode(job_id, event, data)
+        if payload is not None:
+            self._queue.put(payload)
+
+    def _send(self, payloads: list[str]) -> None:
+        # NOTIFYs are delivered, in order, when the transaction commits.
+        with self.bind.begin() as conn:
+            for payload in payloads:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                             {"channel": self.channel, "payload": payload})
+
+    def _run(self) -> None:
+        while True:
+            payloads = [self._queue.get()]
+            while len(payloads) < self.batch:
+                try:
+                    payloads.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._send(payloads)
+            except Exception as e:
+                print(f"Warning: could not forward {len(payloads)} job events ({e})")
+            finally:
+                for _ in payloads:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait (up to `timeout`) until queued events have been sent."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+def listen(bus: JobEventBus, bind, stop: threading.Event, channel: str = NOTIFY_CHANNEL) -> None:
+    """Republish events other processes send with NotifyForwarder on `bus`
+    until `stop` is set. Reconnects after errors; run it on a thread."""
+    while not stop.is_set():
+        raw = None
+        try:
+            raw = bind.raw_connection()
+            raw.detach()  # a LISTENing connection must not go back to the pool
+            conn = raw.driver_connection
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {channel}")
+            print(f"Listening for job events on '{channel}'")
+            while not stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    try:
+                        dispatch(bus, conn.notifies.pop(0).payload)
+                    except (ValueError, KeyError) as e:
+                        print(f"Warning: bad job event payload ({e})")
+        except Exception as e:
+            print(f"Warning: job event listener failed ({e}); reconnecting")
+            stop.wait(5)
+        finally:
+            if raw is not None:
+                try:
+                    raw.close()
+                except Exception:
+                    pass
+
+
+job_events = JobEventBus()
@@ -0,0 +1,384 @@
+"""
+Durable analysis job queue on the `analysis_jobs` table.
+
+`POST /analyze/{username}` only inserts a "queued" row; worker processes
+(worker.py) claim rows and run `process_user_games`. A job therefore
+survives API restarts, and engine load never competes with request
+handling.
+
+    queued ──claim──> running ──> done
+       ^                 │
+       └── retry (backoff) ┴──> failed   (after JOB_MAX_ATTEMPTS)
+
+Claiming uses `SELECT ... FOR UPDATE SKIP LOCKED`, so any number of
+workers can poll the table without handing the same job out twice. A
+running job's worker bumps `heartbeat_at` every JOB_HEARTBEAT_SECONDS;
+a job whose heartbeat is older than JOB_STALE_SECONDS (worker killed,
+container restarted) is claimable again. Retried and reclaimed jobs resume
+where they stopped: games already saved are skipped and only the
+remaining `requested - processed` are fetched.
+
+Jobs have a priority class — interactive (a single game someone is
+waiting for), sync (a user's recent games), backfill (bulk history) — and
+are claimed in class order. Within a class, users with fewer jobs already
+running go first, so one user's backlog can't hold every engine. A running
+job checks `higher_priority_waiting` at each game boundary and, if so,
+hands itself back to the queue (`requeue`) to resume later. It only gives
+way to a job left unclaimed for JOB_YIELD_GRACE_SECONDS: an idle worker
+would have claimed it by then, and yielding costs the running job its
+fetched archives.
+
+Requests overlap: `enqueue` folds a request into an in-flight job for the
+same user and opponent (raising its `requested` and priority) instead of
+adding a second one, and a job `claim_game`s each game before analyzing
+it, so two jobs never spend engine time on the same game.
+"""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+
+from sqlalchemy import and_, func, insert, or_, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from database import SessionLocal
+from job_events import job_events
+from models import AnalysisJob, GameClaim
+
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = int(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+JOB_RETRY_MAX_SECONDS = 30 * 60
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_SYNC = 1
+PRIORITY_BACKFILL = 2
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "sync": PRIORITY_SYNC, "backfill": PRIORITY_BACKFILL}
+## Jobs asking for more games than this default to the backfill class.
+SYNC_MAX_GAMES = int(os.getenv("SYNC_MAX_GAMES", "20"))
+## How long a more urgent job must wait unclaimed before a running one
+## yields to it; a few polls of an idle worker (worker.py --poll, 2s).
+JOB_YIELD_GRACE_SECONDS = int(os.getenv("JOB_YIELD_GRACE_SECONDS", "10"))
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def retry_delay(attempts: int) -> int:
+    """Seconds before retry number `attempts` (1-based): exponential backoff."""
+    return min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+
+
+def default_priority(new_games: int) -> int:
+    if new_games <= 1:
+        return PRIORITY_INTERACTIVE
+    return PRIORITY_SYNC if new_games <= SYNC_MAX_GAMES else PRIORITY_BACKFILL
+
+
+def _in_flight(db, username: str, opponent: str | None) -> AnalysisJob | None:
+    same_opponent = (AnalysisJob.opponent.is_(None) if opponent is None
+                     else func.lower(AnalysisJob.opponent) == opponent.lower())
+    return (
+        db.query(AnalysisJob)
+        .filter(func.lower(AnalysisJob.username) == username.lower(), same_opponent,
+                AnalysisJob.status.in_(("queued", "running")))
+        .order_by(AnalysisJob.id)
+        .with_for_update()
+        .first()
+    )
+
+
+def enqueue(db, username: str, new_games: int, opponent: str | None = None,
+            priority: int | None = None) -> AnalysisJob:
+    """Queue a job, or fold the request into an in-flight job for the same
+    user and opponent: that job's `requested` and priority are raised to
+    cover it and it is returned instead."""
+    priority = default_priority(new_games) if priority is None else priority
+    if db.bind.dialect.name == "postgresql":
+        # Serialize enqueues for one user so two requests can't both miss
+        # the in-flight job and insert twice. Released at commit.
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+                   {"key": f"analysis_jobs:{username.lower()}"})
+    job = _in_flight(db, username, opponent)
+    if job is not None:
+        # A running job picks a raised `requested` up when it finishes
+        # (`complete` refuses it), so nothing here needs to interrupt it.
+        job.requested = max(job.requested or 0, new_games)
+        job.priority = min(_job_priority(job), priority)
+        db.commit()
+        print(f"Request for {username} ({new_games} games) joined job {job.id}")
+        return job
+
+    now = int(time.time())
+    job = AnalysisJob(
+        username=username,
+        opponent=opponent,
+        priority=priority,
+        status="queued",
+        processed=0,
+        requested=new_games,
+        attempts=0,
+        created_at=now,
+        next_attempt_at=now,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _claimable(now: int):
+    queued = and_(
+        AnalysisJob.status == "queued",
+        or_(AnalysisJob.next_attempt_at.is_(None), AnalysisJob.next_attempt_at <= now),
+    )
+    # Rows from before the queue existed have no heartbeat at all.
+    abandoned = and_(
+        AnalysisJob.status == "running",
+        or_(AnalysisJob.heartbeat_at.is_(None), AnalysisJob.heartbeat_at < now - JOB_STALE_SECONDS),
+    )
+    return or_(queued, abandoned)
+
+
+def _priority():
+    # Rows from before priorities existed count as sync.
+    return func.coalesce(AnalysisJob.priority, PRIORITY_SYNC)
+
+
+def _job_priority(job: AnalysisJob) -> int:
+    return PRIORITY_SYNC if job.priority is None else job.priority
+
+
+def claim(db, worker_id: str) -> AnalysisJob | None:
+    """Lock and take the next claimable job, or None: highest priority class
+    first, then users with the fewest running jobs, then oldest."""
+    now = int(time.time())
+    other = aliased(AnalysisJob)
+    user_running = (
+        select(func.count())
+        .where(other.username == AnalysisJob.username, other.status == "running")
+        .correlate(AnalysisJob)
+        .scalar_subquery()
+    )
+    job = (
+        db.query(AnalysisJob)
+        .filter(_claimable(now))
+        .order_by(_priority(), user_running, AnalysisJob.id)
+        .with_for_update(skip_locked=True)
+        .limit(1)
+        .first()
+    )
+    if job is None:
+        db.rollback()
+        return None
+    if job.status == "running":
+        print(f"Reclaiming job {job.id} from {job.worker_id or 'unknown worker'} (no heartbeat)")
+    job.status = "running"
+    job.worker_id = worker_id
+    job.heartbeat_at = now
+    job.attempts = (job.attempts or 0) + 1
+    db.commit()
+    return job
+
+
+def owned(job_id: int, worker_id: str | None):
+    """Filter for a job's row while `worker_id` is still running it. Every
+    write a worker makes to its job goes through this, so one that lost the
+    job (see Heartbeat) can't touch the new owner's row. Without a
+    `worker_id` (a run outside the queue) the id alone matches."""
+    if worker_id is None:
+        return AnalysisJob.id == job_id
+    return and_(AnalysisJob.id == job_id, AnalysisJob.worker_id == worker_id,
+                AnalysisJob.status == "running")
+
+
+def heartbeat(job_id: int, worker_id: str) -> bool:
+    """Refresh a job's heartbeat. False if another worker has taken it over."""
+    db = SessionLocal()
+    try:
+        updated = (
+            db.query(AnalysisJob)
+            .filter(owned(job_id, worker_id))
+            .update({AnalysisJob.heartbeat_at: int(time.time())}, synchronize_session=False)
+        )
+        db.commit()
+        return updated == 1
+    finally:
+        db.close()
+
+
+class Heartbeat:
+    """Background thread bumping a job's heartbeat while it runs. `lost` is
+    set once another worker has taken the job over; the run must then stop
+    writing (see batch.process_user_games' `cancelled`)."""
+
+    def __init__(self, job_id: int, worker_id: str, interval: float = JOB_HEARTBEAT_SECONDS):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-{job_id}-heartbeat", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                if not heartbeat(self.job_id, self.worker_id):
+                    print(f"Job {self.job_id} is no longer ours; stopping heartbeat.")
+                    self.lost.set()
+                    return
+            except Exception as e:
+                print(f"Warning: heartbeat for job {self.job_id} failed ({e})")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def higher_priority_waiting(db, job: AnalysisJob, grace: int | None = None) -> bool:
+    """Has a job of a more urgent class than `job` been ready to claim for
+    `grace` seconds (JOB_YIELD_GRACE_SECONDS) without any worker taking it?"""
+    priority = _job_priority(job)
+    if priority == PRIORITY_INTERACTIVE:
+        return False
+    now = int(time.time())
+    grace = JOB_YIELD_GRACE_SECONDS if grace is None else grace
+    # Claimable since its next_attempt_at (set on enqueue, retry and requeue).
+    ready_at = func.coalesce(AnalysisJob.next_attempt_at, AnalysisJob.created_at, 0)
+    found = (
+        db.query(AnalysisJob.id)
+        .filter(_claimable(now), _priority() < priority, AnalysisJob.id != job.id,
+                ready_at <= now - grace)
+        .first()
+    )
+    db.rollback()  # don't hold a snapshot between games
+    return found is not None
+
+
+def complete(db, job_id: int, worker_id: str | None, covered: int, processed: int) -> bool:
+    """Mark a job "done" unless its `requested` has been raised past the
+    `covered` games this run set out to get (enqueue folding in a request),
+    or it is no longer `worker_id`'s. One conditional UPDATE, so a request
+    can't slip in between the check and the transition; enqueue's row lock
+    orders the two on Postgres."""
+    updated = (
+        db.query(AnalysisJob)
+        .filter(owned(job_id, worker_id),
+                or_(AnalysisJob.requested.is_(None), AnalysisJob.requested <= covered))
+        .update({AnalysisJob.status: "done", AnalysisJob.processed: processed},
+                synchronize_session=False)
+    )
+    db.commit()
+    return updated == 1
+
+
+def _transition(db, job: AnalysisJob, worker_id: str, values: dict) -> bool:
+    """Apply `values` to `job` while `worker_id` still runs it, as one
+    conditional UPDATE. False (and nothing written) if it has lost the job."""
+    updated = (
+        db.query(AnalysisJob)
+        .filter(owned(job.id, worker_id))
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    db.refresh(job)
+    if updated != 1:
+        print(f"Job {job.id} was taken over; leaving it to {job.worker_id}")
+        return False
+    _publish_status(job)
+    return True
+
+
+def requeue(db, job: AnalysisJob, worker_id: str) -> bool:
+    """Hand a preempted job back to the queue, ready to resume at once.
+    Preemption isn't a failed attempt. False if the job is no longer ours."""
+    requeued = _transition(db, job, worker_id, {
+        AnalysisJob.status: "queued",
+        AnalysisJob.next_attempt_at: int(time.time()),
+        AnalysisJob.heartbeat_at: None,
+        # Only a claim changes attempts, and that takes the job from us.
+        AnalysisJob.attempts: max(0, (job.attempts or 1) - 1),
+    })
+    if requeued:
+        print(f"Job {job.id} preempted after {job.processed or 0}/{job.requested} games; requeued")
+    return requeued
+
+
+def claim_game(db, url: str, job_id: int) -> bool:
+    """Reserve `url` for `job_id` until `release_games`. False while another
+    running job holds it; a claim left by a job that stopped running (or
+    whose heartbeat went stale) is taken over."""
+    now = int(time.time())
+    try:
+        db.execute(insert(GameClaim).values(url=url, job_id=job_id, claimed_at=now))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+
+    held = db.query(GameClaim).filter(GameClaim.url == url).first()
+    if held is None:  # released in the meantime
+        return claim_game(db, url, job_id)
+    if held.job_id == job_id:
+        return True
+    owner = db.query(AnalysisJob).filter(AnalysisJob.id == held.job_id).first()
+    alive = (owner is not None and owner.status == "running"
+             and owner.heartbeat_at is not None and owner.heartbeat_at >= now - JOB_STALE_SECONDS)
+    if alive:
+        db.rollback()
+        return False
+    # Compare-and-swap so two jobs can't both take over the same dead claim.
+    taken = (
+        db.query(GameClaim)
+        .filter(GameClaim.url == url, GameClaim.job_id == held.job_id)
+        .update({GameClaim.job_id: job_id, GameClaim.claimed_at: now}, synchronize_session=False)
+    )
+    db.commit()
+    return taken == 1
+
+
+def release_games(db, job_id: int, urls=None) -> None:
+    """Drop `job_id`'s game claims — the given `urls`, or all of them."""
+    q = db.query(GameClaim).filter(GameClaim.job_id == job_id)
+    if urls is not None:
+        q = q.filter(GameClaim.url.in_(list(urls)))
+    q.delete(synchronize_session=False)
+    db.commit()
+
+
+def _publish_status(job: AnalysisJob) -> None:
+    job_events.publish(job.id, "job", {
+        "status": job.status, "processed": job.processed or 0,
+        "requested": job.requested, "error": job.error,
+    })
+
+
+def fail_or_retry(db, job: AnalysisJob, error: str, worker_id: str,
+                  max_attempts: int = JOB_MAX_ATTEMPTS) -> str | None:
+    """Record a failed attempt: back to "queued" with backoff while attempts
+    remain, else "failed". Returns the new status, or None (and records
+    nothing) if the job is no longer `worker_id`'s."""
+    attempts = job.attempts or 1
+    values = {AnalysisJob.error: error, AnalysisJob.heartbeat_at: None}
+    if attempts < max_attempts:
+        delay = retry_delay(attempts)
+        values.update({AnalysisJob.status: "queued",
+                       AnalysisJob.next_attempt_at: int(time.time()) + delay})
+    else:
+        values[AnalysisJob.status] = "failed"
+    if not _transition(db, job, worker_id, values):
+        return None
+    if job.status == "queued":
+        print(f"Job {job.id} failed (attempt {attempts}/{max_attempts}); retrying in {delay}s: {error}")
+    else:
+        print(f"Job {job.id} failed after {attempts} attempts: {error}")
+    return job.status
@@ -1,7 +1,9 @@
 import os
+import time
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
 from langchain.prompts import PromptTemplate
+from metrics import LLM_REQUEST_SECONDS
 
 load_dotenv()
 
@@ -52,6 +54,16 @@ CRITICAL RULES:
 6. No markdown, no bold. Plain text.
 """))
 
+    def _invoke(self, prompt, operation):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self.llm.invoke(prompt)
+            outcome = "ok"
+            return response
+        finally:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, operation, outcome)
+
     def review_season(self, stats):
         data = {
             "username": stats['username'],
@@ -65,7 +77,7 @@ CRITICAL RULES:
 
         prompt = self.season_template.format(**data)
         try:
-            response = self.llm.invoke(prompt)
+            response = self._invoke(prompt, "season")
             return response.content
         except Exception as e:
             return f"Error generating season review: {e}"
@@ -105,7 +117,7 @@ CRITICAL RULES:
 
         prompt = self.move_template.format(**move_data)
         try:
-            response = self.llm.invoke(prompt)
+            response = self._invoke(prompt, "move")
             return response.content
         except Exception as e:
             return f"Error generating move review: {e}"
\ No newline at end of file
@@ -0,0 +1,229 @@
+"""
+Process-wide counters and histograms in the Prometheus text format.
+
+Small in-house registry (no client library): every metric is a fixed set of
+floats per label combination, so recording is a lock plus a few additions —
+cheap enough for the per-ply hot path. `render()` produces the exposition
+text served by `GET /metrics` (api.py); worker processes, which record most
+of the analysis metrics, serve it themselves with `serve()` (worker.py).
+
+    PLIES_ANALYZED.inc()
+    with DB_WRITE_SECONDS.time("save_analysis"):
+        ...
+
+Labels are positional and must be low-cardinality (stage names, route
+templates, status codes) — never usernames, URLs or game ids.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; covers sub-millisecond lookups up to multi-minute games.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_registry: list = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name, _label_text(self.labelnames, labels), value
+
+
+class CallbackMetric:
+    """Value read from a callback at scrape time, for numbers another module
+    already keeps (e.g. the eval cache's hit counter)."""
+
+    def __init__(self, name: str, help: str, read, kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self._read = read
+        _registry.append(self)
+
+    def samples(self):
+        try:
+            value = self._read()
+        except Exception:
+            return
+        if value is not None:
+            yield self.name, "", value
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple, list[float]] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def time(self, *labels) -> _Timer:
+        return _Timer(self, labels)
+
+    def count(self, *labels) -> int:
+        row = self._values.get(labels)
+        return sum(row[:-1]) if row else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(row)) for labels, row in self._values.items())
+        for labels, row in items:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), row[:-1]):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket", _label_text(self.labelnames, labels, le), cumulative
+            base = _label_text(self.labelnames, labels)
+            yield f"{self.name}_sum", base, row[-1]
+            yield f"{self.name}_count", base, cumulative
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per scrape is just noise
+
+
+def serve(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve GET /metrics on a daemon thread, for processes without the API."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Serving metrics on :{server.server_port}/metrics")
+    return server
+
+
+# --- Application metrics ---------------------------------------------------------
+
+STAGE_SECONDS = Histogram(
+    "chess_analyzer_stage_seconds",
+    "Time spent in each analysis stage (see stage_timing.py).",
+    ("stage",),
+)
+PLIES_ANALYZED = Counter("chess_analyzer_plies_analyzed_total", "Plies classified by analyze_game.")
+GAMES_ANALYZED = Counter("chess_analyzer_games_analyzed_total", "Games analyzed by analyze_game.", ("mode",))
+DB_WRITE_SECONDS = Histogram(
+    "chess_analyzer_db_write_seconds", "Time spent persisting analysis (crud.py).", ("operation",)
+)
+CHESSCOM_REQUEST_SECONDS = Histogram(
+    "chess_analyzer_chesscom_request_seconds", "Chess.com API request latency.", ("endpoint", "outcome")
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "chess_analyzer_llm_request_seconds", "LLM review request latency.", ("operation", "outcome")
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "chess_analyzer_http_request_seconds", "API request latency by route.", ("method", "route", "status")
+)
+
+
+def _eval_cache_stat(attr: str):
+    def read():
+        from eval_cache import _cache
+        return getattr(_cache, attr) if _cache is not None else None
+    return read
+
+
+def _engine_restarts():
+    from engine_supervisor import total_restarts
+    return total_restarts()
+
+
+CallbackMetric("chess_analyzer_eval_cache_hits_total", "Eval cache hits.",
+               _eval_cache_stat("hits"), kind="counter")
+CallbackMetric("chess_analyzer_eval_cache_misses_total", "Eval cache misses.",
+               _eval_cache_stat("misses"), kind="counter")
+CallbackMetric("chess_analyzer_engine_restarts_total", "Engine processes respawned by the supervisor.",
+               _engine_restarts, kind="counter")
@@ -18,8 +18,6 @@ from typing import Iterable, Iterator
 import chess
 import chess.pgn
 
-from game_analysis import static_exchange_eval
-
 # Pieces and their material values.
 PIECE_VALUE = {
     chess.PAWN: 1,
@@ -86,6 +84,41 @@ def _passed_pawns(board: chess.Board, color: bool) -> int:
     return passed
 
 
+def _exchange_eval(board: chess.Board, move: chess.Move) -> int:
+    """The swap-off on `move`'s target square as the risk model was trained
+    on it: the cheapest attacker recaptures (the king counting as cheapest)
+    and the exchange stops at the first illegal recapture.
+
+    game_analysis.static_exchange_eval has since become more exact (x-rays,
+    pins, king recaptures), which changes the threat features for some
+    positions. They keep this definition until the model is retrained.
+    """
+    to_sq = move.to_square
+    b = board.copy(stack=False)
+
+    gain = [PIECE_VALUE[b.piece_type_at(to_sq)] if b.piece_at(to_sq) else 0]
+    occupied_value = PIECE_VALUE[b.piece_type_at(move.from_square)]
+    b.push(move)
+    side = b.turn
+
+    while True:
+        attackers = b.attackers(side, to_sq)
+        if not attackers:
+            break
+        cheapest_sq = min(attackers, key=lambda s: PIECE_VALUE[b.piece_type_at(s)])
+        recapture = chess.Move(cheapest_sq, to_sq)
+        if recapture not in b.legal_moves:
+            break
+        gain.append(occupied_value - gain[-1])
+        occupied_value = PIECE_VALUE[b.piece_type_at(cheapest_sq)]
+        b.push(recapture)
+        side = not side
+
+    for i in range(len(gain) - 2, -1, -1):
+        gain[i] = -max(-gain[i], gain[i + 1])
+    return gain[0]
+
+
 def _threats_count(board: chess.Board, color: bool) -> tuple[int, int]:
     """How many of `color`'s pieces are under a positive-SEE attack right now.
     Returns (count, total_value_at_risk). Pawns count toward count but not value."""
@@ -107,7 +140,7 @@ def _threats_count(board: chess.Board, color: bool) -> tuple[int, int]:
         if capture not in b.legal_moves:
             continue
         try:
-            see = static_exchange_eval(b, capture)
+            see = _exchange_eval(b, capture)
         except Exception:
             continue
         if see > 0:
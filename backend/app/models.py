@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, BigInteger, ForeignKey, Float, JSON
+from sqlalchemy import Column, Integer, String, Text, BigInteger, Boolean, ForeignKey, Float, JSON
 from database import Base
 
 class Game(Base):
@@ -29,17 +29,40 @@ class Game(Base):
     black_move_counts = Column(JSON)
     ai_insight_cache = Column(Text, nullable=True)
 
+    # A quick low-depth preview is saved first and refined in place to full
+    # depth afterwards (batch.py). Null for games analyzed before previews.
+    provisional = Column(Boolean, nullable=True)
+    analysis_depth = Column(Integer, nullable=True)
+
 class AnalysisJob(Base):
     __tablename__ = "analysis_jobs"
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, index=True)
-    status = Column(String, default="running")  # running | done | failed
+    status = Column(String, default="queued")  # queued | running | done | failed
     processed = Column(Integer, default=0)
     requested = Column(Integer, default=0)
     error = Column(Text, nullable=True)
     created_at = Column(BigInteger, default=0)
 
+    # Durable queue bookkeeping (job_queue.py). Unix timestamps.
+    opponent = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=True)
+    next_attempt_at = Column(BigInteger, nullable=True)
+    heartbeat_at = Column(BigInteger, nullable=True)
+    worker_id = Column(String, nullable=True)
+    priority = Column(Integer, nullable=True)  # job_queue.PRIORITIES; lower runs first
+
+
+class GameClaim(Base):
+    """A game some job is analyzing right now (job_queue.claim_game), so
+    overlapping jobs don't analyze it twice."""
+    __tablename__ = "game_claims"
+
+    url = Column(String, primary_key=True)
+    job_id = Column(Integer, index=True)
+    claimed_at = Column(BigInteger)
+
 
 class MoveAnalysis(Base):
     __tablename__ = "move_analysis"
@@ -59,3 +82,10 @@ class MoveAnalysis(Base):
     captured_piece = Column(String)
     is_sacrifice = Column(String, nullable=True)  # 'true'/'false', nullable for old rows
     llm_review = Column(Text, nullable=True)
+    # Raw engine output for this ply: {"top_moves", "played", "depth"} in the
+    # Stockfish wrapper formats. Lets reclassify.py rebuild labels without
+    # re-running the engine. Null for rows analyzed before it was stored.
+    engine_data = Column(JSON, nullable=True)
+    # Search depth of this ply, and whether it is still the preview result.
+    depth = Column(Integer, nullable=True)
+    provisional = Column(Boolean, nullable=True)
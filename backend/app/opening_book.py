@@ -0,0 +1,44 @@
+"""
+In-memory Polyglot opening book.
+
+`chess.polyglot.open_reader` re-opens and re-mmaps the book file on every
+call. Since analysis only ever asks "is this position in the book?", we load
+the sorted entry keys of the book once into a NumPy array and answer by
+binary search on the position's Zobrist hash.
+
+The array is built once per process, at import time. Processes started with
+spawn (bulk_analyze's pool, see the note there) don't inherit it and each
+load their own copy: 8 bytes per book entry.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+# Polyglot entry layout: 16 big-endian bytes, sorted by key.
+_ENTRY_DTYPE = np.dtype([
+    ("key", ">u8"),
+    ("move", ">u2"),
+    ("weight", ">u2"),
+    ("learn", ">u4"),
+])
+
+
+class OpeningBook:
+    def __init__(self, keys: np.ndarray):
+        self.keys = keys
+
+    @classmethod
+    def load(cls, path: str) -> "OpeningBook":
+        entries = np.fromfile(path, dtype=_ENTRY_DTYPE)
+        # Weight-0 entries are "deleted" moves; chess.polyglot skips them too.
+        keys = entries["key"][entries["weight"] > 0].astype(np.uint64)
+        keys = np.unique(keys)  # sorted, one key per position
+        return cls(keys)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: int) -> bool:
+        key = np.uint64(key)
+        i = np.searchsorted(self.keys, key)
+        return bool(i < len(self.keys) and self.keys[i] == key)
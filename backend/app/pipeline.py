@@ -0,0 +1,175 @@
+"""
+Bounded-queue stage pipeline, used by batch.process_user_games:
+
+    fetch ─> select ─> preview ─> analyze ─> persist
+    (HTTP)   (dedup,   (engine)   (engine)   (DB, caller's thread)
+             claims)
+
+Each stage runs on its own thread(s) and passes items on through a bounded
+queue.Queue. A stage never waits for the one before it to finish its whole
+input, and a slow stage applies backpressure instead of letting a queue grow
+without limit. The engines keep searching while the next archive month
+downloads and the previous game's rows are written.
+
+A stage forwards DONE to its downstream queues once all of its workers
+have exited; the last stage reads with `drain` until DONE arrives. `cancel`
+stops every stage from starting new items. Items already being processed
+still finish and flow downstream, so the last stage drains them as usual
+(preemption keeps in-flight games). The first exception raised by a worker
+cancels the pipeline and is re-raised by `join`.
+"""
+from __future__ import annotations
+
+import queue
+import threading
+import time
+
+DONE = object()
+
+
+class Pipeline:
+    def __init__(self, name: str = "pipeline"):
+        self.name = name
+        self.stopped = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._errors: list[BaseException] = []
+
+    @staticmethod
+    def queue(maxsize: int) -> queue.Queue:
+        return queue.Queue(maxsize=maxsize)
+
+    def cancel(self) -> None:
+        self.stopped.set()
+
+    def _fail(self, e: BaseException) -> None:
+        self._errors.append(e)
+        self.cancel()
+
+    def source(self, name: str, items, outbox: queue.Queue) -> None:
+        """Feed an iterable (e.g. a generator doing HTTP) into `outbox`."""
+        def run():
+            try:
+                for item in items:
+                    if self.stopped.is_set():
+                        break
+                    outbox.put(item)
+            except BaseException as e:
+                self._fail(e)
+            finally:
+                outbox.put(DONE)
+
+        self._start(name, run)
+
+    def stage(self, name: str, fn, inbox: queue.Queue, outboxes: list[queue.Queue],
+              workers: int = 1, batch: int = 1, wait: float = 0.0) -> None:
+        """Run `fn` over the items of `inbox` on `workers` threads. `fn` emits
+        results itself (`outbox.put(...)`). With `batch` > 1, `fn` receives a
+        list: the next item plus whatever else arrives within `wait` seconds
+        (or is already queued, with no `wait`), up to `batch`. The inbox
+        running out or a cancel ends the wait early. `batch` may be a
+        callable, asked for the limit before each batch is gathered. The
+        workers gather one batch at a time, so they don't split the items
+        arriving between them."""
+        remaining = [workers]
+        lock = threading.Lock()
+        gathering = threading.Lock()
+        batched = callable(batch) or batch > 1
+
+        def run():
+            try:
+                while True:
+                    if batched:
+                        with gathering:
+                            item = self._gather(inbox, batch, wait)
+                    else:
+                        item = inbox.get()
+                    if item is DONE:
+                        inbox.put(DONE)  # for the sibling workers
+                        return
+                    if not self.stopped.is_set():
+                        fn(item)
+            except BaseException as e:
+                self._fail(e)
+                # Keep consuming so upstream puts can't block forever.
+                while inbox.get() is not DONE:
+                    pass
+                inbox.put(DONE)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    for outbox in outboxes:
+                        outbox.put(DONE)
+
+        for n in range(workers):
+            self._start(f"{name}-{n}", run)
+
+    def _gather(self, inbox: queue.Queue, batch, wait: float):
+        """The next batch from `inbox`, or DONE."""
+        item = inbox.get()
+        if item is DONE:
+            return DONE
+        limit = batch() if callable(batch) else batch
+        items = [item]
+        deadline = time.monotonic() + wait
+        while len(items) < limit:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0 and not self.stopped.is_set():
+                    # In short slices, so a cancel isn't kept waiting.
+                    item = inbox.get(timeout=min(timeout, 0.1))
+                else:
+                    item = inbox.get_nowait()
+            except queue.Empty:
+                if timeout > 0 and not self.stopped.is_set():
+                    continue
+                break
+            if item is DONE:
+                inbox.put(DONE)
+                break
+            items.append(item)
+        return items
+
+    def drain(self, inbox: queue.Queue, batch: int = 1, wait: float = 0.0):
+        """Yield lists of up to `batch` items from the last queue until DONE.
+        After the first item, waits at most `wait` seconds for the batch
+        to fill."""
+        while True:
+            item = inbox.get()
+            if item is DONE:
+                return
+            items = [item]
+            deadline = time.monotonic() + wait
+            while len(items) < batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = inbox.get(timeout=timeout) if timeout > 0 else inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if item is DONE:
+                    inbox.put(DONE)  # ends the next round (or a later `close`)
+                    break
+                items.append(item)
+            yield items
+
+    def close(self, inbox: queue.Queue) -> None:
+        """Cancel, discard whatever still reaches the last queue, and wait
+        for all threads. Used when the consumer itself fails; worker errors
+        are not raised, so they don't mask the consumer's."""
+        self.cancel()
+        while inbox.get() is not DONE:
+            pass
+        for thread in self._threads:
+            thread.join()
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def _start(self, name: str, target) -> None:
+        thread = threading.Thread(target=target, name=f"{self.name}-{name}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
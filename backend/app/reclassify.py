@@ -0,0 +1,127 @@
+"""
+Recompute move classifications from stored engine output.
+
+Usage (inside backend container):
+    python reclassify.py [--username <username>] [--batch 200]
+
+Every MoveAnalysis row keeps the raw engine data for its ply (top-2 lines,
+played-move eval, depth). After changing a threshold such as THRESH_MISTAKE
+or GREAT_SECOND_GAP_MIN, this rebuilds `classification`, the per-side
+accuracy and `white/black_move_counts` for every game with pure Python —
+no Stockfish. The accuracies of each --batch chunk of games are computed
+in one vectorized pass. Games analyzed before raw data was stored are
+skipped; they need a real re-analysis.
+"""
+from __future__ import annotations
+
+import argparse
+
+from sqlalchemy import or_
+
+from database import SessionLocal
+from game_analysis import reclassify_game, summarize_game, summarize_games
+from models import Game, MoveAnalysis
+
+
+def _reclassify_moves(db, game: Game) -> tuple[int, list[dict]] | None:
+    """Relabel one game's MoveAnalysis rows in the session. Returns (plies
+    whose label changed, new results), or None if the game has no
+    (complete) raw engine data."""
+    rows = (
+        db.query(MoveAnalysis)
+        .filter(MoveAnalysis.game_id == game.id)
+        .order_by(MoveAnalysis.id)
+        .all()
+    )
+    if not rows or not game.pgn or any(r.engine_data is None for r in rows):
+        return None
+    try:
+        analysis = reclassify_game(game.pgn, [r.engine_data for r in rows], summarize=False)
+    except ValueError as e:
+        print(f"Skipping game {game.id}: {e}")
+        return None
+
+    changed = 0
+    for row, result in zip(rows, analysis["moves"]):
+        if row.classification != result["classification"]:
+            changed += 1
+            row.llm_review = None  # explained the old label
+        row.classification = result["classification"]
+        row.score = result["score"]
+        row.mate_in = result["mate_in"]
+        row.best_mate_in = result["best_mate_in"]
+        row.best_move = result["best_move"]
+        row.opening = result["opening"]
+    return changed, analysis["moves"]
+
+
+def _apply_summary(game: Game, summary: dict) -> None:
+    white = summary["white"]
+    black = summary["black"]
+    game.white_accuracy = white["accuracy"]
+    game.white_move_counts = white["classification_counts"]
+    game.black_accuracy = black["accuracy"]
+    game.black_move_counts = black["classification_counts"]
+    game.ai_insight_cache = None
+
+
+def reclassify_stored_game(db, game: Game) -> int | None:
+    """Reclassify one game in the session. Returns the number of plies whose
+    label changed, or None if the game has no (complete) raw engine data."""
+    result = _reclassify_moves(db, game)
+    if result is None:
+        return None
+    changed, moves = result
+    _apply_summary(game, summarize_game(moves))
+    return changed
+
+
+def reclassify_chunk(db, games: list[Game]) -> tuple[int, int]:
+    """Reclassify several games; their accuracies are computed in one batch.
+    Returns (games reclassified, labels changed)."""
+    done = []
+    changed = 0
+    for game in games:
+        result = _reclassify_moves(db, game)
+        if result is not None:
+            changed += result[0]
+            done.append((game, result[1]))
+    for (game, _), summary in zip(done, summarize_games([moves for _, moves in done])):
+        _apply_summary(game, summary)
+    return len(done), changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reclassify stored games without the engine.")
+    parser.add_argument("--username", default=None)
+    parser.add_argument("--batch", type=int, default=200, help="games per commit")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        query = db.query(Game)
+        if args.username:
+            query = query.filter(
+                or_(Game.white_username.ilike(args.username), Game.black_username.ilike(args.username))
+            )
+        game_ids = [gid for (gid,) in query.with_entities(Game.id).order_by(Game.id)]
+        reclassified = skipped = changed = 0
+        for start in range(0, len(game_ids), args.batch):
+            chunk = game_ids[start:start + args.batch]
+            games = db.query(Game).filter(Game.id.in_(chunk)).all()
+            chunk_done, chunk_changed = reclassify_chunk(db, games)
+            reclassified += chunk_done
+            skipped += len(games) - chunk_done
+            changed += chunk_changed
+            db.commit()
+            print(f"  {start + len(chunk)}/{len(game_ids)} games: "
+                  f"{reclassified} reclassified, {skipped} skipped")
+        db.commit()
+        print(f"Reclassified {reclassified} games ({changed} labels changed), "
+              f"skipped {skipped} without raw engine data.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
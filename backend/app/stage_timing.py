@@ -0,0 +1,76 @@
+"""
+Wall-clock timing of the stages inside `analyze_game`.
+
+`game_analysis` wraps each stage in `stage(name)`:
+
+    parse      PGN parsing
+    san        SAN generation
+    sacrifice  is_sacrifice / static exchange evaluation
+    book       ECO name + Polyglot book lookup
+    lookup     precomputed book evaluations and eval-cache reads/writes
+    engine     waiting on the engine (set position + search)
+    stats      accuracy / classification counts (calculate_stats)
+
+Every stage is observed into the `chess_analyzer_stage_seconds` histogram
+(metrics.py, served on /metrics). Additionally, a thread inside `collect()`
+gets its own per-call totals, which is what benchmark.py reports:
+
+    with collect() as times:
+        analyze_game(pgn)
+    times.seconds["engine"]
+
+Stages run on worker threads (the `parallel` searcher) are not attributed
+to the collecting thread.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from metrics import STAGE_SECONDS
+
+STAGES = ("parse", "san", "sacrifice", "book", "lookup", "engine", "stats")
+
+_local = threading.local()
+
+
+class StageTimes:
+    def __init__(self):
+        self.seconds: dict[str, float] = defaultdict(float)
+        self.calls: dict[str, int] = defaultdict(int)
+
+
+class _Stage:
+    __slots__ = ("times", "name", "start")
+
+    def __init__(self, times: StageTimes | None, name: str):
+        self.times = times
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, self.name)
+        if self.times is not None:
+            self.times.seconds[self.name] += elapsed
+            self.times.calls[self.name] += 1
+
+
+def stage(name: str):
+    return _Stage(getattr(_local, "times", None), name)
+
+
+@contextmanager
+def collect():
+    """Record stage times on this thread for the duration of the block."""
+    previous = getattr(_local, "times", None)
+    times = StageTimes()
+    _local.times = times
+    try:
+        yield times
+    finally:
+        _local.times = previous
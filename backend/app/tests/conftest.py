@@ -1,12 +1,111 @@
-"""Make the app modules importable as top-level (matches runtime layout).
+"""Make the app modules importable as top-level (matches runtime layout),
+and hold the test doubles shared across test files.
 
 In the container the app is copied flat into /app and modules import each
 other as `from game_analysis import ...`. Tests run from backend/app, so we
 add the app directory (this file's parent's parent) to sys.path.
+
+Test files import the doubles with `from conftest import PGN, StubEngine`
+and get the `stub` / `pool` fixtures automatically.
 """
 import os
 import sys
 
 APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if APP_DIR not in sys.path:
-    sys.path.insert(0, APP_DIR)
\ No newline at end of file
+    sys.path.insert(0, APP_DIR)
+# Keep tests off the persistent eval cache; tests that exercise it point it
+# at a tmp_path explicitly.
+os.environ.setdefault("EVAL_CACHE_PATH", "")
+
+import chess  # noqa: E402  (after the sys.path setup above)
+import pytest  # noqa: E402
+
+import engine_pool  # noqa: E402
+import game_analysis  # noqa: E402
+from engine_pool import EnginePool  # noqa: E402
+
+
+PGN = """[Event "Casual"]
+[White "a"]
+[Black "b"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+"""
+
+VALUES = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 300,
+          chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0}
+
+
+def material(board):
+    return sum(
+        VALUES[p.piece_type] * (1 if p.color == chess.WHITE else -1)
+        for p in board.piece_map().values()
+    )
+
+
+class StubEngine:
+    """Material-only stand-in for the Stockfish wrapper, counting searches.
+    Scores are in White's frame, like the wrapper's."""
+
+    depth = "16"
+
+    def __init__(self):
+        self.board = chess.Board()
+        self.params = {"MultiPV": 1}
+        self.searches = []
+        self.depths = []
+
+    def get_parameters(self):
+        return self.params
+
+    def update_engine_parameters(self, params):
+        self.params.update(params)
+
+    def set_depth(self, depth):
+        self.depth = str(depth)
+
+    def set_fen_position(self, fen, send_ucinewgame_token=True):
+        self.board = chess.Board(fen)
+
+    def _line(self, move):
+        self.board.push(move)
+        if self.board.is_checkmate():
+            mate = 1 if self.board.turn == chess.BLACK else -1
+            line = {"Move": move.uci(), "Centipawn": None, "Mate": mate}
+        else:
+            line = {"Move": move.uci(), "Centipawn": material(self.board), "Mate": None}
+        self.board.pop()
+        return line
+
+    def get_top_moves(self, n):
+        self.searches.append(self.board.fen())
+        self.depths.append(int(self.depth))
+        sign = 1 if self.board.turn == chess.WHITE else -1
+        lines = [self._line(m) for m in self.board.legal_moves]
+        lines.sort(key=lambda l: -sign * game_analysis.get_score_val(l))
+        return lines[:n]
+
+    def get_evaluation(self):
+        self.searches.append(self.board.fen())
+        self.depths.append(int(self.depth))
+        if self.board.is_checkmate():
+            return {"type": "mate", "value": 0}
+        return {"type": "cp", "value": material(self.board)}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """A StubEngine serving as game_analysis's default engine."""
+    engine = StubEngine()
+    monkeypatch.setattr(game_analysis, "_get_engine", lambda: engine)
+    return engine
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A 3-engine pool of StubEngines standing in for engine_pool.get_pool()."""
+    p = EnginePool(size=3, factory=StubEngine)
+    monkeypatch.setattr(engine_pool, "get_pool", lambda: p)
+    return p
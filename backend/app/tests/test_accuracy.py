@@ -0,0 +1,55 @@
+"""The vectorized accuracy must match the original per-window Python loop."""
+import random
+import statistics
+
+import pytest
+
+from accuracy import side_accuracies
+from conftest import PGN, StubEngine
+from game_analysis import analyze_game, calculate_stats, summarize_games
+
+
+def reference_accuracy(win_percents, accuracies):
+    # The pre-NumPy implementation, kept verbatim as the oracle.
+    window_size = min(max(2, min(8, len(accuracies) // 10)), len(win_percents))
+    weights = []
+    for i in range(len(win_percents) - window_size + 1):
+        window = win_percents[i:i + window_size]
+        std_dev = statistics.stdev(window) if len(window) > 1 else 0.5
+        weights.append(max(0.5, min(12, std_dev)))
+    min_len = min(len(accuracies), len(weights))
+    weighted = sum(accuracies[i] * weights[i] for i in range(min_len)) / sum(weights[:min_len])
+    safe = [max(0.1, a) for a in accuracies]
+    harmonic = len(safe) / sum(1 / a for a in safe)
+    return (weighted + harmonic) / 2
+
+
+def random_side(rng, n):
+    return [rng.uniform(0, 100) for _ in range(n + 1)], [rng.uniform(0, 100) for _ in range(n)]
+
+
+def test_matches_reference_across_lengths():
+    rng = random.Random(7)
+    sides = [random_side(rng, n) for n in [1, 2, 3, 9, 10, 19, 20, 45, 79, 80, 81, 150]]
+    got = side_accuracies(sides)
+    for (wins, accs), value in zip(sides, got):
+        assert value == pytest.approx(reference_accuracy(wins, accs), abs=1e-9)
+
+
+def test_flat_and_zero_accuracy_sides():
+    sides = [([50.0] * 31, [100.0] * 30), ([80.0, 20.0, 10.0], [0.0, 0.0]), ([], [])]
+    got = side_accuracies(sides)
+    assert got[0] == pytest.approx(reference_accuracy(*sides[0]))
+    assert got[1] == pytest.approx(reference_accuracy(*sides[1]))
+    assert got[2] == 0
+
+
+def test_batch_summary_equals_per_game_stats():
+    moves = analyze_game(PGN, engine=StubEngine())["moves"]
+    batch = summarize_games([moves, moves[:7], []])
+    assert batch[0]["white"] == calculate_stats(moves[0::2])
+    assert batch[1]["black"] == calculate_stats(moves[:7][1::2])
+    assert batch[2] == {
+        "white": {"accuracy": 0, "classification_counts": {}},
+        "black": {"accuracy": 0, "classification_counts": {}},
+    }
@@ -0,0 +1,52 @@
+"""Tests for adaptive-depth analysis (shallow sweep + deep critical plies)."""
+from conftest import PGN
+import game_analysis
+from adaptive_report import compare_game
+from game_analysis import ADAPTIVE_SHALLOW_DEPTH, _is_critical, analyze_game
+
+
+def ply(is_book=False, is_sac=False):
+    return {"is_book": is_book, "is_sac": is_sac}
+
+
+def result(before=50.0, after=50.0, win_diff=0.0):
+    return {"win_percent_before": before, "win_percent_after": after, "win_diff": win_diff}
+
+
+def test_book_plies_never_critical():
+    assert not _is_critical(ply(is_book=True, is_sac=True), result(before=90, after=10))
+
+
+def test_sacrifice_is_critical():
+    assert _is_critical(ply(is_sac=True), result())
+
+
+def test_big_swing_is_critical():
+    assert _is_critical(ply(), result(before=50, after=30, win_diff=0.0))
+
+
+def test_near_tier_boundary_is_critical():
+    assert _is_critical(ply(), result(win_diff=game_analysis.THRESH_MISTAKE - 1))
+
+
+def test_quiet_ply_far_from_boundaries_is_not_critical():
+    assert not _is_critical(ply(), result(win_diff=7))
+
+
+def test_adaptive_mode_searches_shallow_first(stub):
+    result = analyze_game(PGN, mode="adaptive")
+    assert stub.depths[0] == ADAPTIVE_SHALLOW_DEPTH
+    # Engine depth is restored for later callers.
+    assert stub.depth == "16"
+    deep = [m for m in result["moves"] if m["depth"] == 16]
+    # ...Nf6?? allows mate: a huge swing, so it must be re-searched deep.
+    assert result["moves"][-2]["move_san"] == "Nf6"
+    assert result["moves"][-2] in deep
+    assert len(deep) < len(result["moves"])
+
+
+def test_compare_game_reports_agreement(stub):
+    # The stub engine is depth-independent, so both modes must agree.
+    report = compare_game(PGN, engine=stub)
+    assert report["agree"] == report["plies"]
+    assert report["disagreements"] == []
@@ -0,0 +1,148 @@
+"""End-to-end tests for process_user_games: the stage pipeline against the
+stub engine pool and a file-backed SQLite database (sessions on separate
+threads need separate connections, like on Postgres)."""
+import pytest
+
+pytest.importorskip("requests")  # chesscom's HTTP client
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+import batch  # noqa: E402
+import job_queue  # noqa: E402
+from conftest import PGN  # noqa: E402
+from database import Base  # noqa: E402
+from job_queue import claim, enqueue  # noqa: E402
+from models import AnalysisJob, Game, GameClaim  # noqa: E402
+
+GAMES = 12
+
+
+def _games(n):
+    return [{"url": f"https://chess.com/game/{i}", "pgn": PGN.replace('"a"', f'"p{i}"'),
+             "time_class": "blitz", "end_time": i} for i in range(n)]
+
+
+@pytest.fixture
+def Session(tmp_path, monkeypatch, pool):
+    engine = create_engine(f"sqlite:///{tmp_path / 'batch.db'}", poolclass=NullPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(batch, "SessionLocal", Session)
+    monkeypatch.setattr(job_queue, "SessionLocal", Session)
+    monkeypatch.setattr(batch, "get_pool", lambda: pool)
+    monkeypatch.setattr(batch, "ANALYSIS_MODE", "single_pass")
+    monkeypatch.setattr(batch, "BATCH_CHUNK_WAIT_SECONDS", 2.0)
+
+    class Client:
+        def get_recent_games(self, username):
+            return iter(_games(GAMES))
+
+    monkeypatch.setattr(batch, "ChessComClient", Client)
+    return Session
+
+
+@pytest.fixture
+def chunks(monkeypatch):
+    """Sizes of the analyze_games calls."""
+    sizes = []
+    analyze_games = batch.analyze_games
+
+    def recording(pgns, **kwargs):
+        sizes.append(len(pgns))
+        return analyze_games(pgns, **kwargs)
+
+    monkeypatch.setattr(batch, "analyze_games", recording)
+    return sizes
+
+
+def _claimed_job(Session, n=GAMES):
+    db = Session()
+    job = enqueue(db, "alice", n)
+    claim(db, "w1")
+    job_id = job.id
+    db.close()
+    return job_id
+
+
+def test_job_analyzes_every_requested_game(Session, chunks):
+    job_id = _claimed_job(Session)
+    batch.process_user_games("alice", new_games=GAMES, job_id=job_id, raise_errors=True,
+                             worker_id="w1")
+
+    db = Session()
+    job = db.get(AnalysisJob, job_id)
+    assert (job.status, job.processed) == ("done", GAMES)
+    assert db.query(Game).count() == GAMES
+    # Every preview was refined in place by the full analysis.
+    assert db.query(Game).filter(Game.provisional.is_(True)).count() == 0
+    assert db.query(GameClaim).count() == 0
+    assert sum(chunks) == GAMES and max(chunks) > 1
+    db.close()
+
+
+def test_leftover_preview_is_refined(Session, chunks):
+    db = Session()
+    url = _games(1)[0]["url"]
+    db.add(Game(url=url, pgn=PGN, provisional=True, analysis_depth=batch.ANALYSIS_PREVIEW_DEPTH))
+    db.commit()
+    preview_id = db.query(Game.id).filter(Game.url == url).scalar()
+    db.close()
+
+    job_id = _claimed_job(Session, 1)
+    batch.process_user_games("alice", new_games=1, job_id=job_id, raise_errors=True)
+
+    db = Session()
+    game = db.query(Game).filter(Game.url == url).one()
+    assert game.id == preview_id
+    assert not game.provisional
+    db.close()
+
+
+def test_yield_keeps_games_in_flight_and_raises_preempted(Session, chunks, monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_CHUNK_GAMES", 3)
+    job_id = _claimed_job(Session)
+
+    with pytest.raises(batch.Preempted):
+        # An urgent job turns up as soon as the first chunk is on an engine.
+        batch.process_user_games("alice", new_games=GAMES, job_id=job_id, raise_errors=True,
+                                 should_yield=lambda: bool(chunks), preview=False)
+
+    db = Session()
+    job = db.get(AnalysisJob, job_id)
+    saved = db.query(Game).count()
+    assert saved == sum(chunks) and 0 < saved < GAMES  # in-flight chunks finished
+    assert job.processed == saved
+    assert db.query(GameClaim).count() == 0
+    db.close()
+
+
+def test_takeover_stops_writes(Session, chunks):
+    job_id = _claimed_job(Session)
+
+    with pytest.raises(batch.Cancelled):
+        batch.process_user_games("alice", new_games=GAMES, job_id=job_id, raise_errors=True,
+                                 preview=False, cancelled=lambda: True)
+
+    db = Session()
+    assert db.query(Game).count() == 0
+    assert db.get(AnalysisJob, job_id).status == "running"  # the new owner's
+    db.close()
+
+
+def test_row_found_taken_over_stops_writes(Session, chunks):
+    job_id = _claimed_job(Session)
+    db = Session()
+    db.get(AnalysisJob, job_id).worker_id = "w2"  # reclaimed before the heartbeat noticed
+    db.commit()
+
+    with pytest.raises(batch.Cancelled):
+        batch.process_user_games("alice", new_games=GAMES, job_id=job_id, raise_errors=True,
+                                 preview=False, worker_id="w1")
+
+    job = db.get(AnalysisJob, job_id)
+    db.refresh(job)
+    assert (job.status, job.worker_id, job.processed) == ("running", "w2", 0)
+    assert db.query(Game).count() < GAMES  # stopped after the first write
+    db.close()
@@ -0,0 +1,62 @@
+"""Tests for batch analysis with one search per unique position."""
+from conftest import PGN, StubEngine
+from game_analysis import analyze_game, analyze_games
+
+REPERTOIRE = [
+    PGN,
+    """[White "a"]
+[Black "c"]
+[Result "0-1"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 g6 4. Qf3 Nf6 5. Qb3 Nd4 0-1
+""",
+    """[White "d"]
+[Black "a"]
+[Result "1/2-1/2"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Nf6 4. d3 Bc5 1/2-1/2
+""",
+]
+
+
+def all_searches(pool, caller):
+    extras = [pool.checkout(block=False) for _ in range(pool.size)]
+    searches = list(caller.searches)
+    for e in extras:
+        if e is not None:
+            searches += e.searches
+            pool.checkin(e)
+    return searches
+
+
+def test_batch_matches_per_game_single_pass(pool):
+    batch = analyze_games(REPERTOIRE, engine=StubEngine())
+    for pgn, result in zip(REPERTOIRE, batch):
+        single = analyze_game(pgn, mode="single_pass", engine=StubEngine())
+        assert result["moves"] == single["moves"]
+        assert result["summary"] == single["summary"]
+        assert result["headers"] == single["headers"]
+
+
+def test_shared_positions_are_searched_once(pool):
+    per_game = 0
+    for pgn in REPERTOIRE:
+        engine = StubEngine()
+        analyze_game(pgn, mode="single_pass", engine=engine)
+        per_game += len(engine.searches)
+
+    caller = StubEngine()
+    analyze_games(REPERTOIRE, engine=caller)
+    searches = all_searches(pool, caller)
+    assert len(searches) == len(set(searches))
+    assert len(searches) < per_game
+
+
+def test_on_move_reports_game_index(pool):
+    seen = []
+    batch = analyze_games(REPERTOIRE, engine=StubEngine(), on_move=lambda n, r: seen.append((n, r)))
+    assert seen == [(n, move) for n, result in enumerate(batch) for move in result["moves"]]
+
+
+def test_empty_batch(pool):
+    assert analyze_games([], engine=StubEngine()) == []
@@ -0,0 +1,31 @@
+"""Tests for the benchmark harness (corpus loading and report shape)."""
+from benchmark import load_corpus, run_benchmark
+from fake_engine import FakeEngine
+from stage_timing import STAGES, collect, stage
+
+
+def test_corpus_covers_every_category():
+    games = load_corpus()
+    assert {g["category"] for g in games} == {"book", "long", "short", "tactical"}
+    assert all(g["pgn"].lstrip().startswith("[Event") for g in games)
+
+
+def test_report_has_per_stage_times():
+    games = [g for g in load_corpus() if g["category"] == "short"]
+    report = run_benchmark(FakeEngine(), games, repeat=1)
+
+    total = report["total"]
+    assert total["games"] == len(games)
+    assert total["plies"] == sum(g["plies"] for g in report["games"])
+    assert set(total["stages"]) == {*STAGES, "other"}
+    assert total["stages"]["engine"] > 0
+    assert report["categories"]["short"]["plies"] == total["plies"]
+
+
+def test_stages_are_only_recorded_inside_collect():
+    with stage("engine"):
+        pass
+    with collect() as times:
+        with stage("engine"):
+            pass
+    assert times.calls == {"engine": 1}
@@ -0,0 +1,59 @@
+"""Tests for the precomputed book evaluation table."""
+import chess
+import chess.polyglot
+
+from conftest import StubEngine
+import game_analysis
+from book_evals import BookEvalTable, book_positions, save_table
+from eco_index import ECO_JSON_PATH
+from game_analysis import analyze_game
+
+LINES = [
+    {"Move": "e2e4", "Centipawn": 30, "Mate": None},
+    {"Move": "d2d4", "Centipawn": None, "Mate": -3},
+]
+
+
+def test_roundtrip(tmp_path):
+    path = str(tmp_path / "book_evals.npz")
+    save_table(path, {7: LINES, 3: LINES[:1]}, depth=20)
+    table = BookEvalTable.load(path)
+    assert table.depth == 20
+    assert table.lines(7) == LINES
+    assert table.lines(3) == LINES[:1]
+    assert table.lines(5) is None
+
+
+def test_eco_positions_are_enumerated():
+    positions = book_positions(ECO_JSON_PATH, None, max_ply=0)
+    # 1. Nh3 d5 2. g3 e5 3. f4 Bxh3 (Amar Opening: Paris Gambit)
+    board = chess.Board("rn1qkbnr/ppp2ppp/8/3pp3/5P2/6Pb/PPPPP2P/RNBQKB1R w KQkq - 0 4")
+    assert chess.polyglot.zobrist_hash(board) in positions
+
+
+def test_book_plies_skip_the_engine(tmp_path, monkeypatch):
+    pgn = "1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 *"
+    stub = StubEngine()
+    board = chess.Board()
+    results = {}
+    for san in pgn.split()[:-1]:
+        if san.endswith("."):
+            continue
+        stub.set_fen_position(board.fen())
+        results[chess.polyglot.zobrist_hash(board)] = stub.get_top_moves(2)
+        board.push_san(san)
+    stub.searches.clear()
+
+    path = str(tmp_path / "book_evals.npz")
+    save_table(path, results, depth=20)
+    table = BookEvalTable.load(path)
+    monkeypatch.setattr(game_analysis, "get_book_evals", lambda: table)
+    monkeypatch.setattr(game_analysis, "is_in_book", lambda board, key=None: True)
+
+    result = analyze_game(pgn, engine=stub)
+    assert all(m["classification"] == "Book" for m in result["moves"])
+    # Only the final position (not in the table) needs the engine, and only
+    # when the last move wasn't one of the stored top lines.
+    assert len(stub.searches) <= 1
+    # ...and those plies report the depth the table was searched at.
+    assert {m["depth"] for m in result["moves"]} == {20}
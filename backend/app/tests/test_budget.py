@@ -0,0 +1,78 @@
+"""Tests for the time-budget analysis mode, on a virtual clock."""
+import types
+
+import pytest
+
+from conftest import StubEngine
+import game_analysis
+from game_analysis import BUDGET_MAX_DEPTH, BUDGET_MIN_DEPTH, analyze_game
+
+PGN = """[White "a"]
+[Black "b"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 4. Ba4 Nf6 5. O-O Be7 6. Re1 b5 7. Bb3 d6
+8. c3 O-O 9. h3 Nb8 10. d4 Nbd7 11. Nbd2 Bb7 12. Bc2 Re8 13. Nf1 Bf8
+14. Ng3 g6 15. Bg5 h6 16. Bxh6 Bxh6 17. Qd2 Kh7 18. Qxh6+ Kxh6 1-0
+"""
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+
+class ClockEngine(StubEngine):
+    """Each search costs 1ms at BUDGET_MIN_DEPTH, doubling per extra ply."""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def get_top_moves(self, n):
+        self.clock.now += 0.001 * 2 ** (int(self.depth) - BUDGET_MIN_DEPTH)
+        return super().get_top_moves(n)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(game_analysis, "time", types.SimpleNamespace(perf_counter=c.perf_counter))
+    return c
+
+
+def test_unlimited_budget_reaches_max_depth(clock):
+    engine = ClockEngine(clock)
+    result = analyze_game(PGN, mode="budget", engine=engine, budget_seconds=1e6)
+    single = analyze_game(PGN, mode="single_pass", engine=StubEngine())
+    assert {m["depth"] for m in result["moves"]} == {BUDGET_MAX_DEPTH}
+    assert result["moves"] == single["moves"]
+    assert engine.depth == "16"
+
+
+def test_exhausted_budget_searches_at_min_depth(clock):
+    result = analyze_game(PGN, mode="budget", engine=ClockEngine(clock), budget_seconds=0)
+    assert {m["depth"] for m in result["moves"]} == {BUDGET_MIN_DEPTH}
+
+
+def test_budget_is_respected_and_favours_sharp_plies(clock):
+    budget = 0.5
+    result = analyze_game(PGN, mode="budget", engine=ClockEngine(clock), budget_seconds=budget)
+    plies = len(result["moves"])
+    # Only minimum-depth searches may run past the deadline.
+    assert clock.now <= budget + 0.001 * plies
+
+    depths = [m["depth"] for m in result["moves"]]
+    assert BUDGET_MIN_DEPTH < max(depths) and min(depths) < BUDGET_MAX_DEPTH
+    sharp = [m["depth"] for m in result["moves"] if m["captured_piece"] or "+" in m["move_san"]]
+    quiet = [m["depth"] for m in result["moves"]
+             if not m["captured_piece"] and "+" not in m["move_san"] and m["classification"] != "Book"]
+    assert sum(sharp) / len(sharp) > sum(quiet) / len(quiet)
+
+
+def test_budget_seconds_needs_budget_mode(clock):
+    with pytest.raises(ValueError):
+        analyze_game(PGN, mode="single_pass", engine=StubEngine(), budget_seconds=5)
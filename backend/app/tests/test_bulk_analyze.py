@@ -0,0 +1,91 @@
+"""Tests for the offline bulk analysis CLI (fake engine, real worker processes)."""
+import contextlib
+import io
+import json
+import os
+
+import chess.pgn
+import pytest
+
+import bulk_analyze
+from bulk_analyze import iter_pgn_games, run
+from fake_engine import FakeEngine
+from game_analysis import analyze_game
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench_corpus")
+
+
+@pytest.fixture
+def pgn_file(tmp_path):
+    text = ""
+    for name in ("short.pgn", "tactical.pgn", "book.pgn"):
+        with open(os.path.join(CORPUS_DIR, name)) as f:
+            text += f.read() + "\n\n"
+    path = tmp_path / "games.pgn"
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def fake_backend(monkeypatch):
+    # Spawned workers read ENGINE_BACKEND from the environment at import.
+    monkeypatch.setenv("ENGINE_BACKEND", "fake")
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_splits_like_python_chess(pgn_file):
+    with open(pgn_file) as f:
+        expected = []
+        while (game := chess.pgn.read_game(f)) is not None:
+            expected.append(game.headers["White"])
+    games = list(iter_pgn_games(pgn_file))
+    assert [chess.pgn.read_game(io.StringIO(pgn)).headers["White"] for _, _, pgn in games] == expected
+
+    # Every range restarts cleanly: resuming at a game's start yields the rest.
+    start = games[2][0]
+    assert [pgn for _, _, pgn in iter_pgn_games(pgn_file, start)] == [pgn for _, _, pgn in games[2:]]
+
+
+def test_matches_in_process_analysis(pgn_file, tmp_path):
+    out = str(tmp_path / "out.jsonl")
+    checkpoint = run(pgn_file, out, workers=2, flush_every=2)
+    records = read_jsonl(out)
+    games = list(iter_pgn_games(pgn_file))
+    assert checkpoint["games"] == len(records) == len(games)
+    assert checkpoint["errors"] == 0
+    assert [r["index"] for r in records] == list(range(len(games)))
+
+    engine = FakeEngine(depth=bulk_analyze.game_analysis.STOCKFISH_DEPTH)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = analyze_game(games[1][2], engine=engine)
+    assert records[1]["moves"] == json.loads(json.dumps(expected["moves"]))
+    assert records[1]["summary"] == expected["summary"]
+
+
+def test_resume_after_interruption(pgn_file, tmp_path):
+    full = str(tmp_path / "full.jsonl")
+    run(pgn_file, full, workers=2)
+
+    out = str(tmp_path / "out.jsonl")
+    first = run(pgn_file, out, workers=2, flush_every=2, limit=3)
+    assert first["games"] == 3
+    # Simulate a crash after writing past the last checkpoint.
+    with open(out, "a") as f:
+        f.write('{"index": 99, "partial": tr')
+
+    second = run(pgn_file, out, workers=2, flush_every=2)
+    assert second["games"] == len(read_jsonl(full))
+    assert read_jsonl(out) == read_jsonl(full)
+
+
+def test_checkpoint_for_other_input_is_refused(pgn_file, tmp_path):
+    out = str(tmp_path / "out.jsonl")
+    run(pgn_file, out, workers=1, limit=1)
+    other = tmp_path / "other.pgn"
+    other.write_text(open(pgn_file).read())
+    with pytest.raises(SystemExit):
+        run(str(other), out, workers=1)
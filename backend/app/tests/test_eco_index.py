@@ -0,0 +1,76 @@
+"""Tests for the compiled ECO index against the old FEN-string lookup."""
+import json
+
+import chess
+import chess.polyglot
+import pytest
+
+import eco_index
+from eco_index import ECO_JSON_PATH, EcoIndex, build_index, eco_key
+
+
+@pytest.fixture(scope="module")
+def raw():
+    with open(ECO_JSON_PATH) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def index(raw, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("eco") / "eco_index.npz")
+    build_index(ECO_JSON_PATH, path)
+    return EcoIndex.load(path)
+
+
+def old_lookup(raw):
+    """The pre-index normalization: placement + side to move + castling."""
+    return {" ".join(k.split(" ")[:3]): v for k, v in raw.items()}
+
+
+def test_every_position_matches_old_lookup(raw, index):
+    table = old_lookup(raw)
+    for fen in raw:
+        board = chess.Board(fen)
+        expected = table[" ".join(board.fen().split(" ")[:3])]
+        assert index.lookup(eco_key(board))["name"] == expected["name"]
+
+
+def test_en_passant_is_ignored(index):
+    # 1. e4 c5 2. e5 d5: an en-passant capture exf6 is available.
+    board = chess.Board()
+    for san in ("e4", "c5", "e5", "d5"):
+        board.push_san(san)
+    assert board.has_legal_en_passant()
+    no_ep = chess.Board(board.fen().replace(" d6 ", " - "))
+    assert eco_key(board) == eco_key(no_ep)
+
+
+def test_precomputed_zobrist_gives_same_key():
+    board = chess.Board()
+    board.push_san("e4")
+    assert eco_key(board, chess.polyglot.zobrist_hash(board)) == eco_key(board)
+
+
+def test_unknown_position(index):
+    board = chess.Board("8/8/8/4k3/8/8/8/4K3 w - - 0 1")
+    assert index.lookup(eco_key(board)) is None
+
+
+def test_rebuild_replaces_the_file_atomically(tmp_path):
+    path = tmp_path / "eco_index.npz"
+    path.write_bytes(b"half-written")
+    build_index(ECO_JSON_PATH, str(path))
+    assert len(EcoIndex.load(str(path))) > 0
+    assert [p.name for p in tmp_path.iterdir()] == ["eco_index.npz"]
+
+
+def test_unreadable_index_falls_back_to_eco_json(tmp_path, monkeypatch):
+    path = tmp_path / "eco_index.npz"
+    build_index(ECO_JSON_PATH, str(path))
+    path.write_bytes(b"truncated")
+    monkeypatch.setattr(eco_index, "ECO_INDEX_PATH", str(path))
+    monkeypatch.setattr(eco_index, "_index", None)
+    monkeypatch.setattr(eco_index, "_index_failed", False)
+    index = eco_index.get_eco_index()
+    assert index is not None and len(index) > 0
+    assert not eco_index._index_failed
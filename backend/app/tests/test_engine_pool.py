@@ -0,0 +1,63 @@
+"""Tests for the engine pool's checkout / replacement semantics."""
+import itertools
+import threading
+
+import pytest
+
+from engine_pool import EnginePool
+
+
+def make_pool(size):
+    counter = itertools.count()
+    return EnginePool(size=size, factory=lambda: next(counter))
+
+
+def test_engines_are_reused_after_checkin():
+    pool = make_pool(2)
+    with pool.engine() as first:
+        pass
+    with pool.engine() as second:
+        assert second == first
+
+
+def test_pool_never_exceeds_size():
+    pool = make_pool(2)
+    seen = set()
+    in_use = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(4)
+
+    def worker():
+        barrier.wait()
+        with pool.engine() as engine:
+            with lock:
+                in_use.append(engine)
+                seen.add(engine)
+                assert len(in_use) <= 2
+            with lock:
+                in_use.remove(engine)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert seen <= {0, 1}
+
+
+def test_engine_is_replaced_when_caller_raises():
+    pool = make_pool(1)
+    with pytest.raises(RuntimeError):
+        with pool.engine() as engine:
+            assert engine == 0
+            raise RuntimeError("stockfish crashed")
+    with pool.engine() as engine:
+        assert engine == 1
+
+
+def test_non_blocking_checkout_returns_none_when_exhausted():
+    pool = make_pool(1)
+    engine = pool.checkout()
+    assert pool.checkout(block=False) is None
+    pool.checkin(engine)
+    assert pool.checkout(block=False) == engine
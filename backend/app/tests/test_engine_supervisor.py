@@ -0,0 +1,115 @@
+"""Tests for transparent engine restarts and the watchdog checks."""
+import pytest
+
+from conftest import StubEngine
+from engine_supervisor import SupervisedEngine
+
+
+class FakeProcessEngine(StubEngine):
+    """StubEngine with a controllable "process"."""
+
+    def __init__(self):
+        super().__init__()
+        self.alive = True
+        self.ready = True
+        self.crash_next = False
+
+    def is_alive(self):
+        return self.alive
+
+    def ping(self, timeout):
+        return self.ready
+
+    def kill(self):
+        self.alive = False
+
+    def get_top_moves(self, n):
+        if self.crash_next or not self.alive:
+            self.alive = False
+            raise RuntimeError("The Stockfish process has crashed")
+        return super().get_top_moves(n)
+
+
+@pytest.fixture
+def spawned():
+    return []
+
+
+@pytest.fixture
+def supervised(spawned):
+    def factory():
+        engine = FakeProcessEngine()
+        spawned.append(engine)
+        return engine
+
+    engine = SupervisedEngine(factory)
+    yield engine
+    engine.quit()
+
+
+FEN = "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2"
+
+
+def test_crash_mid_search_is_retried_on_a_fresh_engine(supervised, spawned):
+    supervised.set_depth(12)
+    supervised.update_engine_parameters({"MultiPV": 2})
+    supervised.set_fen_position(FEN)
+    spawned[0].crash_next = True
+
+    lines = supervised.get_top_moves(2)
+
+    assert len(lines) == 2
+    assert supervised.restarts == 1
+    fresh = spawned[1]
+    assert fresh.board.fen() == FEN
+    assert fresh.depth == "12"
+    assert fresh.params["MultiPV"] == 2
+
+
+def test_errors_from_a_live_engine_are_not_retried(supervised, spawned):
+    def bad_search(n):
+        raise ValueError("bad position")
+
+    spawned[0].get_top_moves = bad_search
+    with pytest.raises(ValueError):
+        supervised.get_top_moves(2)
+    assert supervised.restarts == 0
+
+
+def test_restarts_per_call_are_bounded(spawned):
+    def factory():
+        engine = FakeProcessEngine()
+        engine.crash_next = True
+        spawned.append(engine)
+        return engine
+
+    engine = SupervisedEngine(factory, max_restarts=2)
+    with pytest.raises(RuntimeError):
+        engine.get_top_moves(2)
+    assert engine.restarts == 2
+    assert len(spawned) == 3
+    engine.quit()
+
+
+def test_watchdog_restarts_dead_or_unresponsive_idle_engines(supervised, spawned):
+    spawned[0].alive = False
+    supervised.check()
+    assert supervised.restarts == 1
+
+    spawned[1].ready = False
+    supervised.check()
+    assert supervised.restarts == 2
+    assert not spawned[1].alive
+
+    supervised.check()
+    assert supervised.restarts == 2
+
+
+def test_watchdog_kills_a_hung_call(supervised, spawned):
+    supervised._busy_since = 0.0  # a call that started long ago
+    supervised.check(call_timeout=1)
+    assert not spawned[0].alive
+    # The stuck call then fails and is retried on a new process.
+    supervised._busy_since = None
+    assert supervised.get_top_moves(1)
+    assert supervised.restarts == 1
@@ -0,0 +1,61 @@
+"""Tests for the persistent cross-game eval cache."""
+import pytest
+
+from conftest import PGN, StubEngine
+import eval_cache
+import game_analysis
+from eval_cache import EvalCache
+from game_analysis import analyze_game
+
+LINES = [
+    {"Move": "e2e4", "Centipawn": 30, "Mate": None},
+    {"Move": "d2d4", "Centipawn": 25, "Mate": None},
+]
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    c = EvalCache(str(tmp_path / "evals.sqlite3"))
+    monkeypatch.setattr(game_analysis, "get_eval_cache", lambda: c)
+    return c
+
+
+def test_roundtrip(cache):
+    cache.put(123, 16, 2, LINES)
+    assert cache.get(123, 16, 2) == LINES
+
+
+def test_key_includes_depth_and_multipv(cache):
+    cache.put(123, 16, 2, LINES)
+    assert cache.get(123, 12, 2) is None
+    assert cache.get(123, 16, 1) is None
+
+
+def test_unsigned_zobrist_keys_fit(cache):
+    key = (1 << 64) - 1
+    cache.put(key, 16, 2, LINES)
+    assert cache.get(key, 16, 2) == LINES
+
+
+def test_second_analysis_is_served_from_cache(cache, stub):
+    engine = stub
+    first = analyze_game(PGN)
+    searched = len(engine.searches)
+    assert searched > 0
+
+    second = analyze_game(PGN)
+    assert len(engine.searches) == searched
+    assert [m["classification"] for m in second["moves"]] == [
+        m["classification"] for m in first["moves"]
+    ]
+
+
+def test_disabled_with_empty_path(monkeypatch):
+    monkeypatch.setattr(eval_cache, "EVAL_CACHE_PATH", "")
+    assert eval_cache.get_eval_cache() is None
+
+
+def test_fake_backend_never_touches_the_cache(cache, monkeypatch):
+    monkeypatch.setattr(game_analysis, "ENGINE_BACKEND", "fake")
+    analyze_game(PGN, mode="single_pass", engine=StubEngine())
+    assert (cache.hits, cache.misses) == (0, 0)
@@ -0,0 +1,76 @@
+"""Tests for the deterministic fake engine (in-process and as a UCI program)."""
+import os
+import sys
+import time
+
+import pytest
+from stockfish import Stockfish
+
+from conftest import PGN
+import game_analysis
+from fake_engine import FakeEngine
+from game_analysis import analyze_game
+from uci_engine import UciEngine
+
+FAKE_ENGINE_CMD = [sys.executable, os.path.join(os.path.dirname(game_analysis.__file__), "fake_engine.py")]
+
+FENS = [
+    "r1bqkbnr/pppp1ppp/2n5/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 2 4",  # Qxf7# available
+    "r1bqkbnr/pppp1Qpp/2n5/4p3/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 0 4",  # mated
+    "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2",
+]
+
+
+def searches(engine):
+    out = []
+    for fen in FENS:
+        engine.set_fen_position(fen)
+        out.append((engine.get_top_moves(2), engine.get_evaluation()))
+    return out
+
+
+def test_analysis_is_reproducible():
+    first = analyze_game(PGN, engine=FakeEngine())
+    second = analyze_game(PGN, engine=FakeEngine())
+    assert first["moves"] == second["moves"]
+    assert first["moves"][-1]["mate_in"] == 1
+
+
+def test_seed_changes_scores_but_not_material():
+    a, b = FakeEngine(seed=1), FakeEngine(seed=2)
+    for engine in (a, b):
+        engine.set_fen_position(FENS[2])
+    assert a.get_evaluation() != b.get_evaluation()
+    assert abs(a.get_evaluation()["value"] - b.get_evaluation()["value"]) <= 40
+
+
+def test_latency_is_applied_per_search():
+    engine = FakeEngine(latency_ms=20)
+    start = time.perf_counter()
+    engine.get_top_moves(2)
+    engine.get_evaluation()
+    assert time.perf_counter() - start >= 0.04
+    assert engine.searches == 2
+
+
+@pytest.mark.parametrize("backend", ["uci", "stockfish"])
+def test_uci_program_matches_in_process_engine(backend):
+    if backend == "uci":
+        engine = UciEngine(FAKE_ENGINE_CMD, depth=12)
+    else:
+        engine = Stockfish(FAKE_ENGINE_CMD, depth=12, parameters={"MultiPV": 1})
+    try:
+        assert searches(engine) == searches(FakeEngine(depth=12))
+    finally:
+        if backend == "uci":
+            engine.quit()
+
+
+def test_fake_backend_is_selectable(monkeypatch):
+    monkeypatch.setattr(game_analysis, "ENGINE_BACKEND", "fake")
+    engine = game_analysis.new_engine()
+    try:
+        assert isinstance(engine._engine, FakeEngine)
+        assert analyze_game(PGN, engine=engine)["moves"]
+    finally:
+        engine.quit()
@@ -0,0 +1,154 @@
+"""Tests for per-move streaming: on_move callbacks and the job event bus."""
+import asyncio
+import threading
+import time
+
+from conftest import PGN, StubEngine
+from game_analysis import analyze_game
+from job_events import NOTIFY_MAX_BYTES, JobEventBus, NotifyForwarder, dispatch
+
+
+class RecordingEngine(StubEngine):
+    """Logs searches and callbacks in one timeline."""
+
+    def __init__(self, timeline):
+        super().__init__()
+        self.timeline = timeline
+
+    def get_top_moves(self, n):
+        self.timeline.append("search")
+        return super().get_top_moves(n)
+
+
+def test_on_move_fires_per_ply_before_search_ends():
+    timeline = []
+    moves = []
+
+    def on_move(result):
+        timeline.append("move")
+        moves.append(result)
+
+    result = analyze_game(PGN, mode="single_pass", engine=RecordingEngine(timeline), on_move=on_move)
+    assert moves == result["moves"]
+    # The first ply is reported before the last position is searched.
+    assert timeline.index("move") < len(timeline) - 1 - timeline[::-1].index("search")
+
+
+def test_subscriber_replays_history_then_receives_live_events():
+    bus = JobEventBus()
+
+    async def run():
+        assert bus.subscribe(1) is None
+        bus.publish(1, "job", {"status": "running", "processed": 0})
+        history, queue = bus.subscribe(1)
+        assert history == [("job", {"status": "running", "processed": 0})]
+
+        # Published from a worker thread, like batch.process_user_games.
+        worker = threading.Thread(target=bus.publish, args=(1, "move", {"move_number": 1}))
+        worker.start()
+        worker.join()
+        event = await asyncio.wait_for(queue.get(), 1)
+        bus.unsubscribe(1, queue)
+        return event
+
+    assert asyncio.run(run()) == ("move", {"move_number": 1})
+
+
+def test_finished_channels_expire():
+    bus = JobEventBus(ttl=0)
+    bus.publish(1, "job", {"status": "done", "processed": 1})
+    bus.publish(2, "job", {"status": "running", "processed": 0})
+
+    async def run():
+        return bus.subscribe(1), bus.subscribe(2)
+
+    finished, running = asyncio.run(run())
+    assert finished is None
+    assert running is not None
+
+
+class LoopbackForwarder(NotifyForwarder):
+    """Delivers to another bus in-process instead of via pg_notify."""
+
+    def __init__(self, target):
+        self.target = target
+        super().__init__(bind=None)
+
+    def _send(self, payloads):
+        for payload in payloads:
+            dispatch(self.target, payload)
+
+
+def test_events_reach_a_subscriber_in_another_process():
+    worker_bus, api_bus = JobEventBus(), JobEventBus()
+    forwarder = worker_bus.forward = LoopbackForwarder(api_bus)
+
+    async def run():
+        # The API subscribes to a running job before any event arrives.
+        history, queue = api_bus.subscribe(7, create=True)
+        assert history == []
+        await asyncio.to_thread(worker_bus.publish, 7, "move", {"move_number": 1})
+        await asyncio.to_thread(worker_bus.publish, 7, "job", {"status": "done", "processed": 1})
+        events = [await asyncio.wait_for(queue.get(), 1) for _ in range(2)]
+        api_bus.unsubscribe(7, queue)
+        return events
+
+    assert asyncio.run(run()) == [("move", {"move_number": 1}),
+                                  ("job", {"status": "done", "processed": 1})]
+    forwarder.flush()
+
+
+def test_oversized_events_are_not_forwarded():
+    api_bus = JobEventBus()
+    forwarder = LoopbackForwarder(api_bus)
+    forwarder(1, "game", {"pgn": "x" * NOTIFY_MAX_BYTES})
+    forwarder(1, "job", {"status": "running"})
+    forwarder.flush()
+    assert [event for event, _ in api_bus._channels[1].history()] == ["job"]
+
+
+def test_unused_created_channel_is_dropped():
+    bus = JobEventBus()
+
+    async def run():
+        _, queue = bus.subscribe(3, create=True)
+        bus.unsubscribe(3, queue)
+        return bus.subscribe(3)
+
+    assert asyncio.run(run()) is None
+
+
+def test_history_keeps_the_status_and_the_latest_events():
+    bus = JobEventBus(history=3)
+    bus.publish(1, "job", {"status": "running", "processed": 0})
+    for n in range(10):
+        bus.publish(1, "move", {"move_number": n})
+    bus.publish(1, "job", {"status": "running", "processed": 1})
+
+    async def run():
+        history, queue = bus.subscribe(1)
+        bus.unsubscribe(1, queue)
+        return history
+
+    assert asyncio.run(run()) == [("move", {"move_number": 7}), ("move", {"move_number": 8}),
+                                  ("move", {"move_number": 9}),
+                                  ("job", {"status": "running", "processed": 1})]
+
+
+def test_requeued_and_expired_channels_lapse_unless_watched():
+    bus = JobEventBus(ttl=0)
+    bus.publish(1, "job", {"status": "queued", "processed": 3})  # preempted
+    bus.publish(2, "move", {"move_number": 1})
+    bus.expire(2)  # taken over by another worker
+    bus.publish(3, "job", {"status": "running", "processed": 0})
+
+    async def run():
+        _, queue = bus.subscribe(3)
+        bus.publish(3, "job", {"status": "queued", "processed": 0})
+        time.sleep(0.01)
+        bus.publish(4, "move", {})  # prunes
+        return bus.subscribe(1), bus.subscribe(2), 3 in bus._channels
+
+    requeued, taken_over, watched = asyncio.run(run())
+    assert requeued is None and taken_over is None
+    assert watched
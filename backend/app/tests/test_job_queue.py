@@ -0,0 +1,202 @@
+"""Tests for the durable job queue's state machine (SQLite stands in for
+Postgres; SKIP LOCKED is a no-op there, so only one claimer is exercised)."""
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import job_queue
+from database import Base
+from job_queue import (Heartbeat, claim, claim_game, complete, enqueue, fail_or_retry, heartbeat, higher_priority_waiting,
+                       release_games, requeue, retry_delay)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(job_queue, "SessionLocal", Session)
+    session = Session()
+    yield session
+    session.close()
+
+
+def test_claim_hands_a_job_out_once(db):
+    job = enqueue(db, "alice", 5)
+    assert job.status == "queued"
+    claimed = claim(db, "w1")
+    assert (claimed.id, claimed.status, claimed.worker_id, claimed.attempts) == (job.id, "running", "w1", 1)
+    assert claim(db, "w2") is None
+
+
+def test_heartbeat_only_for_the_owner(db):
+    enqueue(db, "alice", 5)
+    job = claim(db, "w1")
+    assert heartbeat(job.id, "w1")
+    assert not heartbeat(job.id, "w2")
+
+
+def test_heartbeat_flags_a_job_taken_over(db):
+    enqueue(db, "alice", 5)
+    job = claim(db, "w1")
+    with Heartbeat(job.id, "w1", interval=0.01) as beat:
+        time.sleep(0.05)
+        assert not beat.lost.is_set()
+        job.worker_id = "w2"
+        db.commit()
+        assert beat.lost.wait(1)
+
+
+def test_stale_job_is_reclaimed(db):
+    enqueue(db, "alice", 5)
+    job = claim(db, "w1")
+    job.heartbeat_at = int(time.time()) - job_queue.JOB_STALE_SECONDS - 1
+    db.commit()
+    reclaimed = claim(db, "w2")
+    assert (reclaimed.id, reclaimed.worker_id, reclaimed.attempts) == (job.id, "w2", 2)
+
+
+def test_retry_with_backoff_then_fail(db):
+    enqueue(db, "alice", 5)
+    job = claim(db, "w1")
+    assert fail_or_retry(db, job, "boom", "w1", max_attempts=2) == "queued"
+    assert job.next_attempt_at >= int(time.time()) + retry_delay(1) - 1
+    assert claim(db, "w1") is None  # still backing off
+
+    job.next_attempt_at = 0
+    db.commit()
+    job = claim(db, "w1")
+    assert job.attempts == 2
+    assert fail_or_retry(db, job, "boom again", "w1", max_attempts=2) == "failed"
+    assert job.error == "boom again"
+    assert claim(db, "w1") is None
+
+
+def test_retry_delay_grows_and_is_capped():
+    delays = [retry_delay(n) for n in range(1, 12)]
+    assert delays == sorted(delays)
+    assert delays[1] == 2 * delays[0]
+    assert delays[-1] == job_queue.JOB_RETRY_MAX_SECONDS
+
+
+def test_default_priority_by_size():
+    assert job_queue.default_priority(1) == job_queue.PRIORITY_INTERACTIVE
+    assert job_queue.default_priority(job_queue.SYNC_MAX_GAMES) == job_queue.PRIORITY_SYNC
+    assert job_queue.default_priority(500) == job_queue.PRIORITY_BACKFILL
+
+
+def test_claim_takes_urgent_classes_first(db):
+    backfill = enqueue(db, "alice", 500)
+    interactive = enqueue(db, "bob", 1)
+    assert claim(db, "w1").id == interactive.id
+    assert claim(db, "w2").id == backfill.id
+
+
+def test_claim_shares_engines_between_users(db):
+    enqueue(db, "alice", 5)
+    second = enqueue(db, "alice", 5, opponent="carol")
+    other = enqueue(db, "bob", 5)
+    claim(db, "w1")
+    # alice already has a job running; bob's goes before her second one.
+    assert claim(db, "w2").id == other.id
+    assert claim(db, "w3").id == second.id
+
+
+def test_preemption_requeues_without_spending_an_attempt(db):
+    enqueue(db, "alice", 500)
+    job = claim(db, "w1")
+    assert not higher_priority_waiting(db, job)
+    enqueue(db, "bob", 1)
+    assert higher_priority_waiting(db, job, grace=0)
+
+    job.processed = 40
+    assert requeue(db, job, "w1")
+    assert (job.status, job.attempts) == ("queued", 0)
+    assert claim(db, "w2").requested == 1
+    resumed = claim(db, "w2")
+    assert (resumed.id, resumed.processed, resumed.attempts) == (job.id, 40, 1)
+
+
+def test_overlapping_requests_join_the_in_flight_job(db):
+    job = enqueue(db, "alice", 5)
+    again = enqueue(db, "Alice", 20)
+    assert again.id == job.id
+    assert (again.requested, again.priority) == (20, job_queue.PRIORITY_SYNC)
+    assert enqueue(db, "alice", 1).priority == job_queue.PRIORITY_INTERACTIVE
+    assert enqueue(db, "alice", 3).requested == 20
+
+    assert enqueue(db, "alice", 5, opponent="bob").id != job.id
+    claim(db, "w1")
+    assert enqueue(db, "alice", 5).id == job.id  # running jobs absorb too
+
+    job.status = "done"
+    db.commit()
+    assert enqueue(db, "alice", 5).id != job.id
+
+
+def test_a_game_is_claimed_by_one_job_at_a_time(db):
+    enqueue(db, "alice", 5)
+    first = claim(db, "w1")
+    enqueue(db, "bob", 5)
+    second = claim(db, "w2")
+    url = "https://www.chess.com/game/live/1"
+
+    assert claim_game(db, url, first.id)
+    assert claim_game(db, url, first.id)  # resuming job keeps its claims
+    assert not claim_game(db, url, second.id)
+    release_games(db, first.id, [url])
+    assert claim_game(db, url, second.id)
+
+
+def test_claims_of_a_dead_job_are_taken_over(db):
+    enqueue(db, "alice", 5)
+    dead = claim(db, "w1")
+    enqueue(db, "bob", 5)
+    live = claim(db, "w2")
+    url = "https://www.chess.com/game/live/1"
+    assert claim_game(db, url, dead.id)
+
+    dead.heartbeat_at = int(time.time()) - job_queue.JOB_STALE_SECONDS - 1
+    db.commit()
+    assert claim_game(db, url, live.id)
+    assert not claim_game(db, url, dead.id)
+
+
+def test_complete_unless_the_request_was_raised(db):
+    job = enqueue(db, "alice", 5)
+    claim(db, "w1")
+    enqueue(db, "alice", 8)  # folded in while the run covered 5
+    assert not complete(db, job.id, "w1", 5, processed=5)
+    db.refresh(job)
+    assert (job.status, job.requested) == ("running", 8)
+    assert complete(db, job.id, "w1", 8, processed=8)
+    db.refresh(job)
+    assert (job.status, job.processed) == ("done", 8)
+
+
+def test_a_worker_that_lost_its_job_leaves_the_row_alone(db):
+    enqueue(db, "alice", 5)
+    job = claim(db, "w1")
+    job.heartbeat_at = int(time.time()) - job_queue.JOB_STALE_SECONDS - 1
+    db.commit()
+    assert claim(db, "w2").id == job.id
+
+    assert fail_or_retry(db, job, "engine died", "w1") is None
+    assert not requeue(db, job, "w1")
+    assert not complete(db, job.id, "w1", 5, processed=5)
+    db.refresh(job)
+    assert (job.status, job.worker_id, job.error) == ("running", "w2", None)
+
+
+def test_no_yield_while_an_idle_worker_can_take_the_urgent_job(db):
+    enqueue(db, "alice", 500)
+    job = claim(db, "w1")
+    urgent = enqueue(db, "bob", 1)
+    assert not higher_priority_waiting(db, job)  # just queued: a free worker takes it
+
+    urgent.next_attempt_at = int(time.time()) - job_queue.JOB_YIELD_GRACE_SECONDS - 1
+    db.commit()
+    assert higher_priority_waiting(db, job)  # nobody did
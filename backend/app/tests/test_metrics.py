@@ -0,0 +1,88 @@
+"""Tests for the Prometheus registry and the analysis instrumentation."""
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import PGN, StubEngine
+import metrics
+from game_analysis import analyze_game
+from metrics import CONTENT_TYPE, Counter, Histogram, render, serve
+from stage_timing import collect, stage
+
+
+def _samples(text):
+    out = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, value = line.rsplit(" ", 1)
+            out[key] = float(value)
+    return out
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("test_latency_seconds", "test", ("op",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        h.observe(value, "read")
+    samples = _samples(render())
+    assert samples['test_latency_seconds_bucket{op="read",le="0.1"}'] == 2
+    assert samples['test_latency_seconds_bucket{op="read",le="1"}'] == 3
+    assert samples['test_latency_seconds_bucket{op="read",le="+Inf"}'] == 4
+    assert samples['test_latency_seconds_count{op="read"}'] == 4
+    assert samples['test_latency_seconds_sum{op="read"}'] == pytest.approx(3.65)
+    assert h.count("read") == 4
+
+
+def test_counter_render_and_label_escaping():
+    c = Counter("test_events_total", "test", ("kind",))
+    c.inc('a"b')
+    c.inc('a"b', amount=2)
+    text = render()
+    assert "# TYPE test_events_total counter" in text
+    assert 'test_events_total{kind="a\\"b"} 3' in text
+
+
+def test_timer_records_on_exception():
+    h = Histogram("test_failing_seconds", "test")
+    with pytest.raises(RuntimeError):
+        with h.time():
+            raise RuntimeError
+    assert h.count() == 1
+
+
+def test_stages_are_observed_without_a_collector():
+    before = metrics.STAGE_SECONDS.count("san")
+    with stage("san"):
+        pass
+    assert metrics.STAGE_SECONDS.count("san") == before + 1
+
+    with collect() as times:
+        with stage("san"):
+            pass
+    assert times.calls["san"] == 1
+    assert metrics.STAGE_SECONDS.count("san") == before + 2
+
+
+def test_analyze_game_counts_plies_and_games():
+    plies = metrics.PLIES_ANALYZED.value()
+    games = metrics.GAMES_ANALYZED.value("single_pass")
+    result = analyze_game(PGN, mode="single_pass", engine=StubEngine())
+    assert metrics.PLIES_ANALYZED.value() == plies + len(result["moves"])
+    assert metrics.GAMES_ANALYZED.value("single_pass") == games + 1
+    assert 'chess_analyzer_stage_seconds_count{stage="engine"}' in render()
+
+
+def test_serve_exposes_the_registry_over_http():
+    counter = Counter("test_served_total", "Served")
+    counter.inc()
+    server = serve(0, host="127.0.0.1")
+    try:
+        base = f"http://127.0.0.1:{server.server_port}"
+        with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert _samples(response.read().decode())["test_served_total"] == 1
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{base}/other", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
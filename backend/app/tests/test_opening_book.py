@@ -0,0 +1,50 @@
+"""Tests for the in-memory Polyglot book against chess.polyglot's reader."""
+import struct
+
+import chess
+import chess.polyglot
+
+from opening_book import OpeningBook
+
+
+def write_book(path, entries):
+    """entries: (board, weight) pairs, written as sorted Polyglot records."""
+    records = []
+    for board, weight in entries:
+        move = next(iter(board.legal_moves))
+        raw_move = (move.to_square) | (move.from_square << 6)
+        records.append((chess.polyglot.zobrist_hash(board), raw_move, weight))
+    with open(path, "wb") as f:
+        for key, raw_move, weight in sorted(records):
+            f.write(struct.pack(">QHHI", key, raw_move, weight, 0))
+
+
+def test_membership_matches_polyglot_reader(tmp_path):
+    start = chess.Board()
+    e4 = chess.Board()
+    e4.push_san("e4")
+    d4 = chess.Board()
+    d4.push_san("d4")
+    path = str(tmp_path / "book.bin")
+    write_book(path, [(start, 10), (e4, 5)])
+
+    book = OpeningBook.load(path)
+    with chess.polyglot.open_reader(path) as reader:
+        for board in (start, e4, d4):
+            in_reader = reader.get(board) is not None
+            assert (chess.polyglot.zobrist_hash(board) in book) == in_reader
+
+
+def test_zero_weight_entries_are_ignored(tmp_path):
+    board = chess.Board()
+    path = str(tmp_path / "book.bin")
+    write_book(path, [(board, 0)])
+    assert chess.polyglot.zobrist_hash(board) not in OpeningBook.load(path)
+
+
+def test_empty_book(tmp_path):
+    path = tmp_path / "book.bin"
+    path.write_bytes(b"")
+    book = OpeningBook.load(str(path))
+    assert len(book) == 0
+    assert 12345 not in book
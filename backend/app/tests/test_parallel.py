@@ -0,0 +1,28 @@
+"""Tests for intra-game ply parallelism across pool engines."""
+from conftest import PGN, StubEngine
+from game_analysis import analyze_game
+
+
+def test_parallel_matches_single_pass(pool):
+    sequential = analyze_game(PGN, mode="single_pass", engine=StubEngine())
+    parallel = analyze_game(PGN, mode="parallel", engine=StubEngine())
+    assert parallel["moves"] == sequential["moves"]
+    assert parallel["summary"] == sequential["summary"]
+
+
+def test_parallel_spreads_work_and_returns_engines(pool):
+    caller = StubEngine()
+    analyze_game(PGN, mode="parallel", engine=caller)
+    extras = [pool.checkout(block=False) for _ in range(3)]
+    assert all(e is not None for e in extras)
+    total = len(caller.searches) + sum(len(e.searches) for e in extras)
+    assert total == len(set(caller.searches + [f for e in extras for f in e.searches]))
+
+
+def test_parallel_runs_on_caller_engine_when_pool_is_busy(pool):
+    held = [pool.checkout() for _ in range(3)]
+    caller = StubEngine()
+    result = analyze_game(PGN, mode="parallel", engine=caller)
+    assert len(caller.searches) >= len(result["moves"])
+    for e in held:
+        pool.checkin(e)
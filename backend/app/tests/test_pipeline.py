@@ -0,0 +1,141 @@
+"""Tests for the bounded-queue stage pipeline behind process_user_games."""
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline
+
+
+def run(pipeline, items, *stages, batch=1, wait=0.0):
+    """Wire source -> stages -> drain; each stage is (fn, workers, batch)."""
+    queues = [pipeline.queue(2) for _ in range(len(stages) + 1)]
+    pipeline.source("source", items, queues[0])
+    for n, (fn, workers, stage_batch) in enumerate(stages):
+        out = queues[n + 1]
+        pipeline.stage(f"s{n}", lambda item, fn=fn, out=out: fn(item, out), queues[n], [out],
+                       workers=workers, batch=stage_batch)
+    return queues[-1], pipeline.drain(queues[-1], batch=batch, wait=wait)
+
+
+def test_every_item_flows_through_concurrent_stages():
+    p = Pipeline()
+    _, batches = run(p, range(50),
+                     (lambda x, out: out.put(x * 2), 3, 1),
+                     (lambda xs, out: [out.put(x + 1) for x in xs], 2, 4))
+    results = [x for b in batches for x in b]
+    p.join()
+    assert sorted(results) == [x * 2 + 1 for x in range(50)]
+
+
+def test_drain_batches_up_to_size():
+    p = Pipeline()
+    _, batches = run(p, range(10), batch=4, wait=1.0)
+    sizes = [len(b) for b in batches]
+    p.join()
+    assert sum(sizes) == 10 and max(sizes) <= 4
+
+
+def test_bounded_queues_hold_back_the_source():
+    fetched = []
+
+    def source():
+        for n in range(100):
+            fetched.append(n)
+            yield n
+
+    gate = threading.Event()
+    p = Pipeline()
+    _, batches = run(p, source(), (lambda x, out: (gate.wait(), out.put(x)), 1, 1))
+    time.sleep(0.2)
+    assert len(fetched) < 10  # not the whole input read ahead
+    gate.set()
+    assert sum(len(b) for b in batches) == 100
+    p.join()
+
+
+def test_cancel_keeps_in_flight_items_and_drops_queued_ones():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(x, out):
+        started.set()
+        release.wait()
+        out.put(x)
+
+    p = Pipeline()
+    _, batches = run(p, range(100), (slow, 1, 1))
+    started.wait()
+    p.cancel()
+    release.set()
+    results = [x for b in batches for x in b]
+    p.join()
+    assert results == [0]
+
+
+def test_worker_error_is_raised_by_join():
+    def boom(x, out):
+        if x == 3:
+            raise ValueError("bad game")
+        out.put(x)
+
+    p = Pipeline()
+    _, batches = run(p, range(20), (boom, 2, 1))
+    list(batches)
+    with pytest.raises(ValueError, match="bad game"):
+        p.join()
+
+
+def test_close_after_consumer_error():
+    p = Pipeline()
+    last, batches = run(p, range(100), (lambda x, out: out.put(x), 2, 1))
+    next(batches)
+    p.close(last)  # must not hang on the stages still putting
+    assert all(not t.is_alive() for t in p._threads)
+
+
+def test_callable_batch_limit_is_read_per_batch():
+    asked = []
+    sizes = []
+
+    def limit():
+        asked.append(1)
+        return 1 if len(asked) > 1 else 3
+
+    gate = threading.Event()
+
+    def consume(xs, out):
+        gate.wait()
+        sizes.append(len(xs))
+        for x in xs:
+            out.put(x)
+
+    p = Pipeline()
+    _, batches = run(p, range(6), (consume, 1, limit))
+    time.sleep(0.1)
+    gate.set()
+    results = sorted(x for b in batches for x in b)
+    p.join()
+    assert results == list(range(6))
+    assert len(asked) == len(sizes)
+    assert sizes[0] <= 3 and set(sizes[1:]) == {1}
+
+
+def test_batches_wait_to_fill_from_a_trickling_inbox():
+    def trickle():
+        for n in range(6):
+            time.sleep(0.02)
+            yield n
+
+    sizes = []
+    p = Pipeline()
+    queues = [p.queue(8), p.queue(8)]
+    p.source("source", trickle(), queues[0])
+    p.stage("chunks", lambda xs: (sizes.append(len(xs)), [queues[1].put(x) for x in xs]),
+            queues[0], [queues[1]], workers=2, batch=4, wait=5.0)
+    start = time.monotonic()
+    results = sorted(x for b in p.drain(queues[1]) for x in b)
+    p.join()
+    assert results == list(range(6))
+    assert sizes == [4, 2]
+    assert time.monotonic() - start < 2  # the source ending closed the last batch
@@ -0,0 +1,65 @@
+"""Tests for rebuilding classifications from stored raw engine data."""
+import json
+
+from conftest import PGN, StubEngine
+import game_analysis
+from game_analysis import analyze_game, reclassify_game
+
+
+def stored_searches(result):
+    # Round-trip through JSON like the MoveAnalysis.engine_data column.
+    return [json.loads(json.dumps(m["engine"])) for m in result["moves"]]
+
+
+def test_reclassify_reproduces_analysis_without_engine():
+    result = analyze_game(PGN, engine=StubEngine())
+    rebuilt = reclassify_game(PGN, stored_searches(result))
+    assert [m["classification"] for m in rebuilt["moves"]] == [
+        m["classification"] for m in result["moves"]
+    ]
+    assert rebuilt["summary"] == result["summary"]
+
+
+def test_threshold_change_applies_on_reclassify(monkeypatch):
+    result = analyze_game(PGN, engine=StubEngine())
+    classes = [m["classification"] for m in result["moves"]]
+    assert "Inaccuracy" in classes
+
+    # Make every "Inaccuracy"-sized loss count as a Mistake.
+    monkeypatch.setattr(game_analysis, "THRESH_INACCURACY", 0.1)
+    monkeypatch.setattr(game_analysis, "THRESH_GOOD", 0.05)
+    monkeypatch.setattr(game_analysis, "THRESH_EXCELLENT", 0.01)
+    rebuilt = reclassify_game(PGN, stored_searches(result))
+    new_classes = [m["classification"] for m in rebuilt["moves"]]
+    assert "Inaccuracy" not in new_classes
+    assert new_classes.count("Mistake") > classes.count("Mistake")
+
+
+def test_changed_labels_drop_their_llm_review(monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from crud import save_analysis
+    from database import Base
+    from models import Game, MoveAnalysis
+    from reclassify import reclassify_stored_game
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    game = Game(url="u", pgn=PGN)
+    db.add(game)
+    db.commit()
+    save_analysis(db, game.id, analyze_game(PGN, engine=StubEngine())["moves"])
+    for row in db.query(MoveAnalysis):
+        row.llm_review = "review"
+    db.commit()
+
+    monkeypatch.setattr(game_analysis, "THRESH_INACCURACY", 0.1)
+    monkeypatch.setattr(game_analysis, "THRESH_GOOD", 0.05)
+    monkeypatch.setattr(game_analysis, "THRESH_EXCELLENT", 0.01)
+    before = {r.id: r.classification for r in db.query(MoveAnalysis)}
+    assert reclassify_stored_game(db, game)
+    for row in db.query(MoveAnalysis):
+        changed = row.classification != before[row.id]
+        assert (row.llm_review is None) == changed
@@ -1,7 +1,8 @@
 """Tests for Static Exchange Evaluation and sacrifice detection."""
 import chess
 
-from game_analysis import static_exchange_eval, is_sacrifice
+from game_analysis import capture_exchange_eval, static_exchange_eval, is_sacrifice
+from ml_features import _threats_count
 
 
 def test_free_capture_gains_material():
@@ -36,4 +37,52 @@ def test_quiet_move_not_capture_not_sacrifice():
     board = chess.Board()
     move = chess.Move.from_uci("g1f3")  # Nf3, no capture
     assert static_exchange_eval(board, move) == 0
-    assert not is_sacrifice(board, move)
\ No newline at end of file
+    assert not is_sacrifice(board, move)
+
+def test_xray_attacker_joins_the_exchange():
+    # e5 is defended by the d6 pawn; the second rook sits behind the first.
+    # R takes, pawn takes, R retakes: +1 -5 +1.
+    board = chess.Board("4k3/8/3p4/4p3/8/8/4R3/4R1K1 w - - 0 1")
+    assert static_exchange_eval(board, chess.Move.from_uci("e2e5")) == -3
+
+
+def test_king_does_not_recapture_on_a_defended_square():
+    # Qxe2+: the king can't take back (the d4 knight guards e2) but the
+    # queen can, so the bishop is only traded.
+    board = chess.Board("r1b1kbnr/pppp1Npp/8/8/3nq3/8/PPPPBP1P/RNBQKR2 b Qkq - 1 7")
+    assert static_exchange_eval(board, chess.Move.from_uci("e4e2")) == 0
+    # Bxf7+ with the queen x-raying through c4: Qxf7 keeps Black ahead.
+    board = chess.Board("rn2kb1r/ppp1qppp/5n2/4p3/2B1P3/1Q6/PPP2PPP/RNB1K2R w KQkq - 4 8")
+    assert static_exchange_eval(board, chess.Move.from_uci("c4f7")) == -2
+
+
+def test_pinned_defender_does_not_recapture():
+    # Rxe5: the f7 knight would win the rook back, unless the bishop on a2
+    # pins it to the king on g8.
+    free = chess.Board("6k1/5n2/8/4p3/8/8/8/K3R3 w - - 0 1")
+    pinned = chess.Board("6k1/5n2/8/4p3/8/8/B7/K3R3 w - - 0 1")
+    move = chess.Move.from_uci("e1e5")
+    assert static_exchange_eval(free, move) == -4
+    assert static_exchange_eval(pinned, move) == 1
+
+
+def test_threats_count_ignores_pinned_defenders():
+    # Black's e5 pawn hangs to the rook; the pinned f7 knight doesn't count
+    # as a defender. The white rook itself is not under attack.
+    board = chess.Board("6k1/5n2/8/4p3/8/8/B7/K3R3 b - - 0 1")
+    assert _threats_count(board, chess.BLACK) == (1, 1)
+    assert _threats_count(board, chess.WHITE) == (0, 0)
+
+
+def test_threats_count_keeps_the_trained_definition():
+    # The risk model was trained on the old swap-off, where the king counts
+    # as the cheapest recapturer; capture_exchange_eval finds Ne5 and the
+    # c2 pawn lost here, the feature doesn't.
+    board = chess.Board("rn1qkbnr/ppp2B1p/3p2p1/4N3/4P3/2N5/PPPP1PPP/R1BbK2R b KQkq - 0 6")
+    assert _threats_count(board, chess.WHITE) == (0, 0)
+    assert capture_exchange_eval(board, chess.E5, chess.BLACK) > 0
+
+
+def test_en_passant_captures_a_pawn():
+    board = chess.Board("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1")
+    assert static_exchange_eval(board, chess.Move.from_uci("e5d6")) == 1
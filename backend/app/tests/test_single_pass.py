@@ -0,0 +1,59 @@
+"""Tests for the single-pass (one MultiPV search per position) analysis mode."""
+import chess
+import chess.polyglot
+
+from conftest import PGN, StubEngine, material
+import game_analysis
+from game_analysis import analyze_game
+
+
+def test_single_pass_searches_each_position_once(stub):
+    result = analyze_game(PGN, mode="single_pass")
+    n_plies = len(result["moves"])
+    assert len(stub.searches) == len(set(stub.searches))
+    assert len(stub.searches) <= n_plies + 1
+
+
+def test_two_pass_searches_twice_per_ply(stub):
+    result = analyze_game(PGN, mode="two_pass")
+    assert len(stub.searches) == 2 * len(result["moves"])
+
+
+def test_single_pass_uses_top_line_score_for_played_move(stub):
+    result = analyze_game(PGN, mode="single_pass")
+    mate = result["moves"][-1]
+    # Qxf7# is the top line: its mate score comes straight from that line
+    # and no extra search of the mated position is needed.
+    assert mate["classification"] == "Best"
+    assert mate["mate_in"] == 1
+    assert mate["cp_loss"] == 0
+
+
+def test_depth_override_is_one_off(stub):
+    # Preview analysis (batch.py) runs shallow on a pool engine.
+    preview = analyze_game(PGN, mode="single_pass", depth=8)
+    assert set(stub.depths) == {8}
+    assert {m["depth"] for m in preview["moves"]} == {8}
+    assert stub.depth == "16"
+
+
+class MultiPVEvalEngine(StubEngine):
+    """Like the wrapper, get_evaluation() reports the last MultiPV line."""
+
+    def get_evaluation(self):
+        n = self.params.get("MultiPV", 1)
+        if n > 1:
+            lines = self.get_top_moves(n)
+            return {"type": "cp", "value": lines[-1]["Centipawn"]}
+        return super().get_evaluation()
+
+
+def test_evaluation_reads_the_best_line_under_multipv():
+    engine = MultiPVEvalEngine()
+    engine.update_engine_parameters({"MultiPV": 2})
+    # exd5 and exf5 are the top two lines; neither is the static score.
+    fen = "4k3/8/8/3q1r2/4P3/8/8/4K3 w - - 0 1"
+    result = game_analysis._evaluation(engine, fen, chess.polyglot.zobrist_hash(chess.Board(fen)))
+    engine.set_fen_position(fen)
+    assert result == {"type": "cp", "value": material(chess.Board(fen))}
+    assert engine.params["MultiPV"] == 2
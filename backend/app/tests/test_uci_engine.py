@@ -0,0 +1,24 @@
+"""Tests for converting chess.engine results to the Stockfish wrapper formats."""
+import chess
+from chess.engine import Cp, Mate, PovScore
+
+from uci_engine import _evaluation_from_info, _line_from_info
+
+
+def test_cp_line_is_in_whites_frame():
+    info = {"score": PovScore(Cp(40), chess.BLACK), "pv": [chess.Move.from_uci("e7e5")]}
+    assert _line_from_info(info) == {"Move": "e7e5", "Centipawn": -40, "Mate": None}
+
+
+def test_mate_line():
+    info = {"score": PovScore(Mate(2), chess.WHITE), "pv": [chess.Move.from_uci("d1h5")]}
+    assert _line_from_info(info) == {"Move": "d1h5", "Centipawn": None, "Mate": 2}
+
+
+def test_line_without_pv_is_dropped():
+    assert _line_from_info({"score": PovScore(Cp(0), chess.WHITE)}) is None
+
+
+def test_evaluation_formats():
+    assert _evaluation_from_info({"score": PovScore(Cp(-15), chess.WHITE)}) == {"type": "cp", "value": -15}
+    assert _evaluation_from_info({"score": PovScore(Mate(-3), chess.BLACK)}) == {"type": "mate", "value": 3}
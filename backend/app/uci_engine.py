@@ -0,0 +1,135 @@
+"""
+Engine backend built on python-chess's asyncio UCI driver (`chess.engine`).
+
+The `stockfish` PyPI wrapper does a blocking readline loop per call and an
+isready round-trip on every `set_fen_position`. `chess.engine.UciProtocol`
+instead pipelines `position` + `go` in one write, only syncs with isready
+when the game changes, and parses `info` lines as they arrive.
+
+`UciEngine` is a drop-in for the subset of the `Stockfish` wrapper that
+`game_analysis` uses (set_fen_position / get_top_moves / get_evaluation),
+driven through `chess.engine.SimpleEngine`, which runs the protocol on a
+background event loop. Selected with ENGINE_BACKEND=uci. Analysis runs in
+worker threads (worker.py), not on the API's event loop, so there is no
+coroutine interface.
+
+Results are converted to the wrapper's dict formats (White's frame) so the
+classification code and the eval cache see identical data from either
+backend.
+"""
+from __future__ import annotations
+
+import asyncio
+
+import chess
+import chess.engine
+
+
+def _line_from_info(info: dict) -> dict | None:
+    """InfoDict → get_top_moves()-style {'Move', 'Centipawn', 'Mate'}."""
+    pv = info.get("pv")
+    score = info.get("score")
+    if not pv or score is None:
+        return None
+    white = score.white()
+    return {
+        "Move": pv[0].uci(),
+        "Centipawn": None if white.is_mate() else white.score(),
+        "Mate": white.mate() if white.is_mate() else None,
+    }
+
+
+def _evaluation_from_info(info: dict) -> dict:
+    """InfoDict → get_evaluation()-style {'type', 'value'}."""
+    score = info.get("score")
+    if score is None:
+        return {}
+    white = score.white()
+    if white.is_mate():
+        return {"type": "mate", "value": white.mate()}
+    return {"type": "cp", "value": white.score()}
+
+
+def _lines_from_infos(infos: list[dict]) -> list[dict]:
+    lines = [_line_from_info(info) for info in infos]
+    return [line for line in lines if line is not None]
+
+
+class UciEngine:
+    """Synchronous stand-in for `stockfish.Stockfish` on top of chess.engine."""
+
+    def __init__(self, path: str, depth: int = 15, parameters: dict | None = None):
+        self._engine = chess.engine.SimpleEngine.popen_uci(path)
+        self.depth = str(depth)
+        self._parameters = {"MultiPV": 1}
+        self._board = chess.Board()
+        # chess.engine sends ucinewgame (+ isready) only when this token
+        # changes, so unrelated positions bump it and game moves reuse it.
+        self._game = object()
+        self.update_engine_parameters(parameters)
+
+    def get_parameters(self) -> dict:
+        return self._parameters
+
+    def update_engine_parameters(self, parameters: dict | None) -> None:
+        if not parameters:
+            return
+        self._parameters.update(parameters)
+        # MultiPV is managed per search by chess.engine and can't be configured.
+        options = {k: v for k, v in parameters.items() if k != "MultiPV"}
+        if options:
+            self._engine.configure(options)
+
+    def set_depth(self, depth_value: int = 2) -> None:
+        self.depth = str(depth_value)
+
+    def set_fen_position(self, fen_position: str, send_ucinewgame_token: bool = True) -> None:
+        # No I/O here: the position is sent together with the next `go`.
+        self._board = chess.Board(fen_position)
+        if send_ucinewgame_token:
+            self._game = object()
+
+    def _limit(self) -> chess.engine.Limit:
+        return chess.engine.Limit(depth=int(self.depth))
+
+    def get_top_moves(self, num_top_moves: int = 5) -> list[dict]:
+        if self._board.is_game_over():
+            return []
+        infos = self._engine.analyse(
+            self._board, self._limit(), multipv=num_top_moves, game=self._game
+        )
+        return _lines_from_infos(infos)
+
+    def get_evaluation(self) -> dict:
+        info = self._engine.analyse(self._board, self._limit(), game=self._game)
+        return _evaluation_from_info(info)
+
+    def get_best_move_time(self, time: int = 1000) -> str | None:
+        if self._board.is_game_over():
+            return None
+        result = self._engine.play(
+            self._board, chess.engine.Limit(time=time / 1000), game=self._game
+        )
+        return result.move.uci() if result.move else None
+
+    # Probes used by engine_supervisor.
+
+    def is_alive(self) -> bool:
+        return not self._engine.returncode.done()
+
+    def ping(self, timeout: float) -> bool:
+        protocol = self._engine.protocol
+        future = asyncio.run_coroutine_threadsafe(
+            asyncio.wait_for(protocol.ping(), timeout), protocol.loop
+        )
+        try:
+            future.result()
+            return True
+        except Exception:
+            return False
+
+    def kill(self) -> None:
+        self._engine.close()
+
+    def quit(self) -> None:
+        self._engine.quit()
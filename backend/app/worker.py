@@ -0,0 +1,121 @@
+"""
+Analysis worker: runs queued jobs from the `analysis_jobs` table.
+
+Usage (inside backend container):
+    python worker.py [--poll 2] [--once] [--worker-id NAME]
+
+Start as many as the engines allow (each uses the engine pool,
+STOCKFISH_POOL_SIZE engines) — e.g. `docker compose up --scale worker=3`.
+Jobs are claimed with SKIP LOCKED, kept alive with heartbeats and retried
+with backoff on failure; a lower-priority job yields to a more urgent one
+at the next game boundary. See job_queue.py. SIGTERM/SIGINT finish the
+current job and exit; a worker killed outright leaves its job to be
+reclaimed by another one once the heartbeat goes stale.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import threading
+
+from batch import Cancelled, Preempted, process_user_games
+from database import SessionLocal, engine, init_db
+from job_events import NotifyForwarder, job_events
+from job_queue import (PRIORITY_BACKFILL, Heartbeat, claim, default_worker_id, fail_or_retry,
+                       higher_priority_waiting, requeue)
+from metrics import serve as serve_metrics
+from models import AnalysisJob
+
+## Port of this worker's Prometheus endpoint (GET /metrics); 0 disables it.
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+
+
+def run_job(job_id: int, worker_id: str) -> str:
+    """Run one claimed job to completion. Returns its final status."""
+    db = SessionLocal()
+    # Separate session for the preemption checks: `db` holds `job` across the run.
+    probe = SessionLocal()
+    try:
+        job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).one()
+        print(f"[{worker_id}] Job {job.id}: {job.username} "
+              f"({job.processed or 0}/{job.requested} done, attempt {job.attempts}, priority {job.priority})")
+        heartbeat = Heartbeat(job.id, worker_id)
+        try:
+            with heartbeat:
+                process_user_games(
+                    job.username,
+                    new_games=job.requested,
+                    opponent=job.opponent,
+                    job_id=job.id,
+                    resume_from=job.processed or 0,
+                    raise_errors=True,
+                    should_yield=lambda: higher_priority_waiting(probe, job),
+                    preview=job.priority != PRIORITY_BACKFILL,
+                    cancelled=heartbeat.lost.is_set,
+                    worker_id=worker_id,
+                )
+        except Exception as e:
+            if isinstance(e, Cancelled) or heartbeat.lost.is_set():
+                # The row belongs to the worker that took the job over.
+                return "taken over"
+            db.refresh(job)
+            if isinstance(e, Preempted):
+                return job.status if requeue(db, job, worker_id) else "taken over"
+            return fail_or_retry(db, job, str(e), worker_id) or "taken over"
+        db.refresh(job)
+        return job.status
+    finally:
+        # Nothing more comes from this run, whatever became of the job.
+        job_events.expire(job_id)
+        probe.close()
+        db.close()
+
+
+def run_worker(worker_id: str, poll: float = 2.0, once: bool = False, stop: threading.Event | None = None):
+    stop = stop or threading.Event()
+    print(f"Worker {worker_id} polling for jobs every {poll}s")
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            job = claim(db, worker_id)
+            job_id = job.id if job else None
+        finally:
+            db.close()
+        if job_id is None:
+            if once:
+                return
+            stop.wait(poll)
+            continue
+        status = run_job(job_id, worker_id)
+        print(f"[{worker_id}] Job {job_id} {status}")
+    print(f"Worker {worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued analysis jobs.")
+    parser.add_argument("--poll", type=float, default=2.0, help="seconds between polls when idle")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    parser.add_argument("--worker-id", default=None)
+    args = parser.parse_args()
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print("Stop requested; finishing the current job...")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    init_db()
+    if WORKER_METRICS_PORT:
+        serve_metrics(WORKER_METRICS_PORT)
+    # SSE clients connect to the API process; send it this worker's events.
+    forwarder = job_events.forward = NotifyForwarder(engine)
+    run_worker(args.worker_id or default_worker_id(), poll=args.poll, once=args.once, stop=stop)
+    forwarder.flush()
+
+
+if __name__ == "__main__":
+    main()
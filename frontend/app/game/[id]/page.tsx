@@ -24,6 +24,8 @@ interface GameData {
     black_result: string;
     time_control: string;
     opening: string;
+    provisional?: boolean | null;
+    analysis_depth?: number | null;
 }
 
 interface MoveAnalysis {
@@ -65,13 +67,17 @@ export default function GamePage() {
     const [trainError, setTrainError] = useState<string | null>(null);
 
     useEffect(() => {
+        let timer: ReturnType<typeof setTimeout> | undefined;
         const fetchGame = async () => {
             const res = await fetch(`http://localhost:8000/game/${params.id}`);
             const data = await res.json();
             setGame(data.game);
             setAnalysis(data.analysis || []);
+            // A quick preview is shown first; poll until the full-depth pass lands.
+            if (data.game?.provisional) timer = setTimeout(fetchGame, 3000);
         };
         fetchGame();
+        return () => clearTimeout(timer);
     }, [params.id]);
 
     useEffect(() => {
@@ -210,6 +216,11 @@ export default function GamePage() {
                             <div className="salon-result-detail">
                                 {whiteWon ? "White wins" : blackWon ? "Black wins" : "Draw"}
                             </div>
+                            {game.provisional && (
+                                <div className="salon-result-detail">
+                                    Preview (depth {game.analysis_depth}) — refining…
+                                </div>
+                            )}
                         </div>
                         <PlayerCard
                             color="white"
@@ -79,16 +79,25 @@ export default function Home() {
 
       const { job_id, } = await postRes.json();
 
-      // Poll job status until done or failed
-      while (true) {
-        await new Promise((resolve) => setTimeout(resolve, 3000));
-        const statusRes = await fetch(`http://localhost:8000/analyze/status/${job_id}`);
-        if (!statusRes.ok) continue;
-        const { status, processed, requested, error } = await statusRes.json();
-        setAnalysisProgress({ processed, requested });
-        if (status === "failed") throw new Error(error || "Analysis failed");
-        if (status === "done") break;
-      }
+      // Follow the job's event stream until it is done or failed
+      await new Promise<void>((resolve, reject) => {
+        const events = new EventSource(`http://localhost:8000/analyze/stream/${job_id}`);
+        events.addEventListener("job", (e) => {
+          const { status, processed, requested, error } = JSON.parse((e as MessageEvent).data);
+          setAnalysisProgress({ processed, requested });
+          if (status === "failed") {
+            events.close();
+            reject(new Error(error || "Analysis failed"));
+          } else if (status === "done") {
+            events.close();
+            resolve();
+          }
+        });
+        events.onerror = () => {
+          // EventSource reconnects on its own; give up only once it stops.
+          if (events.readyState === EventSource.CLOSED) reject(new Error("Lost connection to analysis stream"));
+        };
+      });
       setAnalysisProgress(null);
 
       await fetchAllData(username);